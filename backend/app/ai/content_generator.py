@@ -3,8 +3,9 @@ from typing import List, Dict, Any, Optional
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.tokenize import sent_tokenize
+from app.ai.registry import sent_tokenize
+from app.ai.nlp_artifacts import ContentText
+from app.ai.term_index import TermDefinitionIndex
 from datetime import datetime
 import re
 
@@ -15,15 +16,12 @@ logger = logging.getLogger(__name__)
 class ContentGenerator:
     """AI-powered content generation for educational materials."""
     
-    def __init__(self):
-        """Initialize the content generator."""
-        self.vectorizer = TfidfVectorizer(stop_words='english')
-        
-        # Download NLTK resources if needed
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
+    def __init__(self, vectorizer: Optional[TfidfVectorizer] = None):
+        """
+        Initialize the content generator. Use app.ai.registry.content_generator()
+        for the process-wide instance, whose NLTK resources are already loaded.
+        """
+        self.vectorizer = vectorizer if vectorizer is not None else TfidfVectorizer(stop_words='english')
     
     async def generate_study_sheet(self, 
                                   topic_id: str, 
@@ -32,6 +30,9 @@ class ContentGenerator:
         """
         Generate a personalized study sheet for a topic.
         
+        This runs on the calling thread; request handlers submit
+        build_study_sheet to app.ai.executor instead so the event loop stays free.
+        
         Args:
             topic_id: ID of the topic
             user_knowledge_level: User's knowledge level (1-10)
@@ -40,6 +41,13 @@ class ContentGenerator:
         Returns:
             Generated study sheet
         """
+        return self.build_study_sheet(topic_id, user_knowledge_level, contents)
+    
+    def build_study_sheet(self, 
+                          topic_id: str, 
+                          user_knowledge_level: float = 5.0,
+                          contents: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Synchronous, CPU-bound part of generate_study_sheet."""
         if not contents or len(contents) == 0:
             logger.error("No content available for study sheet generation")
             return {
@@ -72,6 +80,9 @@ class ContentGenerator:
             "difficulty_level": user_knowledge_level
         }
         
+        # Definitions of every key term, shared by the sections below
+        term_index = TermDefinitionIndex(explanations)
+        
         # Add introduction section
         if explanations:
             intro = self._create_introduction(explanations)
@@ -83,7 +94,7 @@ class ContentGenerator:
         
         # Add key concepts section
         if explanations:
-            key_concepts = self._extract_key_concepts(explanations)
+            key_concepts = self._extract_key_concepts(explanations, term_index)
             study_sheet["sections"].append({
                 "title": "Key Concepts",
                 "content": key_concepts,
@@ -94,7 +105,7 @@ class ContentGenerator:
         for i, explanation in enumerate(explanations[:3]):  # Limit to 3 explanations
             study_sheet["sections"].append({
                 "title": explanation.get("title", f"Concept {i+1}"),
-                "content": self._format_content(explanation.get("body", "")),
+                "content": self._format_content(explanation.get("body", ""), ContentText(explanation)),
                 "type": "explanation"
             })
         
@@ -107,7 +118,7 @@ class ContentGenerator:
             })
         
         # Add practice questions
-        questions = self._generate_practice_questions(explanations, examples)
+        questions = self._generate_practice_questions(explanations, examples, term_index)
         if questions:
             study_sheet["sections"].append({
                 "title": "Practice Questions",
@@ -134,21 +145,19 @@ class ContentGenerator:
         if not sorted_explanations:
             return "Introduction unavailable."
         
-        explanation = sorted_explanations[0]
-        body = explanation.get("body", "")
-        
-        # Extract first paragraph
-        paragraphs = body.split("\n\n")
-        intro_paragraph = paragraphs[0] if paragraphs else body
+        text = ContentText(sorted_explanations[0])
         
-        # Limit introduction length
-        sentences = sent_tokenize(intro_paragraph)
+        # Limit introduction length to the first sentences of the first paragraph
+        sentences = text.paragraph_sentences(0)
         intro = " ".join(sentences[:3])
         
         return intro
     
-    def _extract_key_concepts(self, explanations: List[Dict[str, Any]]) -> str:
+    def _extract_key_concepts(self,
+                              explanations: List[Dict[str, Any]],
+                              term_index: Optional[TermDefinitionIndex] = None) -> str:
         """Extract and format key concepts from explanations."""
+        term_index = term_index or TermDefinitionIndex(explanations)
         all_key_terms = []
         
         # Collect key terms from all explanations
@@ -168,45 +177,53 @@ class ContentGenerator:
         key_concepts = []
         for term, _ in sorted_terms[:8]:  # Limit to top 8 terms
             # Find sentences containing this term
-            definition = self._find_term_definition(term, explanations)
+            definition = term_index.definition(term)
             key_concepts.append(f"**{term.title()}**: {definition}")
         
         return "\n\n".join(key_concepts)
     
     def _find_term_definition(self, term: str, explanations: List[Dict[str, Any]]) -> str:
-        """Find the best definition sentence for a term."""
+        """Find the best definition sentence for a term (TermDefinitionIndex answers this for all terms at once)."""
         term_lower = term.lower()
         best_sentence = f"Important concept in this topic."
         
         for explanation in explanations:
-            body = explanation.get("body", "")
-            sentences = sent_tokenize(body)
-            
-            for sentence in sentences:
-                if term_lower in sentence.lower():
-                    # Score the sentence based on length and position
-                    score = len(sentence)
-                    if sentence == sentences[0]:
-                        score += 100  # Prefer first sentence
-                    
-                    # Replace current best if this is better
-                    if len(best_sentence) < 10 or score > len(best_sentence):
-                        best_sentence = sentence
+            # Sentences and key-term positions precomputed when the content was stored
+            text = ContentText(explanation)
+            positions = text.sentences_with(term_lower)
+            if not positions:
+                continue
+            sentences = text.sentences
+
+            for position in positions:
+                sentence = sentences[position]
+                # Score the sentence based on length and position
+                score = len(sentence)
+                if sentence == sentences[0]:
+                    score += 100  # Prefer first sentence
+
+                # Replace current best if this is better
+                if len(best_sentence) < 10 or score > len(best_sentence):
+                    best_sentence = sentence
         
         return best_sentence
     
-    def _format_content(self, content: str) -> str:
+    def _format_content(self, content: str, text: Optional[ContentText] = None) -> str:
         """Format content for better readability."""
         # Ensure paragraphs are properly separated
         formatted = re.sub(r'\n{3,}', '\n\n', content)
         
+        # The precomputed paragraphs are only those of the text as stored
+        if text is not None and formatted != text.body:
+            text = None
+        
         # Break very long paragraphs
         paragraphs = formatted.split("\n\n")
         formatted_paragraphs = []
         
-        for p in paragraphs:
+        for i, p in enumerate(paragraphs):
             if len(p) > 500:
-                sentences = sent_tokenize(p)
+                sentences = text.paragraph_sentences(i) if text is not None else sent_tokenize(p)
                 mid_point = len(sentences) // 2
                 p1 = " ".join(sentences[:mid_point])
                 p2 = " ".join(sentences[mid_point:])
@@ -233,8 +250,10 @@ class ContentGenerator:
     
     def _generate_practice_questions(self, 
                                     explanations: List[Dict[str, Any]], 
-                                    examples: List[Dict[str, Any]]) -> str:
+                                    examples: List[Dict[str, Any]],
+                                    term_index: Optional[TermDefinitionIndex] = None) -> str:
         """Generate practice questions based on content."""
+        term_index = term_index or TermDefinitionIndex(explanations)
         # For MVP, generate simple questions based on key terms
         questions = []
         
@@ -246,7 +265,7 @@ class ContentGenerator:
         
         # Generate fill-in-the-blank questions
         for i, term in enumerate(all_key_terms[:5]):  # Limit to 5 questions
-            definition = self._find_term_definition(term, explanations)
+            definition = term_index.definition(term)
             
             # Replace the term with a blank in the definition
             question_text = definition.replace(term, "________")
@@ -256,11 +275,10 @@ class ContentGenerator:
             questions.append("")
         
         # Generate true/false questions
-        content_text = ""
+        sentences = []
         for explanation in explanations:
-            content_text += explanation.get("body", "") + " "
+            sentences.extend(ContentText(explanation).sentences)
         
-        sentences = sent_tokenize(content_text)
         statement_candidates = [s for s in sentences if 10 < len(s) < 150]
         
         if statement_candidates:
@@ -281,14 +299,13 @@ class ContentGenerator:
         if not explanations:
             return "Summary unavailable."
         
-        explanation = explanations[0]
-        body = explanation.get("body", "")
+        text = ContentText(explanations[0])
         
-        paragraphs = body.split("\n\n")
+        paragraphs = text.paragraphs
         if len(paragraphs) > 1:
             return paragraphs[-1]
         elif paragraphs:
-            sentences = sent_tokenize(paragraphs[0])
+            sentences = text.paragraph_sentences(0)
             if len(sentences) > 3:
                 return " ".join(sentences[-3:])
             return paragraphs[0]
@@ -326,6 +343,9 @@ class ContentGenerator:
         for c in appropriate_content:
             key_terms.extend(c.get("key_terms", []))
         
+        # Definitions of every key term, found in one pass
+        term_index = TermDefinitionIndex(appropriate_content)
+        
         # Generate questions
         question_count = 0
         
@@ -334,7 +354,7 @@ class ContentGenerator:
             if question_count >= num_questions:
                 break
                 
-            definition = self._find_term_definition(term, appropriate_content)
+            definition = term_index.definition(term)
             if len(definition) > 20:
                 question_text = definition.replace(term, "________")
                 
@@ -0,0 +1,163 @@
+"""
+Process pool for CPU-bound generation (study sheets, practice questions).
+
+Generation tokenizes and scans whole topics in pure Python, which would block
+the event loop of the worker serving the request. Handlers submit it to
+``generation_executor`` instead; at most GENERATION_WORKERS tasks run at
+once and at most GENERATION_MAX_QUEUE more wait for a process. Beyond that
+``submit`` raises GenerationOverloaded and the routers answer 503 rather
+than let latency grow without bound.
+
+Each task reports how long it waited for a process and how long it ran;
+totals are published through app.utils.metrics as ``generation.*``. A pool
+broken by a dying worker (OOM kill, crash, failing initializer) is replaced
+and the task retried once (``generation.pool_restarts``).
+"""
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", str(min(4, os.cpu_count() or 1))))
+GENERATION_MAX_QUEUE = int(os.getenv("GENERATION_MAX_QUEUE", "32"))
+
+# Seconds a client is asked to wait before retrying an overloaded request
+RETRY_AFTER_SECONDS = 2
+
+
+class GenerationOverloaded(Exception):
+    """Raised when the generation queue is full."""
+
+
+@dataclass
+class GenerationTiming:
+    queue_ms: float
+    compute_ms: float
+
+    def server_timing(self) -> str:
+        """Value of a Server-Timing response header."""
+        return f"queue;dur={self.queue_ms}, compute;dur={self.compute_ms}"
+
+
+# Generator of the worker process, set once by _init_worker
+_content_generator = None
+
+
+def _init_worker() -> None:
+    global _content_generator
+    from app.ai import registry
+    registry.load()
+    _content_generator = registry.content_generator()
+
+
+def _warm() -> None:
+    """No-op task that makes the pool start its processes."""
+
+
+def _run_timed(fn: Callable[..., Any], args: tuple) -> tuple:
+    started = time.time()
+    result = fn(*args)
+    return started, time.time() - started, result
+
+
+def build_study_sheet(topic_id: str, knowledge_level: float, contents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Study sheet of a topic (runs in a worker process)."""
+    return _content_generator.build_study_sheet(topic_id, knowledge_level, contents)
+
+
+def build_questions(contents: List[Dict[str, Any]], knowledge_level: float, num_questions: int) -> List[Dict[str, Any]]:
+    """Practice questions of a topic (runs in a worker process)."""
+    return _content_generator.generate_personalized_questions(
+        content=contents,
+        user_level=knowledge_level,
+        num_questions=num_questions
+    )
+
+
+class GenerationExecutor:
+    """Bounded process pool; ``submit`` returns the result with its timing."""
+
+    def __init__(self, workers: int = GENERATION_WORKERS, max_queue: int = GENERATION_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+
+    async def warm(self) -> None:
+        """Start every worker process (and its generator) ahead of the first request."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm) for _ in range(self.workers)))
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _replace_broken(self, pool: ProcessPoolExecutor) -> None:
+        """Replace ``pool`` after one of its workers died, unless another task already did."""
+        if self._pool is pool:
+            logger.warning("Generation process pool is broken; starting a new one")
+            metrics.increment("generation.pool_restarts")
+            self.stop()
+            self.start()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def submit(self, fn: Callable[..., Any], *args: Any) -> tuple:
+        """
+        Run ``fn(*args)`` in a worker process and return ``(result, GenerationTiming)``.
+        ``fn`` and its arguments must be picklable (module-level functions).
+        """
+        if self._in_flight >= self.workers + self.max_queue:
+            metrics.increment("generation.rejected")
+            raise GenerationOverloaded(f"{self._in_flight} generation task(s) already in progress")
+        self.start()
+
+        self._in_flight += 1
+        metrics.set_gauge("generation.in_flight", self._in_flight)
+        submitted = time.time()
+        try:
+            pool = self._pool
+            try:
+                started, compute_seconds, result = await asyncio.get_running_loop().run_in_executor(
+                    pool, _run_timed, fn, args
+                )
+            except BrokenProcessPool:
+                self._replace_broken(pool)
+                started, compute_seconds, result = await asyncio.get_running_loop().run_in_executor(
+                    self._pool, _run_timed, fn, args
+                )
+        finally:
+            self._in_flight -= 1
+            metrics.set_gauge("generation.in_flight", self._in_flight)
+
+        timing = GenerationTiming(
+            queue_ms=round(max(0.0, started - submitted) * 1000, 2),
+            compute_ms=round(compute_seconds * 1000, 2)
+        )
+        metrics.increment("generation.tasks")
+        metrics.increment("generation.queue_ms", timing.queue_ms)
+        metrics.increment("generation.compute_ms", timing.compute_ms)
+        return result, timing
+
+
+generation_executor = GenerationExecutor()
@@ -0,0 +1,141 @@
+"""
+NLP artifacts computed once per content write and stored with the content.
+
+Study-sheet and question generation need the sentences and paragraphs of
+each content body and the sentences that mention its key terms. Tokenizing
+bodies on every request is the bulk of generation time, so contents.py
+stores them under ``nlp`` as character offsets into the body:
+
+    {"version": 2, "sha1": "3f7a...",
+     "sentences": [s0, e0, s1, e1, ...],
+     "paragraphs": [[start, end, [s0, e0, ...]], ...],
+     "terms": {"factoring": [0, 4], ...}}
+
+``sentences`` are the spans of ``sent_tokenize(body)``, ``paragraphs`` the
+spans of ``body.split("\\n\\n")`` with the sentences of each paragraph
+tokenized on its own, and ``terms`` maps each lowercased key term to the
+indices of the sentences containing it (case-insensitively). ``sha1`` is
+the digest of the body the artifacts were computed for.
+
+``ContentText`` reads a content through its artifacts, and falls back to
+tokenizing when they are missing or were computed for another body.
+"""
+import hashlib
+from typing import Any, Dict, List, Optional
+from app.ai.registry import sent_tokenize
+
+NLP_FIELD = "nlp"
+NLP_ARTIFACTS_VERSION = 2
+
+PARAGRAPH_SEPARATOR = "\n\n"
+
+
+def body_digest(body: str) -> str:
+    """Digest identifying the body that artifacts were computed for."""
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+def _spans(text: str, pieces: List[str], offset: int = 0) -> Optional[List[int]]:
+    """Flat ``[start, end, ...]`` offsets of consecutive substrings of ``text``."""
+    spans = []
+    position = 0
+    for piece in pieces:
+        start = text.find(piece, position)
+        if start < 0:
+            return None
+        position = start + len(piece)
+        spans.extend((offset + start, offset + position))
+    return spans
+
+
+def compute_nlp_artifacts(body: str, key_terms: List[str]) -> Optional[Dict[str, Any]]:
+    """Artifacts of a content body, or None when its sentences cannot be located in it."""
+    sentences = sent_tokenize(body)
+    sentence_spans = _spans(body, sentences)
+    if sentence_spans is None:
+        return None
+
+    paragraphs = []
+    start = 0
+    for paragraph in body.split(PARAGRAPH_SEPARATOR):
+        end = start + len(paragraph)
+        spans = _spans(paragraph, sent_tokenize(paragraph), offset=start)
+        if spans is None:
+            return None
+        paragraphs.append([start, end, spans])
+        start = end + len(PARAGRAPH_SEPARATOR)
+
+    lowered = [sentence.lower() for sentence in sentences]
+    terms = {}
+    for term in key_terms:
+        term_lower = term.lower()
+        if term_lower not in terms:
+            terms[term_lower] = [i for i, sentence in enumerate(lowered) if term_lower in sentence]
+
+    return {
+        "version": NLP_ARTIFACTS_VERSION,
+        "sha1": body_digest(body),
+        "sentences": sentence_spans,
+        "paragraphs": paragraphs,
+        "terms": terms
+    }
+
+
+def with_nlp_artifacts(content: Dict[str, Any]) -> Dict[str, Any]:
+    """Set ``content[NLP_FIELD]`` from its body and key terms and return the content."""
+    content[NLP_FIELD] = compute_nlp_artifacts(content.get("body", ""), content.get("key_terms", []))
+    return content
+
+
+def _slices(text: str, spans: List[int]) -> List[str]:
+    return [text[spans[i]:spans[i + 1]] for i in range(0, len(spans), 2)]
+
+
+class ContentText:
+    """Sentences and paragraphs of one content body, from its artifacts when they are current."""
+
+    def __init__(self, content: Dict[str, Any]):
+        self.body = content.get("body", "")
+        artifacts = content.get(NLP_FIELD)
+        if not (isinstance(artifacts, dict)
+                and artifacts.get("version") == NLP_ARTIFACTS_VERSION
+                and artifacts.get("sha1") == body_digest(self.body)):
+            artifacts = None
+        self._artifacts = artifacts
+        self._sentences: Optional[List[str]] = None
+        self._lowered: Optional[List[str]] = None
+
+    @property
+    def sentences(self) -> List[str]:
+        """Same as ``sent_tokenize(body)``."""
+        if self._sentences is None:
+            if self._artifacts is not None:
+                self._sentences = _slices(self.body, self._artifacts["sentences"])
+            else:
+                self._sentences = sent_tokenize(self.body)
+        return self._sentences
+
+    @property
+    def lowered_sentences(self) -> List[str]:
+        if self._lowered is None:
+            self._lowered = [sentence.lower() for sentence in self.sentences]
+        return self._lowered
+
+    @property
+    def paragraphs(self) -> List[str]:
+        """Same as ``body.split("\\n\\n")``."""
+        return self.body.split(PARAGRAPH_SEPARATOR)
+
+    def paragraph_sentences(self, index: int) -> List[str]:
+        """Same as ``sent_tokenize(paragraphs[index])``."""
+        if self._artifacts is not None:
+            return _slices(self.body, self._artifacts["paragraphs"][index][2])
+        return sent_tokenize(self.paragraphs[index])
+
+    def sentences_with(self, term_lower: str) -> List[int]:
+        """Indices of the sentences containing a lowercased term."""
+        if self._artifacts is not None:
+            positions = self._artifacts["terms"].get(term_lower)
+            if positions is not None:
+                return positions
+        return [i for i, sentence in enumerate(self.lowered_sentences) if term_lower in sentence]
@@ -0,0 +1,155 @@
+"""
+Process-wide AI components: NLTK tokenizers and stopwords, the TF-IDF
+vectorizer, the ContentGenerator and the PersonalizationEngine.
+
+Everything is loaded once per process by ``load()`` (run in the background
+at startup and in each generation worker's initializer), so request paths
+never look up or download NLTK data. Missing NLTK data is downloaded during
+loading when NLTK_DOWNLOAD is enabled; if it is still unavailable the
+tokenizers fall back to regular expressions and the stopwords to
+scikit-learn's English list.
+
+NLTK, scikit-learn and the generator modules are only imported by
+``load()``, never when this module is imported, so importing app.main
+stays fast (see bench_import_time.py). ``ready()`` and ``status()`` report
+whether loading has finished.
+"""
+import os
+import re
+import time
+import logging
+from threading import Lock
+from typing import Any, Dict, FrozenSet, List, Optional
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set to "false" where NLTK data is installed by the image (or there is no network)
+NLTK_DOWNLOAD = os.getenv("NLTK_DOWNLOAD", "true").lower() == "true"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+_lock = Lock()
+_loaded = False
+_loaded_in_ms: Optional[float] = None
+_punkt = None
+_word_tokenizer = None
+_stop_words: FrozenSet[str] = frozenset()
+_vectorizer = None
+_content_generator = None
+_personalization_engine = None
+
+
+def _find_or_download(resource: str, package: str) -> bool:
+    import nltk
+    try:
+        nltk.data.find(resource)
+        return True
+    except LookupError:
+        pass
+    if not NLTK_DOWNLOAD:
+        return False
+    try:
+        nltk.download(package, quiet=True)
+        nltk.data.find(resource)
+        return True
+    except Exception as e:
+        logger.warning(f"NLTK resource {package} unavailable: {str(e)}")
+        return False
+
+
+def _load_punkt():
+    if not _find_or_download("tokenizers/punkt", "punkt"):
+        logger.warning("Punkt tokenizer unavailable, splitting sentences with regular expressions")
+        return None
+    import nltk
+    return nltk.data.load("tokenizers/punkt/english.pickle")
+
+
+def _load_stop_words() -> FrozenSet[str]:
+    if _find_or_download("corpora/stopwords", "stopwords"):
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words("english"))
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    logger.warning("NLTK stopwords unavailable, using scikit-learn's English stopwords")
+    return frozenset(ENGLISH_STOP_WORDS)
+
+
+def load() -> None:
+    """Load every component; later calls return immediately."""
+    global _loaded, _loaded_in_ms, _punkt, _word_tokenizer, _stop_words, _vectorizer, _content_generator
+    global _personalization_engine
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        started = time.perf_counter()
+        from nltk.tokenize.destructive import NLTKWordTokenizer
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from app.ai.content_generator import ContentGenerator
+        from app.ai.personalization_engine import PersonalizationEngine
+
+        _punkt = _load_punkt()
+        _word_tokenizer = NLTKWordTokenizer()
+        _stop_words = _load_stop_words()
+        _vectorizer = TfidfVectorizer(stop_words="english")
+        _content_generator = ContentGenerator(vectorizer=_vectorizer)
+        _personalization_engine = PersonalizationEngine()
+        _loaded_in_ms = round((time.perf_counter() - started) * 1000, 2)
+        _loaded = True
+    metrics.set_gauge("ai.components_ready", 1)
+    logger.info(f"AI components loaded in {_loaded_in_ms} ms")
+
+
+def ready() -> bool:
+    return _loaded
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "ready": _loaded,
+        "loaded_in_ms": _loaded_in_ms,
+        "punkt": _punkt is not None,
+        "stop_words": len(_stop_words)
+    }
+
+
+def sent_tokenize(text: str) -> List[str]:
+    """Split text into sentences with Punkt, or a regular expression without it."""
+    if not _loaded:
+        load()
+    if _punkt is not None:
+        return _punkt.tokenize(text)
+    text = text.strip()
+    return [sentence for sentence in _SENTENCE_END.split(text) if sentence] if text else []
+
+
+def word_tokenize(text: str) -> List[str]:
+    """Split text into words and punctuation, sentence by sentence (as nltk.word_tokenize does)."""
+    return [token for sentence in sent_tokenize(text) for token in _word_tokenizer.tokenize(sentence)]
+
+
+def stop_words() -> FrozenSet[str]:
+    if not _loaded:
+        load()
+    return _stop_words
+
+
+def vectorizer():
+    """The shared, unfitted TF-IDF vectorizer; callers that fit one should clone it."""
+    if not _loaded:
+        load()
+    return _vectorizer
+
+
+def content_generator():
+    if not _loaded:
+        load()
+    return _content_generator
+
+
+def personalization_engine():
+    if not _loaded:
+        load()
+    return _personalization_engine
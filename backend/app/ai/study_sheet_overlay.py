@@ -0,0 +1,95 @@
+"""
+Difficulty bands and per-user overlays for study sheets.
+
+A study sheet only depends on the knowledge level through the difficulty
+window used to pick contents, so sheets are generated and cached once per
+topic and difficulty band (DIFFICULTY_BANDS equal bands over levels 1-10,
+generated at the band's centre). Everything specific to one learner (their
+exact level, name, progress hints and section order) is applied afterwards
+by ``personalize_study_sheet``, which is cheap and never touches the cache.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+KNOWLEDGE_LEVEL_MIN = 1.0
+KNOWLEDGE_LEVEL_MAX = 10.0
+DIFFICULTY_BANDS = int(os.getenv("DIFFICULTY_BANDS", "5"))
+
+_BAND_WIDTH = (KNOWLEDGE_LEVEL_MAX - KNOWLEDGE_LEVEL_MIN) / DIFFICULTY_BANDS
+
+# Learners below this accuracy on a topic see worked examples before practice
+PRACTICE_FIRST_ACCURACY = 0.7
+
+
+def difficulty_band(knowledge_level: float) -> int:
+    """The band (0 to DIFFICULTY_BANDS - 1) of a knowledge level."""
+    level = min(max(knowledge_level, KNOWLEDGE_LEVEL_MIN), KNOWLEDGE_LEVEL_MAX)
+    return min(DIFFICULTY_BANDS - 1, int((level - KNOWLEDGE_LEVEL_MIN) / _BAND_WIDTH))
+
+
+def band_level(band: int) -> float:
+    """The knowledge level at the centre of a band, which its sheet is generated for."""
+    return round(KNOWLEDGE_LEVEL_MIN + (band + 0.5) * _BAND_WIDTH, 2)
+
+
+def _progress_hints(progress: Dict[str, Any]) -> List[str]:
+    hints = []
+    answered = progress.get("questions_answered", 0)
+    if answered:
+        accuracy = progress.get("correct_answers", 0) / answered
+        hints.append(f"You have answered {answered} question(s) on this topic, {accuracy:.0%} correctly.")
+        if accuracy < PRACTICE_FIRST_ACCURACY:
+            hints.append("Review the examples before trying the practice questions again.")
+        else:
+            hints.append("Start with the practice questions and use the examples to check your answers.")
+    else:
+        hints.append("Work through the examples, then test yourself with the practice questions.")
+    return hints
+
+
+def _practice_first(progress: Optional[Dict[str, Any]], knowledge_level: float, band: int) -> bool:
+    if progress and progress.get("questions_answered"):
+        return progress.get("correct_answers", 0) / progress["questions_answered"] >= PRACTICE_FIRST_ACCURACY
+    return knowledge_level > band_level(band)
+
+
+def _reorder_sections(sections: List[Any], practice_first: bool) -> List[Any]:
+    """Move the practice section in front of the examples for learners who should practise first."""
+    titles = [section.get("title") if isinstance(section, dict) else None for section in sections]
+    if not practice_first or "Practice Questions" not in titles or "Examples" not in titles:
+        return list(sections)
+    practice = titles.index("Practice Questions")
+    examples = titles.index("Examples")
+    if practice < examples:
+        return list(sections)
+    reordered = list(sections)
+    reordered.insert(examples, reordered.pop(practice))
+    return reordered
+
+
+def personalize_study_sheet(study_sheet: Dict[str, Any],
+                            knowledge_level: float,
+                            username: Optional[str] = None,
+                            progress: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Return a copy of a band's study sheet for one learner. The shared sheet
+    (which may be cached or in use by other requests) is not modified.
+    """
+    band = difficulty_band(knowledge_level)
+    sheet = dict(study_sheet)
+    sheet["knowledge_level"] = knowledge_level
+    sheet["difficulty_band"] = band
+    if isinstance(sheet.get("sections"), list):
+        sheet["sections"] = _reorder_sections(sheet["sections"], _practice_first(progress, knowledge_level, band))
+    if isinstance(sheet.get("metadata"), dict):
+        sheet["metadata"] = {**sheet["metadata"], "knowledge_level": knowledge_level}
+    if username:
+        sheet["prepared_for"] = username
+    if progress is not None:
+        sheet["progress"] = {
+            "mastery_level": progress.get("mastery_level", 0.0),
+            "questions_answered": progress.get("questions_answered", 0),
+            "correct_answers": progress.get("correct_answers", 0)
+        }
+        sheet["hints"] = _progress_hints(progress)
+    return sheet
@@ -0,0 +1,137 @@
+"""
+Best definition sentence of every key term of a topic, found in one pass.
+
+``ContentGenerator`` picks a definition for a term by scanning every
+sentence of the topic's contents for it, and does so for each term in a
+loop. ``TermDefinitionIndex`` instead runs all the (lowercased) terms
+through an Aho-Corasick automaton over each lowercased sentence once, then
+folds each term's occurrences with the generator's scoring rule:
+
+    score = len(sentence) (+ 100 if it equals the first sentence of its content)
+    replace the best so far if it is shorter than 10 characters or score > len(best)
+
+so ``definition(term)`` is a dictionary lookup that returns exactly what
+the per-term scan returned. Sentences come from the contents' stored NLP
+artifacts (app.ai.nlp_artifacts) when they are current.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.ai.nlp_artifacts import ContentText
+
+DEFAULT_DEFINITION = "Important concept in this topic."
+
+# Bonus for a sentence equal to the first sentence of its content
+FIRST_SENTENCE_BONUS = 100
+
+
+class _Automaton:
+    """Aho-Corasick automaton reporting which patterns occur in a text."""
+
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(pattern_id)
+
+        # Failure links, breadth first; outputs include those of the failure state
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                outputs[next_state].extend(outputs[self._fail[next_state]])
+        self._outputs: List[Tuple[int, ...]] = [tuple(output) for output in outputs]
+
+        # Transitions including failure moves, filled in as characters are seen
+        self._delta: List[Dict[str, int]] = [dict(transitions) for transitions in self._goto]
+
+    def _move(self, state: int, char: str) -> int:
+        origin = state
+        while True:
+            next_state = self._goto[state].get(char)
+            if next_state is not None:
+                break
+            if state == 0:
+                next_state = 0
+                break
+            state = self._fail[state]
+        self._delta[origin][char] = next_state
+        return next_state
+
+    def matches(self, text: str) -> List[int]:
+        """Ids of the patterns occurring in ``text`` (with repeats)."""
+        delta = self._delta
+        outputs = self._outputs
+        found = []
+        state = 0
+        for char in text:
+            next_state = delta[state].get(char)
+            if next_state is None:
+                next_state = self._move(state, char)
+            state = next_state
+            if outputs[state]:
+                found.extend(outputs[state])
+        return found
+
+
+class TermDefinitionIndex:
+    """Definitions of ``terms`` (by default every key term) drawn from ``contents``, in order."""
+
+    def __init__(self, contents: List[Dict[str, Any]], terms: Optional[Iterable[str]] = None):
+        self._texts = [ContentText(content) for content in contents]
+        if terms is None:
+            terms = (term for content in contents for term in content.get("key_terms", []))
+        patterns = list(dict.fromkeys(term.lower() for term in terms))
+        self._definitions: Dict[str, str] = {}
+        self._index(patterns)
+
+    def _index(self, patterns: List[str]) -> None:
+        if not patterns:
+            return
+        # The empty term occurs in every sentence; the automaton only sees the others
+        searched = [pattern for pattern in patterns if pattern]
+        automaton = _Automaton(searched)
+        best = {pattern: DEFAULT_DEFINITION for pattern in patterns}
+
+        for text in self._texts:
+            sentences = text.sentences
+            if not sentences:
+                continue
+            first = sentences[0]
+            for sentence, lowered in zip(sentences, text.lowered_sentences):
+                found = set(automaton.matches(lowered)) if searched else set()
+                matched = [searched[pattern_id] for pattern_id in found]
+                if "" in best:
+                    matched.append("")
+                if not matched:
+                    continue
+                score = len(sentence) + (FIRST_SENTENCE_BONUS if sentence == first else 0)
+                for pattern in matched:
+                    current = best[pattern]
+                    if len(current) < 10 or score > len(current):
+                        best[pattern] = sentence
+        self._definitions.update(best)
+
+    def definition(self, term: str) -> str:
+        """The best definition sentence of a term (indexed on first use when it was not a key term)."""
+        term_lower = term.lower()
+        definition = self._definitions.get(term_lower)
+        if definition is None:
+            self._index([term_lower])
+            definition = self._definitions[term_lower]
+        return definition
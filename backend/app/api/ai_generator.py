@@ -1,22 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import List, Dict, Any
 from app.schemas.models import User
 from app.utils.auth import get_current_user
-from app.database import contents_collection, topics_collection
-from app.ai.content_generator import ContentGenerator
-from app.ai.personalization_engine import PersonalizationEngine
+from app.repositories import contents_repo, topics_repo
+from app.ai.executor import generation_executor, build_study_sheet, build_questions
+from app.ai import registry
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
-# Initialize AI components
-content_generator = ContentGenerator()
-personalization_engine = PersonalizationEngine()
+# Generation runs in app.ai.executor worker processes; the personalization
+# engine is loaded by app.ai.registry, after startup or on first use
 
 @router.post("/studysheet")
 async def generate_study_sheet(
     topic_id: str,
+    response: Response,
     current_user: User = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -29,7 +30,7 @@ async def generate_study_sheet(
             detail="Invalid topic ID format"
         )
     
-    topic = await topics_collection.find_one({"_id": ObjectId(topic_id)})
+    topic = await topics_repo.get(topic_id)
     if not topic:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,7 +41,7 @@ async def generate_study_sheet(
     user_knowledge_level = current_user.preferences.get("knowledge_level", 5.0)
     
     # Get content for this topic
-    contents = await contents_collection.find({"topic_id": topic_id}).to_list(1000)
+    contents = await contents_repo.find({"topic_id": topic_id}, limit=1000)
     
     if not contents:
         raise HTTPException(
@@ -48,12 +49,11 @@ async def generate_study_sheet(
             detail="No content available for this topic"
         )
     
-    # Generate study sheet
-    study_sheet = await content_generator.generate_study_sheet(
-        topic_id=topic_id,
-        user_knowledge_level=user_knowledge_level,
-        contents=contents
+    # Generate study sheet off the event loop
+    study_sheet, timing = await generation_executor.submit(
+        build_study_sheet, topic_id, user_knowledge_level, contents
     )
+    response.headers["Server-Timing"] = timing.server_timing()
     
     # Add topic and user information
     study_sheet["topic_name"] = topic.get("name")
@@ -65,6 +65,7 @@ async def generate_study_sheet(
 @router.post("/questions")
 async def generate_questions(
     topic_id: str,
+    response: Response,
     num_questions: int = Query(5, ge=1, le=20),
     current_user: User = Depends(get_current_user)
 ) -> List[Dict[str, Any]]:
@@ -78,7 +79,7 @@ async def generate_questions(
             detail="Invalid topic ID format"
         )
     
-    topic = await topics_collection.find_one({"_id": ObjectId(topic_id)})
+    topic = await topics_repo.get(topic_id)
     if not topic:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,7 +90,7 @@ async def generate_questions(
     user_knowledge_level = current_user.preferences.get("knowledge_level", 5.0)
     
     # Get content for this topic
-    contents = await contents_collection.find({"topic_id": topic_id}).to_list(1000)
+    contents = await contents_repo.find({"topic_id": topic_id}, limit=1000)
     
     if not contents:
         raise HTTPException(
@@ -97,12 +98,11 @@ async def generate_questions(
             detail="No content available for this topic"
         )
     
-    # Generate questions
-    questions = content_generator.generate_personalized_questions(
-        content=contents,
-        user_level=user_knowledge_level,
-        num_questions=num_questions
+    # Generate questions off the event loop
+    questions, timing = await generation_executor.submit(
+        build_questions, contents, user_knowledge_level, num_questions
     )
+    response.headers["Server-Timing"] = timing.server_timing()
     
     return questions
 
@@ -125,7 +125,7 @@ async def get_recommendations(
             )
         query["topic_id"] = topic_id
     
-    all_content = await contents_collection.find(query).to_list(1000)
+    all_content = await contents_repo.find(query, limit=1000)
     
     if not all_content:
         raise HTTPException(
@@ -134,6 +134,7 @@ async def get_recommendations(
         )
     
     # Train recommendation engine
+    personalization_engine = await asyncio.to_thread(registry.personalization_engine)
     personalization_engine.train(all_content)
     
     # Get recommendations
@@ -151,7 +152,7 @@ async def get_recommendations(
     # Get content details for recommended IDs
     recommendations = []
     for content_id in recommended_ids:
-        content = await contents_collection.find_one({"_id": ObjectId(content_id)})
+        content = await contents_repo.get(content_id)
         if content:
             recommendations.append(content)
     
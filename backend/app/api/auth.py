@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
+from datetime import datetime, timedelta
 from app.schemas.models import Token, UserCreate, User
 from app.utils.auth import authenticate_user, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
-from app.database import users_collection
+from app.repositories import users_repo
 from typing import Any
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
@@ -32,14 +33,14 @@ async def register_user(user: UserCreate) -> Any:
     Register a new user
     """
     # Check if username already exists
-    if await users_collection.find_one({"username": user.username}):
+    if await users_repo.get_by_username(user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
     # Check if email already exists
-    if await users_collection.find_one({"email": user.email}):
+    if await users_repo.get_by_email(user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
@@ -57,11 +58,16 @@ async def register_user(user: UserCreate) -> Any:
         "updated_at": current_time
     }
     
-    # Insert into database
-    result = await users_collection.insert_one(db_user)
-    
-    # Get the created user
-    created_user = await users_collection.find_one({"_id": result.inserted_id})
+    # Insert into database; the unique indexes still guard against a
+    # concurrent registration with the same username or email
+    try:
+        created_user = await users_repo.create(db_user)
+    except DuplicateKeyError as e:
+        key_pattern = (e.details or {}).get("keyPattern", {})
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered" if "email" in key_pattern else "Username already registered"
+        )
     
     # Return user without password
     return {
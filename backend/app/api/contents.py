@@ -1,20 +1,30 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Any, Optional
-from app.schemas.models import Content, ContentCreate, ContentInDB
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response, Body
+from typing import List, Any, Optional, Union
+from app.schemas.models import Content, ContentSummary, BulkResult, ContentCreate, ContentInDB
 from app.utils.auth import get_current_user
-from app.database import contents_collection, topics_collection
+from app.utils.pagination import PageParams, set_next_cursor
+from app.utils.projection import ListView, projection_for
+from app.utils.bulk import BulkBatch
+from app.repositories import contents_repo, topics_repo
+from app.ai.nlp_artifacts import NLP_FIELD, with_nlp_artifacts
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Content])
+VALID_CONTENT_TYPES = ["explanation", "example", "resource", "practice"]
+
+@router.get("/", response_model=Union[List[Content], List[ContentSummary]])
 async def read_contents(
+    response: Response,
     topic_id: Optional[str] = Query(None, description="Filter contents by topic ID"),
-    content_type: Optional[str] = Query(None, description="Filter by content type (explanation, example, resource)")
+    content_type: Optional[str] = Query(None, description="Filter by content type (explanation, example, resource)"),
+    view: ListView = Query(ListView.full, description="summary returns only the fields list views need"),
+    page: PageParams = Depends()
 ) -> Any:
     """
-    Retrieve contents, optionally filtered by topic and type
+    Retrieve contents, optionally filtered by topic and type, one page at a time
     """
     query = {}
     if topic_id:
@@ -28,7 +38,15 @@ async def read_contents(
     if content_type:
         query["type"] = content_type
         
-    contents = await contents_collection.find(query).to_list(1000)
+    # The stored NLP artifacts are not part of any response
+    projection = projection_for(ContentSummary) if view == ListView.summary else {NLP_FIELD: 0}
+    contents, next_cursor = await contents_repo.paginate(
+        query,
+        limit=page.limit,
+        after=page.after,
+        projection=projection
+    )
+    set_next_cursor(response, next_cursor)
     return contents
 
 @router.get("/{content_id}", response_model=Content)
@@ -42,7 +60,7 @@ async def read_content(content_id: str) -> Any:
             detail="Invalid content ID format"
         )
     
-    content = await contents_collection.find_one({"_id": ObjectId(content_id)})
+    content = await contents_repo.get(content_id)
     if not content:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -62,19 +80,17 @@ async def create_content(content: ContentCreate, current_user: Any = Depends(get
             detail="Invalid topic ID format"
         )
         
-    topic = await topics_collection.find_one({"_id": ObjectId(content.topic_id)})
-    if not topic:
+    if not await topics_repo.exists(content.topic_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
         )
     
     # Validate content type
-    valid_types = ["explanation", "example", "resource", "practice"]
-    if content.type not in valid_types:
+    if content.type not in VALID_CONTENT_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Content type must be one of {valid_types}"
+            detail=f"Content type must be one of {VALID_CONTENT_TYPES}"
         )
     
     # Create new content with timestamp
@@ -82,14 +98,33 @@ async def create_content(content: ContentCreate, current_user: Any = Depends(get
     content_dict = content.dict()
     content_dict["created_at"] = now
     content_dict["updated_at"] = now
+    await asyncio.to_thread(with_nlp_artifacts, content_dict)
     
-    # Insert into database
-    result = await contents_collection.insert_one(content_dict)
-    
-    # Get the created content
-    created_content = await contents_collection.find_one({"_id": result.inserted_id})
+    # Insert into database and return the stored document
+    created_content = await contents_repo.create(content_dict)
+    await topics_repo.bump_content_version([created_content["topic_id"]])
     return created_content
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_contents_bulk(
+    items: List[Any] = Body(...),
+    current_user: Any = Depends(get_current_user)
+) -> Any:
+    """
+    Create many contents in one request (requires authentication).
+    Invalid items are reported individually and do not stop the others.
+    """
+    batch = BulkBatch(items, ContentCreate)
+    batch.check(
+        lambda content: None if content.type in VALID_CONTENT_TYPES
+        else f"Content type must be one of {VALID_CONTENT_TYPES}"
+    )
+    await batch.check_references("topic_id", topics_repo, "topic")
+    result, created = await batch.insert(contents_repo, prepare=with_nlp_artifacts)
+    if created:
+        await topics_repo.bump_content_version(content["topic_id"] for content in created)
+    return result
+
 @router.put("/{content_id}", response_model=Content)
 async def update_content(
     content_id: str, 
@@ -105,14 +140,6 @@ async def update_content(
             detail="Invalid content ID format"
         )
     
-    # Check if content exists
-    content = await contents_collection.find_one({"_id": ObjectId(content_id)})
-    if not content:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Content not found"
-        )
-    
     # Validate topic_id exists
     if not ObjectId.is_valid(content_update.topic_id):
         raise HTTPException(
@@ -120,24 +147,25 @@ async def update_content(
             detail="Invalid topic ID format"
         )
         
-    topic = await topics_collection.find_one({"_id": ObjectId(content_update.topic_id)})
-    if not topic:
+    if not await topics_repo.exists(content_update.topic_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
         )
     
-    # Update content
+    # Update content in one round trip; the previous topic is needed when the content moves
     content_dict = content_update.dict()
     content_dict["updated_at"] = datetime.utcnow()
+    await asyncio.to_thread(with_nlp_artifacts, content_dict)
     
-    await contents_collection.update_one(
-        {"_id": ObjectId(content_id)},
-        {"$set": content_dict}
-    )
-    
-    # Get updated content
-    updated_content = await contents_collection.find_one({"_id": ObjectId(content_id)})
+    previous_content = await contents_repo.update_and_get(content_id, content_dict, previous=True)
+    if not previous_content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+    updated_content = {**previous_content, **content_dict}
+    await topics_repo.bump_content_version([previous_content.get("topic_id", ""), updated_content["topic_id"]])
     return updated_content
 
 @router.delete("/{content_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -154,14 +182,12 @@ async def delete_content(
             detail="Invalid content ID format"
         )
     
-    # Check if content exists
-    content = await contents_collection.find_one({"_id": ObjectId(content_id)})
-    if not content:
+    # Delete content
+    deleted_content = await contents_repo.delete_and_get(content_id)
+    if not deleted_content:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Content not found"
         )
-    
-    # Delete content
-    await contents_collection.delete_one({"_id": ObjectId(content_id)})
+    await topics_repo.bump_content_version([deleted_content.get("topic_id", "")])
     return None
@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-import json
+from typing import Optional, List, Dict, Any, Tuple
 import os
+import copy
+import time
+import asyncio
 from bson import ObjectId
-from pymongo import MongoClient
-from app.database import get_database
+from app.repositories import topics_repo, subjects_repo, textbooks_repo, study_sheets_repo, user_history_repo, progress_repo
 from app.utils.auth import get_current_user
 from app.schemas.models import User
 from app.api.test_endpoints import generate_test_study_sheet
+from app.ai.executor import GenerationOverloaded
+from app.ai.study_sheet_overlay import band_level, difficulty_band, personalize_study_sheet
+from app.search.hybrid import hybrid_search
+from app.search.inverted_index import search_index
+from app.utils.cache import TwoTierCache, cache_key
+from app.utils.singleflight import coalesce
+from app.search.snippets import snippet
+from app.utils.metrics import metrics
 import logging
 
 # Set up logging
@@ -17,79 +25,69 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Cache directory for study sheets
-CACHE_DIR = os.path.join(os.getcwd(), "cache", "study_sheets")
-os.makedirs(CACHE_DIR, exist_ok=True)
+# Number of most relevant textbook pages returned by search_textbook_content
+TOP_TEXTBOOK_PAGES = 10
+
+# Cache of generated study sheets, shared by every worker on the host
+CACHE_DIR = os.getenv("STUDY_SHEET_CACHE_DIR", os.path.join(os.getcwd(), "cache", "study_sheets"))
+study_sheet_cache = TwoTierCache(
+    "study_sheets",
+    CACHE_DIR,
+    max_entries=int(os.getenv("STUDY_SHEET_CACHE_ENTRIES", "256")),
+    max_bytes=int(os.getenv("STUDY_SHEET_CACHE_MAX_MB", "256")) * 2**20
+)
 
 async def search_textbook_content(
     topic_name: str, 
     subject_name: str,
     education_system: Optional[str] = None,
-    grade: Optional[str] = None,
-    db = None
-) -> List[Dict[str, Any]]:
+    grade: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, float], bool]:
     """
     Search for relevant content in uploaded textbooks based on topic and subject.
-    Returns a list of relevant text snippets.
+    Returns a list of relevant text snippets, at most one per page, with their
+    character offsets in the page, the milliseconds spent per retrieval stage,
+    and whether the search failed (so its empty result must not be cached).
     """
+    timings: Dict[str, float] = {}
     try:
         # Find textbooks matching subject and grade if specified
-        query = {}
-        if subject_name:
-            query["subject"] = {"$regex": subject_name, "$options": "i"}
-        if grade:
-            query["grade"] = {"$regex": grade, "$options": "i"}
-        
-        textbooks = list(db.textbooks.find(query))
+        started = time.perf_counter()
+        textbooks = await textbooks_repo.find_by_subject_and_grade(subject_name, grade, projection={"title": 1})
+        timings["textbooks"] = round((time.perf_counter() - started) * 1000, 2)
         
         if not textbooks:
             logger.info(f"No textbooks found for subject '{subject_name}' and grade '{grade}'")
-            return []
+            return [], timings, False
         
-        # For each textbook, find relevant content
-        relevant_content = []
+        titles = {textbook["_id"]: textbook["title"] for textbook in textbooks}
         
-        for textbook in textbooks:
-            textbook_id = textbook["_id"]
-            
-            # Find content for this textbook
-            content_doc = db.textbook_content.find_one({"textbook_id": textbook_id})
-            
-            if not content_doc or not content_doc.get("content"):
-                continue
-                
-            # For a real implementation, we would use more sophisticated text search
-            # such as embedding-based semantic search or at least proper keyword search
-            # For now, we'll use a simple text match
-            topic_keywords = topic_name.lower().split()
-            
-            for page_content in content_doc["content"]:
-                content_text = page_content.get("content", "").lower()
-                
-                # Simple relevance scoring based on keyword presence
-                relevance_score = sum(1 for keyword in topic_keywords if keyword in content_text)
-                
-                if relevance_score > 0:
-                    relevant_content.append({
-                        "textbook_title": textbook["title"],
-                        "page": page_content.get("page", 0),
-                        "content": page_content["content"],
-                        "relevance_score": relevance_score
-                    })
+        # Keyword and semantic candidates of the matching textbooks, fused and reranked
+        retrieved = await hybrid_search(topic_name, list(titles), budget=TOP_TEXTBOOK_PAGES)
+        timings.update(retrieved.timings)
         
-        # Sort by relevance score
-        relevant_content.sort(key=lambda x: x["relevance_score"], reverse=True)
+        relevant_content = []
+        for candidate in retrieved.passages:
+            passage = candidate.passage
+            excerpt, start, end = snippet(passage["content"], topic_name)
+            relevant_content.append({
+                "textbook_title": titles[passage["textbook_id"]],
+                "page": passage["page"],
+                "snippet": excerpt,
+                "start": passage["start"] + start,
+                "end": passage["start"] + end,
+                "relevance_score": round(candidate.score, 4)
+            })
         
-        # Return top 10 most relevant snippets
-        return relevant_content[:10]
+        # Most relevant first
+        return relevant_content, timings, False
         
     except Exception as e:
         logger.error(f"Error searching textbook content: {str(e)}")
-        return []
+        return [], timings, True
 
 async def generate_enhanced_study_sheet(
     topic_id: str,
-    db: MongoClient,
     knowledge_level: float = 5.0,
     education_system: Optional[str] = None,
     grade: Optional[str] = None,
@@ -98,120 +96,135 @@ async def generate_enhanced_study_sheet(
 ):
     """
     Generate an enhanced study sheet using textbook content and external knowledge.
+    
+    The sheet is generated and cached for the difficulty band of ``knowledge_level``;
+    callers personalize it with personalize_study_sheet.
     """
     try:
         # Get topic and subject information
-        topic = db.topics.find_one({"_id": ObjectId(topic_id)})
+        topic = await topics_repo.get(topic_id)
         if not topic:
             logger.error(f"Topic with ID {topic_id} not found")
             raise HTTPException(status_code=404, detail="Topic not found")
             
-        subject = db.subjects.find_one({"_id": ObjectId(topic.get("subject_id", ""))})
+        subject_id = topic.get("subject_id", "")
+        subject = await subjects_repo.get(subject_id) if ObjectId.is_valid(subject_id) else None
         subject_name = subject.get("name") if subject else "Unknown"
         
         topic_name = topic.get("name", "Unknown Topic")
         
         # Check cache for existing study sheet
-        # Include all parameters that affect the content in the cache key
-        additional_info_hash = str(hash(additional_info or '')) if additional_info else 'none'
-        cache_key = f"{topic_id}_{knowledge_level}_{education_system}_{grade}_{additional_info_hash}_{use_textbooks}"
-        cache_file = os.path.join(CACHE_DIR, f"{cache_key.replace(' ', '_')}.json")
-        
-        # Add timestamp-based cache invalidation - if cache is older than 24 hours, regenerate
-        cache_exists = os.path.exists(cache_file)
-        cache_is_fresh = False
-        
-        if cache_exists:
-            cache_timestamp = os.path.getmtime(cache_file)
-            cache_age_hours = (datetime.now().timestamp() - cache_timestamp) / 3600
-            cache_is_fresh = cache_age_hours < 24  # Cache valid for 24 hours
-            
-        if cache_exists and cache_is_fresh:
+        # Include all parameters that affect the content in the cache key; the topic's
+        # content version changes on every write to its contents and the textbook index
+        # version whenever a textbook is processed, so entries never go stale
+        textbooks_version = list(await search_index.corpus_version()) if use_textbooks else None
+        band = difficulty_band(knowledge_level)
+        key = cache_key(
+            "enhanced_study_sheet", topic_id, topic.get("content_version", 0), textbooks_version,
+            "band", band, education_system, grade, additional_info or "", use_textbooks
+        )
+        cached_sheet = await asyncio.to_thread(study_sheet_cache.get, key)
+        if cached_sheet is not None:
             logger.info(f"Found fresh cached study sheet for {topic_name}")
-            with open(cache_file, "r") as f:
-                return json.load(f)
+            return cached_sheet
             
-        logger.info(f"Generating new study sheet for {topic_name} (cache_exists={cache_exists}, fresh={cache_is_fresh})")
+        # Sheets stored by another worker (or another host) are reused as well
+        async def stored_study_sheet():
+            study_sheet = await study_sheets_repo.get_by_key(key)
+            if study_sheet is not None:
+                study_sheet = await asyncio.to_thread(study_sheet_cache.set, key, study_sheet)
+            return study_sheet
         
-        # First, try to find relevant content from uploaded textbooks
-        textbook_content = []
-        if use_textbooks:
-            textbook_content = await search_textbook_content(
-                topic_name, 
-                subject_name,
-                education_system,
-                grade,
-                db
-            )
+        async def generate():
+            logger.info(f"Generating new study sheet for {topic_name}")
         
-        # Generate study sheet (in a real implementation, this would be more sophisticated)
-        # Generate a free-form study sheet using topic information
-        base_study_sheet = await generate_test_study_sheet(
-            topic_id=topic_id,
-            knowledge_level=knowledge_level,
-            fetch_only=False,  # Always generate a new sheet
-            db=db
-        )
+            # First, try to find relevant content from uploaded textbooks
+            textbook_content = []
+            retrieval_timings = {}
+            retrieval_failed = False
+            if use_textbooks:
+                textbook_content, retrieval_timings, retrieval_failed = await search_textbook_content(
+                    topic_name, 
+                    subject_name,
+                    education_system,
+                    grade
+                )
         
-        # Enhance the study sheet with textbook content
-        if textbook_content:
-            # Add a new section for textbook references
-            textbook_references = {
-                "title": "Textbook References",
-                "content": []
-            }
+            # Generate study sheet (in a real implementation, this would be more sophisticated)
+            # Generate a free-form study sheet using topic information
+            base_study_sheet = copy.deepcopy(await generate_test_study_sheet(
+                topic_id=topic_id,
+                knowledge_level=band_level(band),
+                fetch_only=False  # Always generate a new sheet
+            ))  # A copy, since the base sheet may be shared with coalesced requests
+        
+            # Enhance the study sheet with textbook content
+            if textbook_content:
+                # Add a new section for textbook references
+                textbook_references = {
+                    "title": "Textbook References",
+                    "content": []
+                }
             
-            for idx, content in enumerate(textbook_content[:5]):  # Limit to 5 references
-                textbook_references["content"].append({
-                    "type": "text",
-                    "text": f"From {content['textbook_title']}, Page {content['page']}:",
-                    "style": "italic"
-                })
-                
-                # Add a snippet of the content
-                text_snippet = content["content"]
-                if len(text_snippet) > 300:
-                    text_snippet = text_snippet[:297] + "..."
-                    
-                textbook_references["content"].append({
-                    "type": "text",
-                    "text": text_snippet,
-                    "style": "quote"
-                })
+                for idx, content in enumerate(textbook_content[:5]):  # Limit to 5 references
+                    textbook_references["content"].append({
+                        "type": "text",
+                        "text": f"From {content['textbook_title']}, Page {content['page']}:",
+                        "style": "italic"
+                    })
                 
-                # Add a separator if not the last item
-                if idx < len(textbook_content[:5]) - 1:
+                    # Add the most relevant excerpt of the page
                     textbook_references["content"].append({
-                        "type": "separator"
+                        "type": "text",
+                        "text": content["snippet"],
+                        "style": "quote"
                     })
+                
+                    # Add a separator if not the last item
+                    if idx < len(textbook_content[:5]) - 1:
+                        textbook_references["content"].append({
+                            "type": "separator"
+                        })
             
-            # Add the references section to the study sheet
-            if "sections" in base_study_sheet:
-                base_study_sheet["sections"].append(textbook_references)
+                # Add the references section to the study sheet
+                if "sections" in base_study_sheet:
+                    base_study_sheet["sections"].append(textbook_references)
             
-            # Update metadata
-            if "metadata" in base_study_sheet:
-                base_study_sheet["metadata"]["enhanced"] = True
-                base_study_sheet["metadata"]["textbook_sources"] = len(textbook_content)
-                base_study_sheet["metadata"]["education_system"] = education_system
-                base_study_sheet["metadata"]["grade"] = grade
+                # Update metadata
+                if "metadata" in base_study_sheet:
+                    base_study_sheet["metadata"]["enhanced"] = True
+                    base_study_sheet["metadata"]["textbook_sources"] = len(textbook_content)
+                    base_study_sheet["metadata"]["education_system"] = education_system
+                    base_study_sheet["metadata"]["grade"] = grade
         
-        # Add additional customization based on education system and grade
-        if "metadata" in base_study_sheet:
-            base_study_sheet["metadata"]["knowledge_level"] = knowledge_level
-            if education_system:
-                base_study_sheet["metadata"]["education_system"] = education_system
-            if grade:
-                base_study_sheet["metadata"]["grade"] = grade
-            if additional_info:
-                base_study_sheet["metadata"]["additional_info"] = additional_info
+            # Add additional customization based on education system and grade
+            if "metadata" in base_study_sheet:
+                if education_system:
+                    base_study_sheet["metadata"]["education_system"] = education_system
+                if grade:
+                    base_study_sheet["metadata"]["grade"] = grade
+                if additional_info:
+                    base_study_sheet["metadata"]["additional_info"] = additional_info
+            
+            # Per-stage retrieval latency (textbooks, lexical, vector, fusion, fetch, rerank, total)
+            for stage, elapsed_ms in retrieval_timings.items():
+                metrics.observe(f"retrieval.{stage}_ms", elapsed_ms)
+
+            # A sheet missing its textbook references because the search failed is not
+            # cached: its key only changes with the contents, so the gap would persist
+            if retrieval_failed:
+                return base_study_sheet
                 
-        # Cache the result
-        with open(cache_file, "w") as f:
-            json.dump(base_study_sheet, f)
+            # Cache the result; it is returned as stored so cached and fresh responses match
+            study_sheet = await asyncio.to_thread(study_sheet_cache.set, key, base_study_sheet)
+            await study_sheets_repo.upsert_by_key(key, study_sheet)
+            return study_sheet
         
-        return base_study_sheet
+        # Identical requests in flight (in this or another worker) share one generation
+        return await coalesce(key, stored_study_sheet, generate)
         
+    except (HTTPException, GenerationOverloaded):
+        raise
     except Exception as e:
         logger.error(f"Error generating enhanced study sheet: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate study sheet: {str(e)}")
@@ -224,8 +237,7 @@ async def create_enhanced_study_sheet(
     grade: Optional[str] = Body(None),
     additional_info: Optional[str] = Body(None),
     use_textbooks: bool = Body(True),
-    user: User = Depends(get_current_user),
-    db = Depends(get_database)
+    user: User = Depends(get_current_user)
 ):
     """
     Generate an enhanced study sheet with customization options and textbook integration.
@@ -236,7 +248,6 @@ async def create_enhanced_study_sheet(
     # Call the generator function
     study_sheet = await generate_enhanced_study_sheet(
         topic_id=topic_id,
-        db=db,
         knowledge_level=knowledge_level,
         education_system=education_system,
         grade=grade,
@@ -244,19 +255,22 @@ async def create_enhanced_study_sheet(
         use_textbooks=use_textbooks
     )
     
+    # The generated sheet is shared by the difficulty band; add what is specific to this user
+    progress = await progress_repo.get_for_topic(str(user.id), topic_id)
+    study_sheet = personalize_study_sheet(study_sheet, knowledge_level, user.username, progress or {})
+    
     # Store generation request in user history
-    db.user_history.insert_one({
-        "user_id": user.id,
-        "action": "generate_enhanced_study_sheet",
-        "topic_id": ObjectId(topic_id),
-        "parameters": {
+    await user_history_repo.record(
+        user.id,
+        "generate_enhanced_study_sheet",
+        topic_id=ObjectId(topic_id),
+        parameters={
             "knowledge_level": knowledge_level,
             "education_system": education_system,
             "grade": grade,
             "use_textbooks": use_textbooks
-        },
-        "timestamp": datetime.utcnow()
-    })
+        }
+    )
     
     return study_sheet
 
@@ -268,8 +282,7 @@ async def test_enhanced_study_sheet(
     education_system: Optional[str] = Body(None),
     grade: Optional[str] = Body(None),
     additional_info: Optional[str] = Body(None),
-    use_textbooks: bool = Body(True),
-    db = Depends(get_database)
+    use_textbooks: bool = Body(True)
 ):
     """
     Test endpoint for generating an enhanced study sheet without authentication.
@@ -280,7 +293,6 @@ async def test_enhanced_study_sheet(
     # Call the generator function
     study_sheet = await generate_enhanced_study_sheet(
         topic_id=topic_id,
-        db=db,
         knowledge_level=knowledge_level,
         education_system=education_system,
         grade=grade,
@@ -288,4 +300,4 @@ async def test_enhanced_study_sheet(
         use_textbooks=use_textbooks
     )
     
-    return study_sheet
+    return personalize_study_sheet(study_sheet, knowledge_level)
@@ -1,21 +1,27 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Any, Optional
-from app.schemas.models import Question, QuestionCreate, QuestionInDB
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response, Body
+from typing import List, Any, Optional, Union
+from app.schemas.models import Question, QuestionSummary, BulkResult, QuestionCreate, QuestionInDB
 from app.utils.auth import get_current_user
-from app.database import questions_collection, topics_collection, contents_collection
+from app.utils.pagination import PageParams, set_next_cursor
+from app.utils.projection import ListView, projection_for
+from app.utils.bulk import BulkBatch
+from app.repositories import questions_repo, topics_repo, contents_repo
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Question])
+@router.get("/", response_model=Union[List[Question], List[QuestionSummary]])
 async def read_questions(
+    response: Response,
     topic_id: Optional[str] = Query(None, description="Filter questions by topic ID"),
     content_id: Optional[str] = Query(None, description="Filter questions by content ID"),
-    difficulty: Optional[float] = Query(None, description="Filter by difficulty level")
+    difficulty: Optional[float] = Query(None, description="Filter by difficulty level"),
+    view: ListView = Query(ListView.full, description="summary returns only the fields list views need"),
+    page: PageParams = Depends()
 ) -> Any:
     """
-    Retrieve questions, optionally filtered by topic, content, and difficulty
+    Retrieve questions, optionally filtered by topic, content, and difficulty, one page at a time
     """
     query = {}
     if topic_id:
@@ -37,7 +43,14 @@ async def read_questions(
     if difficulty is not None:
         query["difficulty"] = difficulty
         
-    questions = await questions_collection.find(query).to_list(1000)
+    projection = projection_for(QuestionSummary) if view == ListView.summary else None
+    questions, next_cursor = await questions_repo.paginate(
+        query,
+        limit=page.limit,
+        after=page.after,
+        projection=projection
+    )
+    set_next_cursor(response, next_cursor)
     return questions
 
 @router.get("/{question_id}", response_model=Question)
@@ -51,7 +64,7 @@ async def read_question(question_id: str) -> Any:
             detail="Invalid question ID format"
         )
     
-    question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+    question = await questions_repo.get(question_id)
     if not question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,8 +84,7 @@ async def create_question(question: QuestionCreate, current_user: Any = Depends(
             detail="Invalid topic ID format"
         )
         
-    topic = await topics_collection.find_one({"_id": ObjectId(question.topic_id)})
-    if not topic:
+    if not await topics_repo.exists(question.topic_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
@@ -86,8 +98,7 @@ async def create_question(question: QuestionCreate, current_user: Any = Depends(
                 detail="Invalid content ID format"
             )
             
-        content = await contents_collection.find_one({"_id": ObjectId(question.content_id)})
-        if not content:
+        if not await contents_repo.exists(question.content_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Content not found"
@@ -99,13 +110,28 @@ async def create_question(question: QuestionCreate, current_user: Any = Depends(
     question_dict["created_at"] = now
     question_dict["updated_at"] = now
     
-    # Insert into database
-    result = await questions_collection.insert_one(question_dict)
-    
-    # Get the created question
-    created_question = await questions_collection.find_one({"_id": result.inserted_id})
+    # Insert into database and return the stored document
+    created_question = await questions_repo.create(question_dict)
+    await topics_repo.bump_content_version([created_question["topic_id"]])
     return created_question
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_questions_bulk(
+    items: List[Any] = Body(...),
+    current_user: Any = Depends(get_current_user)
+) -> Any:
+    """
+    Create many questions in one request (requires authentication).
+    Invalid items are reported individually and do not stop the others.
+    """
+    batch = BulkBatch(items, QuestionCreate)
+    await batch.check_references("topic_id", topics_repo, "topic")
+    await batch.check_references("content_id", contents_repo, "content", required=False)
+    result, created = await batch.insert(questions_repo)
+    if created:
+        await topics_repo.bump_content_version(question["topic_id"] for question in created)
+    return result
+
 @router.put("/{question_id}", response_model=Question)
 async def update_question(
     question_id: str, 
@@ -121,14 +147,6 @@ async def update_question(
             detail="Invalid question ID format"
         )
     
-    # Check if question exists
-    question = await questions_collection.find_one({"_id": ObjectId(question_id)})
-    if not question:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Question not found"
-        )
-    
     # Validate topic_id exists
     if not ObjectId.is_valid(question_update.topic_id):
         raise HTTPException(
@@ -136,24 +154,24 @@ async def update_question(
             detail="Invalid topic ID format"
         )
         
-    topic = await topics_collection.find_one({"_id": ObjectId(question_update.topic_id)})
-    if not topic:
+    if not await topics_repo.exists(question_update.topic_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
         )
     
-    # Update question
+    # Update question in one round trip; the previous topic is needed when the question moves
     question_dict = question_update.dict()
     question_dict["updated_at"] = datetime.utcnow()
     
-    await questions_collection.update_one(
-        {"_id": ObjectId(question_id)},
-        {"$set": question_dict}
-    )
-    
-    # Get updated question
-    updated_question = await questions_collection.find_one({"_id": ObjectId(question_id)})
+    previous_question = await questions_repo.update_and_get(question_id, question_dict, previous=True)
+    if not previous_question:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
+        )
+    updated_question = {**previous_question, **question_dict}
+    await topics_repo.bump_content_version([previous_question.get("topic_id", ""), updated_question["topic_id"]])
     return updated_question
 
 @router.delete("/{question_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -170,14 +188,12 @@ async def delete_question(
             detail="Invalid question ID format"
         )
     
-    # Check if question exists
-    question = await questions_collection.find_one({"_id": ObjectId(question_id)})
-    if not question:
+    # Delete question
+    deleted_question = await questions_repo.delete_and_get(question_id)
+    if not deleted_question:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Question not found"
         )
-    
-    # Delete question
-    await questions_collection.delete_one({"_id": ObjectId(question_id)})
+    await topics_repo.bump_content_version([deleted_question.get("topic_id", "")])
     return None
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from app.repositories import contents_repo, topics_repo
+from app.schemas.models import ContentSearchHit, ContentSearchResults
+from app.search.snippets import highlights, snippet
+from app.api.contents import VALID_CONTENT_TYPES
+
+router = APIRouter()
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Text search results are ranked, so pages are addressed by offset; deep paging is capped
+MAX_SEARCH_OFFSET = 1000
+
+@router.get("/", response_model=ContentSearchResults)
+async def search_contents(
+    q: str = Query(..., min_length=1, max_length=200, description="Words or \"quoted phrases\" to search for"),
+    subject_id: Optional[str] = Query(None, description="Only contents of topics in this subject"),
+    topic_id: Optional[str] = Query(None, description="Only contents of this topic"),
+    content_type: Optional[str] = Query(None, description="Filter by content type (explanation, example, resource, practice)"),
+    min_difficulty: Optional[float] = Query(None, ge=0),
+    max_difficulty: Optional[float] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET)
+) -> Any:
+    """
+    Full-text search over content titles and bodies, most relevant first.
+
+    Each result carries a short snippet of the body around the matched words,
+    with the [start, end] offsets of the matches in the title and snippet for
+    highlighting. ``next_offset`` is set when more results follow.
+    """
+    filters: Dict[str, Any] = {}
+    if topic_id:
+        if not ObjectId.is_valid(topic_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid topic ID format"
+            )
+        filters["topic_id"] = topic_id
+    elif subject_id:
+        if not ObjectId.is_valid(subject_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid subject ID format"
+            )
+        topics = await topics_repo.find({"subject_id": subject_id}, projection={"_id": 1})
+        filters["topic_id"] = {"$in": [str(topic["_id"]) for topic in topics]}
+
+    if content_type:
+        if content_type not in VALID_CONTENT_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid content type. Must be one of {VALID_CONTENT_TYPES}"
+            )
+        filters["type"] = content_type
+
+    difficulty = {}
+    if min_difficulty is not None:
+        difficulty["$gte"] = min_difficulty
+    if max_difficulty is not None:
+        difficulty["$lte"] = max_difficulty
+    if difficulty:
+        filters["difficulty"] = difficulty
+
+    # One extra result tells whether another page exists
+    contents = await contents_repo.text_search(
+        q,
+        filters,
+        skip=offset,
+        limit=limit + 1,
+        projection={"topic_id": 1, "type": 1, "title": 1, "difficulty": 1, "body": 1}
+    )
+    next_offset = offset + limit if len(contents) > limit else None
+
+    results = []
+    for content in contents[:limit]:
+        excerpt, _, _ = snippet(content.get("body", ""), q)
+        title = content.get("title", "")
+        results.append(ContentSearchHit(
+            _id=content["_id"],
+            topic_id=content.get("topic_id", ""),
+            type=content.get("type", ""),
+            title=title,
+            difficulty=content.get("difficulty", 5.0),
+            score=content["score"],
+            snippet=excerpt,
+            title_highlights=[list(span) for span in highlights(title, q)],
+            snippet_highlights=[list(span) for span in highlights(excerpt, q)]
+        ))
+
+    return ContentSearchResults(results=results, next_offset=next_offset)
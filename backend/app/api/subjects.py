@@ -1,19 +1,21 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response
 from typing import List, Any
 from app.schemas.models import Subject, SubjectCreate, SubjectInDB
 from app.utils.auth import get_current_user
-from app.database import subjects_collection
+from app.utils.pagination import PageParams, set_next_cursor
+from app.repositories import subjects_repo
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Subject])
-async def read_subjects() -> Any:
+async def read_subjects(response: Response, page: PageParams = Depends()) -> Any:
     """
-    Retrieve all subjects
+    Retrieve subjects, one page at a time
     """
-    subjects = await subjects_collection.find().to_list(1000)
+    subjects, next_cursor = await subjects_repo.paginate(limit=page.limit, after=page.after)
+    set_next_cursor(response, next_cursor)
     return subjects
 
 @router.get("/{subject_id}", response_model=Subject)
@@ -27,7 +29,7 @@ async def read_subject(subject_id: str) -> Any:
             detail="Invalid subject ID format"
         )
     
-    subject = await subjects_collection.find_one({"_id": ObjectId(subject_id)})
+    subject = await subjects_repo.get(subject_id)
     if not subject:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -46,11 +48,8 @@ async def create_subject(subject: SubjectCreate, current_user: Any = Depends(get
     subject_dict["created_at"] = now
     subject_dict["updated_at"] = now
     
-    # Insert into database
-    result = await subjects_collection.insert_one(subject_dict)
-    
-    # Get the created subject
-    created_subject = await subjects_collection.find_one({"_id": result.inserted_id})
+    # Insert into database and return the stored document
+    created_subject = await subjects_repo.create(subject_dict)
     return created_subject
 
 @router.put("/{subject_id}", response_model=Subject)
@@ -68,25 +67,16 @@ async def update_subject(
             detail="Invalid subject ID format"
         )
     
-    # Check if subject exists
-    subject = await subjects_collection.find_one({"_id": ObjectId(subject_id)})
-    if not subject:
+    # Update subject and get the updated document in one round trip
+    subject_dict = subject_update.dict()
+    subject_dict["updated_at"] = datetime.utcnow()
+    
+    updated_subject = await subjects_repo.update_and_get(subject_id, subject_dict)
+    if not updated_subject:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Subject not found"
         )
-    
-    # Update subject
-    subject_dict = subject_update.dict()
-    subject_dict["updated_at"] = datetime.utcnow()
-    
-    await subjects_collection.update_one(
-        {"_id": ObjectId(subject_id)},
-        {"$set": subject_dict}
-    )
-    
-    # Get updated subject
-    updated_subject = await subjects_collection.find_one({"_id": ObjectId(subject_id)})
     return updated_subject
 
 @router.delete("/{subject_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -103,14 +93,10 @@ async def delete_subject(
             detail="Invalid subject ID format"
         )
     
-    # Check if subject exists
-    subject = await subjects_collection.find_one({"_id": ObjectId(subject_id)})
-    if not subject:
+    # Delete subject
+    if not await subjects_repo.delete(subject_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Subject not found"
         )
-    
-    # Delete subject
-    await subjects_collection.delete_one({"_id": ObjectId(subject_id)})
     return None
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import JSONResponse
 from typing import Optional, List, Dict, Any
 from bson import ObjectId
+from datetime import datetime
 import asyncio
 
-from ..database import get_database
-from ..ai.content_generator import ContentGenerator
+from ..repositories import subjects_repo, topics_repo, contents_repo, study_sheets_repo
+from ..ai.executor import generation_executor, build_study_sheet, GenerationOverloaded
+from ..ai.study_sheet_overlay import band_level, difficulty_band, personalize_study_sheet
+from ..utils.pagination import PageParams, set_next_cursor
+from ..utils.cache import cache_key
+from ..utils.singleflight import coalesce
 
 # Import our SimpleContentGenerator as fallback
 import sys
@@ -19,12 +24,13 @@ router = APIRouter(
 )
 
 @router.get("/subjects")
-async def list_subjects(db = Depends(get_database)):
+async def list_subjects(response: Response, page: PageParams = Depends()):
     """
-    List all subjects without requiring authentication.
+    List subjects without requiring authentication, one page at a time.
     For testing purposes only.
     """
-    subjects = list(db["subjects"].find())
+    subjects, next_cursor = await subjects_repo.paginate(limit=page.limit, after=page.after)
+    set_next_cursor(response, next_cursor)
     
     # Convert ObjectId to string for each subject
     for subject in subjects:
@@ -33,9 +39,19 @@ async def list_subjects(db = Depends(get_database)):
     return subjects
 
 @router.get("/topics")
-async def list_topics(db = Depends(get_database)):
-    """List all available topics without authentication"""
-    topics = list(db["topics"].find())
+async def list_topics(
+    response: Response,
+    subject_id: Optional[str] = Query(None, description="Filter topics by subject ID"),
+    page: PageParams = Depends()
+):
+    """List available topics, optionally of one subject, without authentication, one page at a time"""
+    query = {}
+    if subject_id:
+        if not ObjectId.is_valid(subject_id):
+            raise HTTPException(status_code=400, detail="Invalid subject ID format")
+        query["subject_id"] = subject_id
+    topics, next_cursor = await topics_repo.paginate(query, limit=page.limit, after=page.after)
+    set_next_cursor(response, next_cursor)
     for topic in topics:
         topic["_id"] = str(topic["_id"])
     return topics
@@ -44,8 +60,7 @@ async def list_topics(db = Depends(get_database)):
 async def generate_test_study_sheet(
     topic_id: str,
     knowledge_level: float = Query(5.0, ge=1.0, le=10.0),
-    fetch_only: bool = Query(False),
-    db = Depends(get_database)
+    fetch_only: bool = Query(False)
 ):
     """Generate a study sheet for a topic without authentication"""
     try:
@@ -54,12 +69,15 @@ async def generate_test_study_sheet(
             raise HTTPException(status_code=400, detail="Invalid topic ID format")
             
         # Get the topic
-        topic = db["topics"].find_one({"_id": ObjectId(topic_id)})
+        topic = await topics_repo.get(topic_id)
         if not topic:
             raise HTTPException(status_code=404, detail="Topic not found")
         
+        # Stored sheets are only reused while the topic's contents are unchanged
+        content_version = topic.get("content_version", 0)
+        
         # Get contents for this topic
-        contents = list(db["contents"].find({"topic_id": topic_id}))
+        contents = await contents_repo.list_by_topic(topic_id)
         
         if not contents:
             raise HTTPException(status_code=404, detail="No content found for this topic")
@@ -71,32 +89,30 @@ async def generate_test_study_sheet(
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
     
     try:
-        # If fetch_only is True, try to get an existing study sheet first
+        # Sheets are generated once per difficulty band and personalized below;
+        # identical requests in flight (in this or another worker) share one generation
+        band = difficulty_band(knowledge_level)
+        key = cache_key("study_sheet", topic_id, content_version, "band", band)
+        
+        # If fetch_only is True, try to get an existing sheet for this band and version first
         if fetch_only:
-            # Check if a study sheet already exists for this topic
-            existing_study_sheet = db["study_sheets"].find_one({"topic_id": topic_id})
+            existing_study_sheet = await study_sheets_repo.get_by_key(key)
             if existing_study_sheet:
-                # Convert ObjectId to string
-                existing_study_sheet["_id"] = str(existing_study_sheet["_id"])
-                return existing_study_sheet
+                return personalize_study_sheet(existing_study_sheet, knowledge_level)
+        
+        requested_at = datetime.utcnow()
+        
+        async def stored_study_sheet():
+            return await study_sheets_repo.get_by_key(key, generated_after=requested_at)
         
-        try:
-            # Try to use the original ContentGenerator
-            content_generator = ContentGenerator()
-            study_sheet = await content_generator.generate_study_sheet(
-                topic_id=topic_id,
-                user_knowledge_level=knowledge_level,
-                contents=contents
-            )
-        except Exception as e:
-            # If that fails, use our SimpleContentGenerator
-            print(f"Using fallback generator due to error: {str(e)}")
-            simple_generator = SimpleContentGenerator()
-            study_sheet = await simple_generator.generate_study_sheet(
-                topic_id=topic_id,
-                user_knowledge_level=knowledge_level,
-                contents=contents
-            )
+        async def generate():
+            study_sheet = await _generate_study_sheet(topic_id, band_level(band), contents)
+            await _store_study_sheet(key, study_sheet, content_version)
+            return study_sheet
+        
+        study_sheet = await coalesce(key, stored_study_sheet, generate)
+    except GenerationOverloaded:
+        raise
     except Exception as e:
         # Log any errors during study sheet generation
         import traceback
@@ -106,22 +122,7 @@ async def generate_test_study_sheet(
         
     # Final result block with error handling
     try:
-        # Store the generated study sheet in the database for future fetching
-        try:
-            # Add created_at timestamp if not present
-            if "created_at" not in study_sheet:
-                from datetime import datetime
-                study_sheet["created_at"] = datetime.now().isoformat()
-            
-            # Remove _id if present (to avoid issues with insert)
-            if "_id" in study_sheet:
-                del study_sheet["_id"]
-                
-            # Insert the new study sheet
-            db["study_sheets"].insert_one(study_sheet)
-        except Exception as e:
-            print(f"Failed to store study sheet: {str(e)}")
-            # Continue even if storage fails - we still want to return the generated sheet
+        study_sheet = personalize_study_sheet(study_sheet, knowledge_level)
         
         # Make sure topic_id is a string in the response
         if "topic_id" in study_sheet and not isinstance(study_sheet["topic_id"], str):
@@ -134,3 +135,37 @@ async def generate_test_study_sheet(
         print(f"Error in final processing of study sheet: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error finalizing study sheet: {str(e)}")
+
+
+async def _generate_study_sheet(topic_id: str, knowledge_level: float, contents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        # Try to use the original ContentGenerator, in a generation worker process
+        study_sheet, _ = await generation_executor.submit(build_study_sheet, topic_id, knowledge_level, contents)
+    except GenerationOverloaded:
+        raise
+    except Exception as e:
+        # If that fails, use our SimpleContentGenerator
+        print(f"Using fallback generator due to error: {str(e)}")
+        simple_generator = SimpleContentGenerator()
+        study_sheet = await simple_generator.generate_study_sheet(
+            topic_id=topic_id,
+            user_knowledge_level=knowledge_level,
+            contents=contents
+        )
+    
+    # Add created_at timestamp if not present
+    if "created_at" not in study_sheet:
+        study_sheet["created_at"] = datetime.now().isoformat()
+    
+    # Remove _id if present so it does not leak into the response
+    study_sheet.pop("_id", None)
+    return study_sheet
+
+
+async def _store_study_sheet(key: str, study_sheet: Dict[str, Any], content_version: int) -> None:
+    """Store the generated study sheet in the database for future fetching (one per key)."""
+    try:
+        await study_sheets_repo.upsert_by_key(key, {**study_sheet, "content_version": content_version})
+    except Exception as e:
+        print(f"Failed to store study sheet: {str(e)}")
+        # Continue even if storage fails - we still want to return the generated sheet
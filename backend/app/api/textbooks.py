@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, status
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Query, status
 from fastapi.responses import JSONResponse
-from typing import Optional
+from typing import Optional, List, Union
 from datetime import datetime
 import os
 import shutil
 import uuid
-from pymongo import MongoClient
+import asyncio
 from bson import ObjectId
-from app.database import get_database
+from app.repositories import textbooks_repo, textbook_content_repo, jobs_repo
+from app.jobs import JobProgress, job_handler, enqueue
 from app.utils.auth import get_current_user
-from app.schemas.models import User
-import pypdf
+from app.schemas.models import User, Textbook, TextbookSummary, TextbookStatus
+from app.utils.projection import ListView, projection_for
+from app.utils.pdf_extraction import count_pdf_pages, extract_pdf_pages
+from app.utils.canonical import subject_key, grade_key
+from app.search.passages import index_textbook_passages
 
 router = APIRouter()
 
@@ -18,45 +22,17 @@ router = APIRouter()
 UPLOAD_DIR = os.path.join(os.getcwd(), "uploads", "textbooks")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# Function to extract text from PDF files
-def extract_text_from_pdf(file_path: str):
-    try:
-        text_content = []
-        with open(file_path, 'rb') as file:
-            pdf_reader = pypdf.PdfReader(file)
-            num_pages = len(pdf_reader.pages)
-            
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
-                if text:
-                    text_content.append({
-                        "page": page_num + 1,
-                        "content": text
-                    })
-        
-        return text_content, num_pages
-    except Exception as e:
-        print(f"Error extracting text from PDF: {str(e)}")
-        return [], 0
-
 # Process textbook and extract knowledge
-async def process_textbook(textbook_id: str, db: MongoClient):
+async def process_textbook(textbook_id: str, progress: Optional[JobProgress] = None) -> int:
+    # Get textbook record
+    textbook = await textbooks_repo.get(textbook_id)
+    if not textbook:
+        raise LookupError(f"Textbook with ID {textbook_id} not found")
+    
     try:
-        # Get textbook record
-        textbook = db.textbooks.find_one({"_id": ObjectId(textbook_id)})
-        if not textbook:
-            print(f"Textbook with ID {textbook_id} not found")
-            return
-        
         file_path = textbook.get("file_path")
         if not file_path or not os.path.exists(file_path):
-            print(f"File not found at path: {file_path}")
-            db.textbooks.update_one(
-                {"_id": ObjectId(textbook_id)},
-                {"$set": {"status": "error", "error_message": "File not found"}}
-            )
-            return
+            raise FileNotFoundError(f"File not found at path: {file_path}")
         
         # Extract text based on file type
         file_extension = os.path.splitext(file_path)[1].lower()
@@ -64,7 +40,13 @@ async def process_textbook(textbook_id: str, db: MongoClient):
         num_pages = 0
         
         if file_extension == '.pdf':
-            text_content, num_pages = extract_text_from_pdf(file_path)
+            # Pages are extracted in worker processes and stored as they finish
+            num_pages = await asyncio.to_thread(count_pdf_pages, file_path)
+            text_content = extract_pdf_pages(
+                file_path,
+                num_pages,
+                on_error=progress.error if progress else None
+            )
         elif file_extension in ['.txt', '.text']:
             with open(file_path, 'r', encoding='utf-8') as file:
                 content = file.read()
@@ -76,37 +58,40 @@ async def process_textbook(textbook_id: str, db: MongoClient):
             text_content = [{"page": 1, "content": "DOCX processing would be implemented here"}]
             num_pages = 1
         
-        # Store extracted content in database
-        db.textbook_content.insert_one({
-            "textbook_id": ObjectId(textbook_id),
-            "content": text_content,
-            "processed_at": datetime.utcnow()
-        })
+        if progress:
+            await progress.set_total(num_pages)
+        
+        # Store extracted content in database, one document per page
+        await textbook_content_repo.save_pages(
+            textbook_id,
+            text_content,
+            on_batch=progress.advance if progress else None
+        )
+        
+        # Split the pages into passages and index them for search_textbook_content
+        await index_textbook_passages(textbook_id)
         
         # Update textbook status
-        db.textbooks.update_one(
-            {"_id": ObjectId(textbook_id)},
-            {
-                "$set": {
-                    "status": "processed",
-                    "pages_processed": num_pages,
-                    "processed_at": datetime.utcnow()
-                }
-            }
+        await textbooks_repo.set_status(
+            textbook_id,
+            "processed",
+            pages_processed=num_pages,
+            processed_at=datetime.utcnow()
         )
         
         print(f"Successfully processed textbook {textbook_id} with {num_pages} pages")
-        
-        # Index the content for future retrieval
-        # This would involve more sophisticated text processing in a real implementation
-        # For now, we're just storing the raw text
+        return num_pages
         
     except Exception as e:
         print(f"Error processing textbook {textbook_id}: {str(e)}")
-        db.textbooks.update_one(
-            {"_id": ObjectId(textbook_id)},
-            {"$set": {"status": "error", "error_message": str(e)}}
-        )
+        await textbooks_repo.set_status(textbook_id, "error", error_message=str(e))
+        raise
+
+@job_handler("process_textbook")
+async def run_process_textbook_job(job, progress: JobProgress):
+    num_pages = await process_textbook(str(job["textbook_id"]), progress)
+    # Pages without any text are not stored but still count as processed
+    await progress.advance(num_pages)
 
 @router.post("/upload", status_code=status.HTTP_201_CREATED)
 async def upload_textbook(
@@ -115,8 +100,7 @@ async def upload_textbook(
     subject: str = Form(...),
     grade: str = Form(...),
     description: str = Form(""),
-    user: User = Depends(get_current_user),
-    db = Depends(get_database)
+    user: User = Depends(get_current_user)
 ):
     """
     Upload a textbook file (PDF, DOCX, TXT) and process it for use in study sheet generation.
@@ -139,10 +123,12 @@ async def upload_textbook(
             shutil.copyfileobj(file.file, file_object)
             
         # Create textbook record in database
-        textbook_id = db.textbooks.insert_one({
+        textbook_id = await textbooks_repo.insert({
             "title": title,
             "subject": subject,
             "grade": grade,
+            "subject_key": subject_key(subject),
+            "grade_key": grade_key(grade),
             "description": description,
             "filename": file.filename,
             "file_path": file_location,
@@ -150,13 +136,14 @@ async def upload_textbook(
             "uploaded_at": datetime.utcnow(),
             "status": "processing",
             "file_size": os.path.getsize(file_location),
-        }).inserted_id
+        })
         
-        # Process textbook in background (in a real app, this would be a background task)
-        await process_textbook(str(textbook_id), db)
+        # Processing runs on the job queue; poll GET /{id}/status for progress
+        job = await enqueue("process_textbook", textbook_id=textbook_id)
         
         return {
             "id": str(textbook_id),
+            "job_id": str(job["_id"]),
             "title": title,
             "subject": subject,
             "grade": grade,
@@ -171,29 +158,24 @@ async def upload_textbook(
             os.remove(file_location)
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
-@router.get("/")
+@router.get("/", response_model=Union[List[Textbook], List[TextbookSummary]])
 async def get_textbooks(
-    user: User = Depends(get_current_user),
-    db = Depends(get_database)
+    view: ListView = Query(ListView.full, description="summary returns only the fields list views need"),
+    user: User = Depends(get_current_user)
 ):
     """
     Get a list of all textbooks uploaded by the user.
     """
-    textbooks = list(db.textbooks.find({"uploaded_by": user.id}))
-    
-    for textbook in textbooks:
-        textbook["_id"] = str(textbook["_id"])
-        # Don't expose file path
-        if "file_path" in textbook:
-            del textbook["file_path"]
+    # The response models never include file_path, so it is not exposed
+    model = TextbookSummary if view == ListView.summary else Textbook
+    textbooks = await textbooks_repo.list_by_uploader(user.id, projection=projection_for(model))
     
     return textbooks
 
 @router.get("/{textbook_id}")
 async def get_textbook(
     textbook_id: str,
-    user: User = Depends(get_current_user),
-    db = Depends(get_database)
+    user: User = Depends(get_current_user)
 ):
     """
     Get details for a specific textbook.
@@ -201,7 +183,7 @@ async def get_textbook(
     if not ObjectId.is_valid(textbook_id):
         raise HTTPException(status_code=400, detail="Invalid textbook ID")
     
-    textbook = db.textbooks.find_one({"_id": ObjectId(textbook_id)})
+    textbook = await textbooks_repo.get(textbook_id)
     
     if not textbook:
         raise HTTPException(status_code=404, detail="Textbook not found")
@@ -217,6 +199,40 @@ async def get_textbook(
     
     return textbook
 
+@router.get("/{textbook_id}/status", response_model=TextbookStatus)
+async def get_textbook_status(
+    textbook_id: str,
+    user: User = Depends(get_current_user)
+):
+    """
+    Get the processing progress of a textbook.
+    """
+    if not ObjectId.is_valid(textbook_id):
+        raise HTTPException(status_code=400, detail="Invalid textbook ID")
+    
+    textbook = await textbooks_repo.get(textbook_id)
+    
+    if not textbook:
+        raise HTTPException(status_code=404, detail="Textbook not found")
+    
+    if str(textbook.get("uploaded_by")) != str(user.id):
+        raise HTTPException(status_code=403, detail="You don't have permission to access this textbook")
+    
+    job = await jobs_repo.latest_for_textbook(textbook_id)
+    if not job:
+        return TextbookStatus(textbook_id=textbook_id, status=textbook.get("status", "processing"))
+    
+    return TextbookStatus(
+        textbook_id=textbook_id,
+        status=textbook.get("status", "processing"),
+        job_id=str(job["_id"]),
+        state=job["state"],
+        pages_done=job.get("pages_done", 0),
+        pages_total=job.get("pages_total"),
+        errors=job.get("errors", []),
+        updated_at=job.get("updated_at")
+    )
+
 # Test endpoint that doesn't require authentication
 @router.post("/test/upload", status_code=status.HTTP_201_CREATED)
 async def test_upload_textbook(
@@ -224,8 +240,7 @@ async def test_upload_textbook(
     title: str = Form(...),
     subject: str = Form(...),
     grade: str = Form(...),
-    description: str = Form(""),
-    db = Depends(get_database)
+    description: str = Form("")
 ):
     """
     Test endpoint for uploading a textbook without authentication.
@@ -1,19 +1,25 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Any, Optional
-from app.schemas.models import Topic, TopicCreate, TopicInDB
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response, Body
+from typing import List, Any, Optional, Union
+from app.schemas.models import Topic, TopicSummary, BulkResult, TopicCreate, TopicInDB
 from app.utils.auth import get_current_user
-from app.database import topics_collection, subjects_collection
+from app.utils.pagination import PageParams, set_next_cursor
+from app.utils.projection import ListView, projection_for
+from app.utils.bulk import BulkBatch
+from app.repositories import topics_repo, subjects_repo
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Topic])
+@router.get("/", response_model=Union[List[Topic], List[TopicSummary]])
 async def read_topics(
-    subject_id: Optional[str] = Query(None, description="Filter topics by subject ID")
+    response: Response,
+    subject_id: Optional[str] = Query(None, description="Filter topics by subject ID"),
+    view: ListView = Query(ListView.full, description="summary returns only the fields list views need"),
+    page: PageParams = Depends()
 ) -> Any:
     """
-    Retrieve topics, optionally filtered by subject
+    Retrieve topics, optionally filtered by subject, one page at a time
     """
     query = {}
     if subject_id:
@@ -24,7 +30,14 @@ async def read_topics(
             )
         query["subject_id"] = subject_id
         
-    topics = await topics_collection.find(query).to_list(1000)
+    projection = projection_for(TopicSummary) if view == ListView.summary else None
+    topics, next_cursor = await topics_repo.paginate(
+        query,
+        limit=page.limit,
+        after=page.after,
+        projection=projection
+    )
+    set_next_cursor(response, next_cursor)
     return topics
 
 @router.get("/{topic_id}", response_model=Topic)
@@ -38,7 +51,7 @@ async def read_topic(topic_id: str) -> Any:
             detail="Invalid topic ID format"
         )
     
-    topic = await topics_collection.find_one({"_id": ObjectId(topic_id)})
+    topic = await topics_repo.get(topic_id)
     if not topic:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -58,8 +71,7 @@ async def create_topic(topic: TopicCreate, current_user: Any = Depends(get_curre
             detail="Invalid subject ID format"
         )
         
-    subject = await subjects_collection.find_one({"_id": ObjectId(topic.subject_id)})
-    if not subject:
+    if not await subjects_repo.exists(topic.subject_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Subject not found"
@@ -71,13 +83,24 @@ async def create_topic(topic: TopicCreate, current_user: Any = Depends(get_curre
     topic_dict["created_at"] = now
     topic_dict["updated_at"] = now
     
-    # Insert into database
-    result = await topics_collection.insert_one(topic_dict)
-    
-    # Get the created topic
-    created_topic = await topics_collection.find_one({"_id": result.inserted_id})
+    # Insert into database and return the stored document
+    created_topic = await topics_repo.create(topic_dict)
     return created_topic
 
+@router.post("/bulk", response_model=BulkResult)
+async def create_topics_bulk(
+    items: List[Any] = Body(...),
+    current_user: Any = Depends(get_current_user)
+) -> Any:
+    """
+    Create many topics in one request (requires authentication).
+    Invalid items are reported individually and do not stop the others.
+    """
+    batch = BulkBatch(items, TopicCreate)
+    await batch.check_references("subject_id", subjects_repo, "subject")
+    result, _ = await batch.insert(topics_repo)
+    return result
+
 @router.put("/{topic_id}", response_model=Topic)
 async def update_topic(
     topic_id: str, 
@@ -93,14 +116,6 @@ async def update_topic(
             detail="Invalid topic ID format"
         )
     
-    # Check if topic exists
-    topic = await topics_collection.find_one({"_id": ObjectId(topic_id)})
-    if not topic:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Topic not found"
-        )
-    
     # Validate subject_id exists
     if not ObjectId.is_valid(topic_update.subject_id):
         raise HTTPException(
@@ -108,24 +123,23 @@ async def update_topic(
             detail="Invalid subject ID format"
         )
         
-    subject = await subjects_collection.find_one({"_id": ObjectId(topic_update.subject_id)})
-    if not subject:
+    if not await subjects_repo.exists(topic_update.subject_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Subject not found"
         )
     
-    # Update topic
+    # Update topic and get the updated document in one round trip; the topic's
+    # name and description are part of its study sheets, so its content version moves on
     topic_dict = topic_update.dict()
     topic_dict["updated_at"] = datetime.utcnow()
     
-    await topics_collection.update_one(
-        {"_id": ObjectId(topic_id)},
-        {"$set": topic_dict}
-    )
-    
-    # Get updated topic
-    updated_topic = await topics_collection.find_one({"_id": ObjectId(topic_id)})
+    updated_topic = await topics_repo.update_and_get(topic_id, topic_dict, increments={"content_version": 1})
+    if not updated_topic:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Topic not found"
+        )
     return updated_topic
 
 @router.delete("/{topic_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -142,14 +156,10 @@ async def delete_topic(
             detail="Invalid topic ID format"
         )
     
-    # Check if topic exists
-    topic = await topics_collection.find_one({"_id": ObjectId(topic_id)})
-    if not topic:
+    # Delete topic
+    if not await topics_repo.delete(topic_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Topic not found"
         )
-    
-    # Delete topic
-    await topics_collection.delete_one({"_id": ObjectId(topic_id)})
     return None
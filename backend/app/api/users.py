@@ -1,23 +1,30 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Response
 from typing import List, Any, Dict
 from app.schemas.models import User, UserCreate, UserInDB, Progress, ProgressCreate
 from app.utils.auth import get_current_user, get_password_hash
-from app.database import users_collection, progress_collection
+from app.utils.pagination import PageParams, set_next_cursor
+from app.repositories import users_repo, progress_repo
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/me/progress", response_model=List[Progress])
 async def read_user_progress(
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    page: PageParams = Depends()
 ) -> Any:
     """
-    Get current user's learning progress
+    Get current user's learning progress, one page at a time
     """
-    progress = await progress_collection.find(
-        {"user_id": str(current_user.id)}
-    ).to_list(1000)
+    progress, next_cursor = await progress_repo.paginate(
+        {"user_id": str(current_user.id)},
+        limit=page.limit,
+        after=page.after
+    )
+    set_next_cursor(response, next_cursor)
     return progress
 
 @router.post("/me/progress", response_model=Progress)
@@ -35,36 +42,13 @@ async def update_user_progress(
             detail="User ID does not match authenticated user"
         )
     
-    # Check if progress record exists
-    existing_progress = await progress_collection.find_one({
-        "user_id": progress.user_id,
-        "topic_id": progress.topic_id
-    })
-    
     now = datetime.utcnow()
     progress_dict = progress.dict()
     progress_dict["last_accessed"] = now
+    progress_dict["updated_at"] = now
     
-    if existing_progress:
-        # Update existing progress
-        progress_dict["created_at"] = existing_progress.get("created_at", now)
-        progress_dict["updated_at"] = now
-        
-        await progress_collection.update_one(
-            {"_id": existing_progress["_id"]},
-            {"$set": progress_dict}
-        )
-        
-        updated_progress = await progress_collection.find_one({"_id": existing_progress["_id"]})
-        return updated_progress
-    else:
-        # Create new progress record
-        progress_dict["created_at"] = now
-        progress_dict["updated_at"] = now
-        
-        result = await progress_collection.insert_one(progress_dict)
-        created_progress = await progress_collection.find_one({"_id": result.inserted_id})
-        return created_progress
+    # Create or update the progress record atomically and return it
+    return await progress_repo.upsert_for_topic(progress.user_id, progress.topic_id, progress_dict)
 
 @router.put("/me", response_model=User)
 async def update_user(
@@ -83,34 +67,18 @@ async def update_user(
             detail="No valid fields to update"
         )
     
-    # Check if username is being updated and is unique
-    if "username" in update_data and update_data["username"] != current_user.username:
-        existing_user = await users_collection.find_one({"username": update_data["username"]})
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already taken"
-            )
-    
-    # Check if email is being updated and is unique
-    if "email" in update_data and update_data["email"] != current_user.email:
-        existing_user = await users_collection.find_one({"email": update_data["email"]})
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Email already registered"
-            )
-    
-    # Update user
+    # Update user and get the updated document in one round trip; the unique
+    # indexes on username and email reject values taken by another user
     update_data["updated_at"] = datetime.utcnow()
     
-    await users_collection.update_one(
-        {"_id": ObjectId(current_user.id)},
-        {"$set": update_data}
-    )
-    
-    # Get updated user
-    updated_user = await users_collection.find_one({"_id": ObjectId(current_user.id)})
+    try:
+        updated_user = await users_repo.update_and_get(current_user.id, update_data)
+    except DuplicateKeyError as e:
+        key_pattern = (e.details or {}).get("keyPattern", {})
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered" if "email" in key_pattern else "Username already taken"
+        )
     
     # Return user without password
     return {
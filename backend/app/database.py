@@ -11,11 +11,11 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "eduai_db")
 
-# For async operations with Motor
+# For async operations with Motor (used by the routers through app.repositories)
 async_client = AsyncIOMotorClient(MONGO_URI)
 async_db = async_client[DB_NAME]
 
-# For sync operations with PyMongo
+# For sync operations with PyMongo (scripts only - never call this from an async handler)
 sync_client = MongoClient(MONGO_URI)
 sync_db = sync_client[DB_NAME]
 
@@ -27,19 +27,8 @@ questions_collection = async_db.questions
 users_collection = async_db.users
 progress_collection = async_db.progress
 
-# Initialize indexes
-def create_indexes():
-    # Create indexes for better query performance
-    sync_db.subjects.create_index("name")
-    sync_db.topics.create_index("subject_id")
-    sync_db.topics.create_index("name")
-    sync_db.contents.create_index("topic_id")
-    sync_db.contents.create_index([("title", "text"), ("body", "text")])
-    sync_db.questions.create_index("topic_id")
-    sync_db.users.create_index("email", unique=True)
-    sync_db.users.create_index("username", unique=True)
-    sync_db.progress.create_index([("user_id", 1), ("topic_id", 1)], unique=True)
+# Indexes are declared in app.indexes
 
-# Helper to get database instance
+# Helper to get the synchronous database instance for scripts
 def get_database() -> Database:
     return sync_db
@@ -0,0 +1,357 @@
+"""
+Declarative registry of the MongoDB indexes the application relies on.
+
+Every query shape the routers run is listed in QUERY_SHAPES next to the
+indexes that serve it; ``verify_query_shapes`` runs ``explain()`` on each one
+and reports any that would fall back to a collection scan, or that do not use
+the index a shape names.
+
+``reconcile_indexes`` diffs the indexes that exist against INDEXES and only
+builds the missing ones (or rebuilds those whose options such as ``unique``
+changed), so it is cheap and safe to run on every deploy or worker start.
+Its progress is published through app.utils.metrics.
+
+Usage:
+    python -m app.indexes              # build missing indexes
+    python -m app.indexes --dry-run    # list missing indexes without building them
+    python -m app.indexes --verify     # build missing indexes, then verify every query shape
+"""
+import re
+import sys
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Indexes per collection. List endpoints page through results in _id order
+# (keyset pagination), so their equality filters are indexed together with _id.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "subjects": [
+        IndexModel([("name", ASCENDING)]),
+    ],
+    "topics": [
+        IndexModel([("subject_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("name", ASCENDING)]),
+    ],
+    "contents": [
+        IndexModel([("topic_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("topic_id", ASCENDING), ("type", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("title", TEXT), ("body", TEXT)]),
+    ],
+    "questions": [
+        IndexModel([("topic_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("topic_id", ASCENDING), ("content_id", ASCENDING),
+                    ("difficulty", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("content_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "progress": [
+        IndexModel([("user_id", ASCENDING), ("topic_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "textbooks": [
+        IndexModel([("uploaded_by", ASCENDING)]),
+        IndexModel([("subject_key", ASCENDING), ("grade_key", ASCENDING)]),
+    ],
+    "textbook_content": [
+        IndexModel([("textbook_id", ASCENDING), ("page", ASCENDING)], unique=True),
+    ],
+    "study_sheets": [
+        IndexModel([("key", ASCENDING)], unique=True, partialFilterExpression={"key": {"$exists": True}}),
+    ],
+    "locks": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "user_history": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "textbook_passages": [
+        IndexModel([("textbook_id", ASCENDING)]),
+    ],
+    "search_postings": [
+        IndexModel([("term", ASCENDING), ("tf", DESCENDING)]),
+        IndexModel([("term", ASCENDING), ("textbook_id", ASCENDING), ("tf", DESCENDING)]),
+        IndexModel([("textbook_id", ASCENDING)]),
+    ],
+    "search_documents": [
+        IndexModel([("textbook_id", ASCENDING)]),
+    ],
+    "jobs": [
+        IndexModel([("state", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("state", ASCENDING), ("heartbeat_at", ASCENDING)]),
+        IndexModel([("textbook_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "embeddings": [
+        IndexModel([("updated_at", ASCENDING)]),
+        IndexModel([("group", ASCENDING), ("kind", ASCENDING)]),
+    ],
+}
+
+
+@dataclass
+class QueryShape:
+    """A canonical query run by a router, used to check that it is index-backed."""
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[tuple]] = None
+    projection: Optional[Dict[str, Any]] = None
+    # Key pattern of the index the winning plan must use, when any index would not do
+    index: Optional[List[tuple]] = None
+
+
+_ID = "000000000000000000000000"
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("subjects.read_subjects", "subjects", {"_id": {"$gt": ObjectId(_ID)}}, [("_id", 1)]),
+    QueryShape("topics.read_topics", "topics", {"subject_id": _ID}, [("_id", 1)]),
+    QueryShape("contents.read_contents", "contents", {"topic_id": _ID}, [("_id", 1)]),
+    QueryShape("contents.read_contents(type)", "contents", {"topic_id": _ID, "type": "explanation"}, [("_id", 1)]),
+    QueryShape("search.search_contents", "contents", {"$text": {"$search": "algebra"}}),
+    QueryShape("search.search_contents(filters)", "contents",
+               {"$text": {"$search": "algebra"}, "topic_id": {"$in": [_ID]}, "type": "explanation",
+                "difficulty": {"$gte": 2.0, "$lte": 8.0}}),
+    QueryShape("questions.read_questions", "questions", {"topic_id": _ID}, [("_id", 1)]),
+    QueryShape("questions.read_questions(content, difficulty)", "questions",
+               {"topic_id": _ID, "content_id": _ID, "difficulty": 5.0}, [("_id", 1)]),
+    QueryShape("questions.read_questions(content)", "questions", {"content_id": _ID}, [("_id", 1)]),
+    QueryShape("auth.get_user", "users", {"username": "admin"}),
+    QueryShape("auth.register_user(email)", "users", {"email": "admin@example.com"}),
+    QueryShape("users.read_user_progress", "progress", {"user_id": _ID}, [("_id", 1)]),
+    QueryShape("users.update_user_progress", "progress", {"user_id": _ID, "topic_id": _ID}),
+    QueryShape("textbooks.get_textbooks", "textbooks", {"uploaded_by": ObjectId(_ID)}),
+    QueryShape("enhanced_generator.search_textbook_content(textbooks)", "textbooks",
+               {"subject_key": {"$in": ["mathematics", re.compile("^mathematics ")]},
+                "grade_key": {"$in": ["9", re.compile("^9-")]}}),
+    QueryShape("enhanced_generator.search_textbook_content(subject prefix)", "textbooks",
+               {"subject_key": re.compile("^chem")}),
+    QueryShape("textbook_content.iter_pages", "textbook_content",
+               {"textbook_id": ObjectId(_ID)}, [("page", 1)]),
+    QueryShape("textbook_content.get_pages", "textbook_content",
+               {"textbook_id": ObjectId(_ID), "page": {"$in": [1, 2]}}, [("page", 1)]),
+    QueryShape("study_sheets.get_by_key", "study_sheets",
+               {"key": "0" * 64, "generated_at": {"$gte": datetime(2024, 1, 1)}}),
+    QueryShape("user_history.by_user", "user_history", {"user_id": ObjectId(_ID)}, [("timestamp", -1)]),
+    QueryShape("search_index.search", "search_postings", {"term": "algebra"}, [("tf", -1)]),
+    QueryShape("search_index.search(textbooks)", "search_postings",
+               {"term": "algebra", "textbook_id": {"$in": [ObjectId(_ID)]}}, [("tf", -1)],
+               index=[("term", 1), ("textbook_id", 1), ("tf", -1)]),
+    QueryShape("search_index.remove_textbook", "search_postings", {"textbook_id": ObjectId(_ID)}),
+    QueryShape("search_index.remove_textbook(documents)", "search_documents", {"textbook_id": ObjectId(_ID)}),
+    QueryShape("passages.delete_for_textbook", "textbook_passages", {"textbook_id": ObjectId(_ID)}),
+    QueryShape("enhanced_generator.search_textbook_content(passages)", "textbook_passages",
+               {"_id": {"$in": [ObjectId(_ID)]}}),
+    QueryShape("jobs.claim", "jobs", {"state": "queued"}, [("created_at", 1)]),
+    QueryShape("jobs.requeue_stale", "jobs", {"state": "running", "heartbeat_at": {"$lt": datetime(2024, 1, 1)}}),
+    QueryShape("textbooks.get_textbook_status", "jobs", {"textbook_id": ObjectId(_ID)}, [("created_at", -1)]),
+    QueryShape("vector_store.refresh", "embeddings", {"updated_at": {"$gte": datetime(2024, 1, 1)}}),
+    QueryShape("vector_store.load(purge tombstones)", "embeddings",
+               {"updated_at": {"$lt": datetime(2024, 1, 1)}, "deleted": True}),
+    QueryShape("vector_store.remove_group", "embeddings",
+               {"group": ObjectId(_ID), "kind": "passage", "deleted": {"$ne": True}}),
+]
+
+
+def _key_of(key_spec) -> Tuple[Tuple[str, Any], ...]:
+    """Normalise an index key specification for comparison."""
+    return tuple((name, direction) for name, direction in key_spec.items())
+
+
+def _index_keys(model: IndexModel) -> Set[Tuple[Tuple[str, Any], ...]]:
+    """Key specifications under which an existing index satisfies ``model``."""
+    key = model.document["key"]
+    keys = {_key_of(key)}
+    # The server reports text indexes by their internal _fts/_ftsx keys
+    if TEXT in key.values():
+        keys.add((("_fts", "text"), ("_ftsx", 1)))
+    return keys
+
+
+# Index options that change what an index enforces; an existing index with other values is rebuilt
+_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _options_of(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """The options of an index model document or index_information() entry."""
+    return {name: spec[name] for name in _OPTIONS if spec.get(name) not in (None, False)}
+
+
+def _existing_index(model: IndexModel, existing: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    """Name of the existing index with the key specification of ``model``, if any."""
+    keys = _index_keys(model)
+    return next((name for name, info in existing.items() if _key_of(dict(info["key"])) in keys), None)
+
+
+async def missing_indexes(db: AsyncIOMotorDatabase) -> Dict[str, List[IndexModel]]:
+    """
+    Diff the indexes that exist against INDEXES and return, per collection,
+    those that are missing or exist with other options (e.g. not unique).
+    """
+    missing = {}
+    for collection, models in INDEXES.items():
+        existing = await db[collection].index_information()
+        absent = []
+        for model in models:
+            name = _existing_index(model, existing)
+            if name is None or _options_of(existing[name]) != _options_of(model.document):
+                absent.append(model)
+        if absent:
+            missing[collection] = absent
+    return missing
+
+
+async def _build_indexes(db: AsyncIOMotorDatabase, collection: str, models: List[IndexModel]) -> List[str]:
+    """
+    Build ``models`` on a collection, first dropping indexes with the same keys
+    but other options. A dropped index is restored if its replacement fails.
+    """
+    existing = await db[collection].index_information()
+    for model in models:
+        name = _existing_index(model, existing)
+        if name is None:
+            continue
+        logger.info(f"Rebuilding index {name} on {collection}: options {_options_of(existing[name])} "
+                    f"-> {_options_of(model.document)}")
+        await db[collection].drop_index(name)
+        try:
+            await db[collection].create_indexes([model])
+        except Exception:
+            info = existing[name]
+            await db[collection].create_indexes([IndexModel(
+                list(info["key"]), name=name, **{option: info[option] for option in _options_of(info)}
+            )])
+            raise
+    return await db[collection].create_indexes(models)
+
+
+async def reconcile_indexes(db: AsyncIOMotorDatabase) -> int:
+    """
+    Build only the indexes that are missing and return how many were built.
+
+    A collection whose indexes cannot be built (e.g. duplicates prevent a
+    unique index) is logged, flagged with an ``indexes.failed.<collection>``
+    gauge and skipped; the others are still reconciled, then an error naming
+    the failed collections is raised. The ``indexes.reconciliation_pending``
+    gauge stays at 1 until this has finished successfully.
+    """
+    metrics.set_gauge("indexes.reconciliation_pending", 1)
+    try:
+        missing = await missing_indexes(db)
+    except Exception:
+        metrics.set_gauge("indexes.reconciliation_failed", 1)
+        raise
+    metrics.set_gauge("indexes.missing", sum(len(models) for models in missing.values()))
+
+    built = 0
+    failed = []
+    for collection in INDEXES:
+        models = missing.get(collection)
+        if not models:
+            metrics.set_gauge(f"indexes.failed.{collection}", 0)
+            continue
+        try:
+            names = await _build_indexes(db, collection, models)
+        except Exception as e:
+            failed.append(collection)
+            metrics.set_gauge(f"indexes.failed.{collection}", 1)
+            logger.error(f"Error building index(es) on {collection}: {str(e)}")
+            continue
+        built += len(models)
+        metrics.set_gauge(f"indexes.failed.{collection}", 0)
+        metrics.increment("indexes.built", len(models))
+        metrics.set_gauge("indexes.missing", sum(len(m) for m in missing.values()) - built)
+        logger.info(f"Built index(es) {', '.join(names)} on {collection}")
+
+    if failed:
+        metrics.set_gauge("indexes.reconciliation_failed", 1)
+        raise RuntimeError(f"Could not build the indexes of {', '.join(failed)}")
+
+    metrics.set_gauge("indexes.reconciliation_failed", 0)
+    metrics.set_gauge("indexes.reconciliation_pending", 0)
+    logger.info(f"Index reconciliation complete, built {built} missing index(es)")
+    return built
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Collect the stage names of an explain() plan tree."""
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _plan_indexes(plan: Dict[str, Any]) -> List[Tuple[Tuple[str, Any], ...]]:
+    """Collect the key patterns of the indexes scanned by an explain() plan tree."""
+    indexes = [_key_of(dict(plan["keyPattern"]))] if "keyPattern" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            indexes.extend(_plan_indexes(plan[key]))
+    for child in plan.get("inputStages", []):
+        indexes.extend(_plan_indexes(child))
+    return indexes
+
+
+async def verify_query_shapes(db: AsyncIOMotorDatabase) -> List[str]:
+    """
+    Explain every registered query shape and return the names of those whose
+    winning plan contains a COLLSCAN or misses the index the shape names (an
+    empty list means all are served as intended).
+    """
+    failures = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape.collection].find(shape.filter, shape.projection)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        explanation = await cursor.limit(1).explain()
+        plan = explanation["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        if "COLLSCAN" in stages:
+            failures.append(shape.name)
+            logger.error(f"{shape.name}: COLLSCAN on {shape.collection} for {shape.filter}")
+        elif shape.index and tuple(shape.index) not in _plan_indexes(plan):
+            failures.append(shape.name)
+            logger.error(f"{shape.name}: does not use index {shape.index} on {shape.collection}")
+        else:
+            logger.info(f"{shape.name}: {' <- '.join(stage for stage in stages if stage)}")
+    return failures
+
+
+async def _main(args: List[str]) -> int:
+    from app.database import async_db
+
+    if "--dry-run" in args:
+        missing = await missing_indexes(async_db)
+        for collection, models in missing.items():
+            for model in models:
+                print(f"{collection}: {model.document['name']}")
+        print(f"{sum(len(models) for models in missing.values())} missing index(es)")
+        return 0
+
+    await reconcile_indexes(async_db)
+    if "--verify" not in args:
+        return 0
+
+    failures = await verify_query_shapes(async_db)
+    if failures:
+        print(f"{len(failures)} query shape(s) use a collection scan or the wrong index: {', '.join(failures)}")
+        return 1
+    print(f"All {len(QUERY_SHAPES)} query shapes are index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,192 @@
+"""
+Persistent background job queue.
+
+Jobs are stored in the ``jobs`` collection, so queued work survives a restart.
+Every API process runs a JobWorkerPool whose workers claim jobs atomically
+(find_one_and_update), so several processes can share one queue without
+running a job twice. Running jobs send heartbeats; jobs whose worker died
+are put back in the queue once their heartbeat is older than
+JOB_STALE_SECONDS. Every claim counts as an attempt, and a job claimed more
+than JOB_MAX_ATTEMPTS times (e.g. one that keeps killing its worker) fails
+instead of running again. A worker that cannot write its heartbeat stops the
+job, since another worker would otherwise requeue and run it a second time.
+
+Handlers are registered per job kind with ``@job_handler("kind")`` and
+receive the job document and a JobProgress to report pages done and errors.
+"""
+import os
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+from app.repositories import Document, DocumentId, JobRepository, jobs_repo
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker tasks per API process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# How often idle workers look for jobs queued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A running job without a heartbeat for this long is requeued
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+# Claims after which a job that never finished is failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+class JobProgress:
+    """Progress reporting for a running job; every update doubles as a heartbeat."""
+
+    def __init__(self, repository: JobRepository, job_id: DocumentId):
+        self.repository = repository
+        self.job_id = job_id
+
+    async def set_total(self, pages_total: int) -> None:
+        await self.repository.heartbeat(self.job_id, pages_total=pages_total)
+
+    async def advance(self, pages_done: int) -> None:
+        await self.repository.heartbeat(self.job_id, pages_done=pages_done)
+
+    async def error(self, message: str) -> None:
+        """Record a non-fatal error; the job keeps running."""
+        await self.repository.add_error(self.job_id, message)
+
+
+JobHandler = Callable[[Document, JobProgress], Awaitable[None]]
+
+HANDLERS: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of ``kind``."""
+    def register(handler: JobHandler) -> JobHandler:
+        HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+class JobWorkerPool:
+    """A fixed number of asyncio worker tasks draining the persistent job queue."""
+
+    def __init__(self, repository: JobRepository, workers: int = JOB_WORKERS):
+        self.repository = repository
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def start(self) -> None:
+        """Requeue jobs abandoned by a previous run and start the workers."""
+        requeued = await self._requeue_stale()
+        if requeued:
+            logger.info(f"Requeued {requeued} stale job(s)")
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [asyncio.create_task(self._work(f"{prefix}:{n}")) for n in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back in the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers because a job was just queued."""
+        self._wakeup.set()
+
+    async def _requeue_stale(self) -> int:
+        return await self.repository.requeue_stale(datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS))
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(JOB_STALE_SECONDS / 2)
+            try:
+                await self._requeue_stale()
+            except Exception as e:
+                logger.error(f"Error requeueing stale jobs: {str(e)}")
+
+    async def _work(self, worker: str) -> None:
+        while True:
+            try:
+                job = await self.repository.claim(worker)
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _heartbeat(self, job_id: DocumentId) -> None:
+        """Keep a job alive until cancelled; returns once a heartbeat cannot be written."""
+        while True:
+            await asyncio.sleep(JOB_STALE_SECONDS / 3)
+            try:
+                await self.repository.heartbeat(job_id)
+            except Exception as e:
+                logger.error(f"Heartbeat of job {job_id} failed, stopping the job: {str(e)}")
+                return
+
+    async def _run(self, job: Document) -> None:
+        job_id = job["_id"]
+        handler = HANDLERS.get(job["kind"])
+        if handler is None:
+            await self.repository.finish(job_id, "failed", errors=[f"No handler for job kind {job['kind']}"])
+            metrics.increment("jobs.failed")
+            return
+
+        if job.get("attempts", 1) > JOB_MAX_ATTEMPTS:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: gave up after {JOB_MAX_ATTEMPTS} attempt(s)")
+            await self.repository.add_error(job_id, f"Gave up after {JOB_MAX_ATTEMPTS} attempt(s)")
+            await self.repository.finish(job_id, "failed")
+            metrics.increment("jobs.failed")
+            return
+
+        metrics.increment("jobs.started")
+        work = asyncio.create_task(handler(job, JobProgress(self.repository, job_id)))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if not work.done():
+                # The job will be requeued as stale; stop this run so it does not run twice
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+                metrics.increment("jobs.heartbeat_lost")
+                try:
+                    await self.repository.requeue(job_id)
+                except Exception as e:
+                    logger.error(f"Error requeueing job {job_id}: {str(e)}")
+                return
+            work.result()
+        except asyncio.CancelledError:
+            work.cancel()
+            await self.repository.requeue(job_id)
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {str(e)}")
+            await self.repository.add_error(job_id, str(e))
+            await self.repository.finish(job_id, "failed")
+            metrics.increment("jobs.failed")
+        else:
+            await self.repository.finish(job_id, "done")
+            metrics.increment("jobs.done")
+        finally:
+            heartbeat.cancel()
+
+
+job_queue = JobWorkerPool(jobs_repo)
+
+
+async def enqueue(kind: str, **payload) -> Document:
+    """Persist a job and wake a worker to run it."""
+    job = await jobs_repo.enqueue(kind, **payload)
+    metrics.increment("jobs.queued")
+    job_queue.notify()
+    return job
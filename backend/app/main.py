@@ -1,7 +1,31 @@
-from fastapi import FastAPI
+import os
+import time
+import asyncio
+import logging
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, subjects, topics, contents, questions, users, ai_generator, test_endpoints, textbooks, enhanced_generator
-from app.database import create_indexes
+from fastapi.responses import JSONResponse
+from app.api import auth, subjects, topics, contents, questions, users, ai_generator, test_endpoints, textbooks, enhanced_generator, search
+from app.database import async_db
+from app.indexes import reconcile_indexes
+from app.ai import registry
+from app.ai.executor import generation_executor, GenerationOverloaded, RETRY_AFTER_SECONDS
+from app.jobs import job_queue
+from app.search.vector_index import vector_store
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set to "false" when indexes are reconciled by a deploy step (python -m app.indexes)
+RECONCILE_INDEXES_ON_STARTUP = os.getenv("RECONCILE_INDEXES_ON_STARTUP", "true").lower() == "true"
+
+# Seconds after startup before the AI components are loaded, so the worker
+# serves its first requests before importing NLTK and scikit-learn
+AI_WARMUP_DELAY_SECONDS = float(os.getenv("AI_WARMUP_DELAY_SECONDS", "1"))
+
+# Seconds between event loop lag samples
+LOOP_LAG_INTERVAL = 0.5
 
 # Create FastAPI app
 app = FastAPI(
@@ -28,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -35,6 +60,7 @@ app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(subjects.router, prefix="/api/subjects", tags=["Subjects"])
 app.include_router(topics.router, prefix="/api/topics", tags=["Topics"])
 app.include_router(contents.router, prefix="/api/contents", tags=["Contents"])
+app.include_router(search.router, prefix="/api/search", tags=["Search"])
 app.include_router(questions.router, prefix="/api/questions", tags=["Questions"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(ai_generator.router, prefix="/api/generate", tags=["AI Generator"])
@@ -42,17 +68,88 @@ app.include_router(textbooks.router, prefix="/api/textbooks", tags=["Textbooks"]
 app.include_router(enhanced_generator.router, prefix="/api/generate", tags=["Enhanced Generator"])
 app.include_router(test_endpoints.router)  # Already has prefix set in router definition
 
+# Keep references to background tasks so they are not garbage collected
+background_tasks = set()
+
+async def build_missing_indexes():
+    try:
+        await reconcile_indexes(async_db)
+    except Exception as e:
+        logger.error(f"Error reconciling database indexes: {str(e)}")
+
+async def load_ai_components():
+    await asyncio.sleep(AI_WARMUP_DELAY_SECONDS)
+    try:
+        await asyncio.to_thread(registry.load)
+    except Exception as e:
+        logger.error(f"Error loading AI components: {str(e)}")
+
+async def warm_generation_workers():
+    try:
+        await generation_executor.warm()
+    except Exception as e:
+        logger.error(f"Error starting generation workers: {str(e)}")
+
+async def monitor_event_loop_lag():
+    """Publish how late a timer fires, i.e. how long the loop was blocked (event_loop.lag_ms)"""
+    worst = 0.0
+    while True:
+        expected = time.perf_counter() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag_ms = max(0.0, time.perf_counter() - expected) * 1000
+        worst = max(worst, lag_ms)
+        metrics.set_gauge("event_loop.lag_ms", round(lag_ms, 2))
+        metrics.set_gauge("event_loop.max_lag_ms", round(worst, 2))
+
+def run_in_background(coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
 @app.on_event("startup")
 async def startup():
-    """Create database indexes on startup"""
-    create_indexes()
+    """Reconcile database indexes and load the vector index and AI components in the background so the worker is ready immediately"""
+    if RECONCILE_INDEXES_ON_STARTUP:
+        run_in_background(build_missing_indexes())
+    run_in_background(vector_store.run())
+    run_in_background(load_ai_components())
+    run_in_background(warm_generation_workers())
+    run_in_background(monitor_event_loop_lag())
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the job workers and background tasks; unfinished jobs are picked up again on the next start"""
+    for task in list(background_tasks):
+        task.cancel()
+    await job_queue.stop()
+    generation_executor.stop()
+
+@app.exception_handler(GenerationOverloaded)
+async def generation_overloaded(request: Request, exc: GenerationOverloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many generation requests in progress, please retry shortly"},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
 
 @app.get("/", tags=["Root"])
 async def root():
     return {"message": "Welcome to EduAI API"}
 
+@app.get("/ready", tags=["Root"])
+async def read_readiness():
+    """503 until the AI components (tokenizers, stopwords, generator) are loaded"""
+    status = {"ai_components": registry.status()}
+    return JSONResponse(status_code=200 if registry.ready() else 503, content=status)
+
+@app.get("/metrics", tags=["Root"])
+async def read_metrics():
+    """Process metrics, including whether index reconciliation is still pending"""
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     import uvicorn
-    import os
     port = int(os.environ.get("PORT", 8003))
     uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,587 @@
+import os
+import re
+import zlib
+from typing import List, Dict, Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Optional, Set, Tuple, Union
+from datetime import datetime, timedelta
+from bson import ObjectId, Binary
+from pymongo import ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorCollection
+from app.database import async_db
+from app.utils.canonical import subject_key, grade_key
+
+# Raw MongoDB document as returned by Motor
+Document = Dict[str, Any]
+DocumentId = Union[str, ObjectId]
+
+
+def to_object_id(value: DocumentId) -> ObjectId:
+    """Convert a string id to an ObjectId (ObjectIds are passed through)."""
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value)
+
+
+class Repository:
+    """Async data access for a single MongoDB collection, backed by Motor."""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+
+    async def get(self, doc_id: DocumentId) -> Optional[Document]:
+        """Get a document by its id."""
+        return await self.collection.find_one({"_id": to_object_id(doc_id)})
+
+    async def find_one(self, query: Dict[str, Any]) -> Optional[Document]:
+        """Get the first document matching a query."""
+        return await self.collection.find_one(query)
+
+    async def find(self,
+                   query: Optional[Dict[str, Any]] = None,
+                   sort: Optional[List[tuple]] = None,
+                   limit: int = 0,
+                   projection: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Get all documents matching a query (``limit=0`` means no limit)."""
+        cursor = self.collection.find(query or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(None)
+
+    async def paginate(self,
+                       query: Optional[Dict[str, Any]] = None,
+                       limit: int = 100,
+                       after: Optional[ObjectId] = None,
+                       projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Document], Optional[str]]:
+        """
+        Get one page of documents in ``_id`` order using keyset pagination.
+
+        Returns the page and the cursor of the next page (None on the last page).
+        ``projection`` limits the fields read; ``_id`` is always included.
+        The equality fields of ``query`` followed by ``_id`` should be indexed so
+        the page is read straight off the index regardless of collection size.
+        """
+        query = dict(query or {})
+        if after is not None:
+            query["_id"] = {"$gt": after}
+
+        # Fetch one extra document to find out whether another page exists
+        cursor = self.collection.find(query, projection).sort("_id", 1).limit(limit + 1)
+        documents = await cursor.to_list(None)
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = str(documents[-1]["_id"])
+        return documents, next_cursor
+
+    async def exists(self, doc_id: DocumentId) -> bool:
+        """Check whether a document with this id exists."""
+        return await self.collection.find_one({"_id": to_object_id(doc_id)}, {"_id": 1}) is not None
+
+    async def existing_ids(self, ids: Iterable[DocumentId]) -> Set[str]:
+        """Return which of the given ids exist, using a single ``$in`` query."""
+        object_ids = list({to_object_id(doc_id) for doc_id in ids})
+        if not object_ids:
+            return set()
+        cursor = self.collection.find({"_id": {"$in": object_ids}}, {"_id": 1})
+        return {str(doc["_id"]) async for doc in cursor}
+
+    async def insert(self, document: Document) -> ObjectId:
+        """Insert a document and return its new id."""
+        result = await self.collection.insert_one(document)
+        return result.inserted_id
+
+    async def create(self, document: Document) -> Document:
+        """
+        Insert a document and return it as stored.
+
+        The driver adds the generated ``_id`` to ``document``, so no second
+        round trip is needed to read it back.
+        """
+        await self.collection.insert_one(document)
+        return document
+
+    async def insert_many(self, documents: List[Document]) -> Dict[int, str]:
+        """
+        Insert documents with an unordered bulk write, so one bad document does
+        not stop the rest. Every document gets its ``_id`` assigned up front.
+
+        Returns the error message for each position in ``documents`` that
+        failed to insert (empty if all succeeded).
+        """
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        if not documents:
+            return {}
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            return {
+                error["index"]: error.get("errmsg", "Write failed")
+                for error in e.details.get("writeErrors", [])
+            }
+        return {}
+
+    async def update(self, doc_id: DocumentId, fields: Dict[str, Any]) -> bool:
+        """Set fields on a document. Returns False if it does not exist."""
+        result = await self.collection.update_one(
+            {"_id": to_object_id(doc_id)},
+            {"$set": fields}
+        )
+        return result.matched_count > 0
+
+    async def update_and_get(self,
+                             doc_id: DocumentId,
+                             fields: Dict[str, Any],
+                             previous: bool = False,
+                             increments: Optional[Dict[str, int]] = None) -> Optional[Document]:
+        """
+        Set fields (and add ``increments`` to counters) on a document and return
+        the updated document (or with ``previous`` the document as it was before)
+        in a single round trip. Returns None if it does not exist.
+        """
+        update: Dict[str, Any] = {"$set": fields}
+        if increments:
+            update["$inc"] = increments
+        return await self.collection.find_one_and_update(
+            {"_id": to_object_id(doc_id)},
+            update,
+            return_document=ReturnDocument.BEFORE if previous else ReturnDocument.AFTER
+        )
+
+    async def delete(self, doc_id: DocumentId) -> bool:
+        """Delete a document. Returns False if it does not exist."""
+        result = await self.collection.delete_one({"_id": to_object_id(doc_id)})
+        return result.deleted_count > 0
+
+    async def delete_and_get(self, doc_id: DocumentId) -> Optional[Document]:
+        """Delete a document and return it. Returns None if it does not exist."""
+        return await self.collection.find_one_and_delete({"_id": to_object_id(doc_id)})
+
+
+class SubjectRepository(Repository):
+    """Data access for the ``subjects`` collection."""
+
+
+class TopicRepository(Repository):
+    """Data access for the ``topics`` collection."""
+
+    async def list_by_subject(self, subject_id: str) -> List[Document]:
+        return await self.find({"subject_id": subject_id})
+
+    async def bump_content_version(self, topic_ids: Iterable[DocumentId]) -> None:
+        """
+        Increment ``content_version`` of topics whose contents or questions
+        changed. Study sheets are cached per version, so this invalidates them.
+        """
+        object_ids = list({to_object_id(topic_id) for topic_id in topic_ids if ObjectId.is_valid(topic_id)})
+        if object_ids:
+            await self.collection.update_many({"_id": {"$in": object_ids}}, {"$inc": {"content_version": 1}})
+
+
+class ContentRepository(Repository):
+    """Data access for the ``contents`` collection."""
+
+    async def list_by_topic(self, topic_id: str, content_type: Optional[str] = None) -> List[Document]:
+        query = {"topic_id": topic_id}
+        if content_type:
+            query["type"] = content_type
+        return await self.find(query)
+
+    async def text_search(self,
+                          text: str,
+                          filters: Optional[Dict[str, Any]] = None,
+                          skip: int = 0,
+                          limit: int = 20,
+                          projection: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """
+        Full-text search over title and body with the ``contents`` text index,
+        best ``textScore`` first; each document carries its ``score``.
+        """
+        query = {"$text": {"$search": text}, **(filters or {})}
+        projection = {**(projection or {}), "score": {"$meta": "textScore"}}
+        cursor = self.collection.find(query, projection)
+        cursor = cursor.sort([("score", {"$meta": "textScore"}), ("_id", ASCENDING)]).skip(skip).limit(limit)
+        return await cursor.to_list(None)
+
+
+class QuestionRepository(Repository):
+    """Data access for the ``questions`` collection."""
+
+    async def list_by_topic(self, topic_id: str) -> List[Document]:
+        return await self.find({"topic_id": topic_id})
+
+
+class UserRepository(Repository):
+    """Data access for the ``users`` collection."""
+
+    async def get_by_username(self, username: str) -> Optional[Document]:
+        return await self.find_one({"username": username})
+
+    async def get_by_email(self, email: str) -> Optional[Document]:
+        return await self.find_one({"email": email})
+
+
+class ProgressRepository(Repository):
+    """Data access for the ``progress`` collection."""
+
+    async def list_for_user(self, user_id: str) -> List[Document]:
+        return await self.find({"user_id": user_id})
+
+    async def get_for_topic(self, user_id: str, topic_id: str) -> Optional[Document]:
+        return await self.find_one({"user_id": user_id, "topic_id": topic_id})
+
+    async def upsert_for_topic(self, user_id: str, topic_id: str, fields: Dict[str, Any]) -> Document:
+        """
+        Create or update the progress record of a user for a topic and return it.
+
+        Runs as one atomic find-and-modify on the unique (user_id, topic_id)
+        index; ``created_at`` is only written when the record is inserted.
+        """
+        fields = {k: v for k, v in fields.items() if k not in ("user_id", "topic_id", "created_at")}
+        query = {"user_id": user_id, "topic_id": topic_id}
+        update = {
+            "$set": fields,
+            "$setOnInsert": {"created_at": fields.get("updated_at", datetime.utcnow())}
+        }
+        try:
+            return await self.collection.find_one_and_update(
+                query, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two concurrent upserts both tried to insert; the record exists now
+            return await self.collection.find_one_and_update(
+                query, update, return_document=ReturnDocument.AFTER
+            )
+
+
+class TextbookRepository(Repository):
+    """Data access for the ``textbooks`` collection."""
+
+    async def list_by_uploader(self,
+                               user_id: DocumentId,
+                               projection: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return await self.find({"uploaded_by": user_id}, projection=projection)
+
+    async def set_status(self, textbook_id: DocumentId, status: str, **fields: Any) -> bool:
+        """Update the processing status of a textbook along with any extra fields."""
+        return await self.update(textbook_id, {"status": status, **fields})
+
+    async def find_by_subject_and_grade(self,
+                                        subject: Optional[str] = None,
+                                        grade: Optional[str] = None,
+                                        projection: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """
+        Find textbooks by canonical subject and grade keys (app.utils.canonical),
+        served by the (subject_key, grade_key) index.
+
+        A key matches exactly or as the start of a longer key ("mathematics 2",
+        grade range "9-10"); anchored prefixes stay index range scans. If nothing
+        matches, the subject is retried as a plain prefix ("chem" -> "chemistry").
+        """
+        subject = subject_key(subject or "")
+        grade = grade_key(grade or "")
+        query: Dict[str, Any] = {}
+        if subject:
+            query["subject_key"] = {"$in": [subject, re.compile("^" + re.escape(subject + " "))]}
+        if grade:
+            query["grade_key"] = {"$in": [grade, re.compile("^" + re.escape(grade + "-"))]}
+
+        textbooks = await self.find(query, projection=projection)
+        if textbooks or not subject:
+            return textbooks
+        query["subject_key"] = re.compile("^" + re.escape(subject))
+        return await self.find(query, projection=projection)
+
+
+# How extracted page text is stored: "zlib" compresses it, "none" keeps plain text
+TEXTBOOK_TEXT_COMPRESSION = os.getenv("TEXTBOOK_TEXT_COMPRESSION", "none").lower()
+
+# Pages written per insert_many call when storing a textbook
+PAGE_BATCH_SIZE = 200
+
+
+def encode_page_text(text: str) -> Document:
+    """Fields holding the text of a stored page, compressed if configured."""
+    if TEXTBOOK_TEXT_COMPRESSION == "zlib":
+        return {"text_z": Binary(zlib.compress(text.encode("utf-8")))}
+    return {"text": text}
+
+
+def decode_page_text(document: Document) -> str:
+    """Text of a stored page, whichever way it was stored."""
+    if "text_z" in document:
+        return zlib.decompress(document["text_z"]).decode("utf-8")
+    return document.get("text", "")
+
+
+async def _iterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class TextbookContentRepository(Repository):
+    """
+    Data access for the ``textbook_content`` collection.
+
+    Extracted text is stored one document per page, keyed by
+    ``(textbook_id, page)``, so no textbook is bounded by the document size
+    limit and readers only pull the pages they need.
+    """
+
+    async def save_pages(self,
+                         textbook_id: DocumentId,
+                         pages: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                         on_batch: Optional[Callable[[int], Awaitable[None]]] = None) -> int:
+        """
+        Replace the stored pages of a textbook and return how many were stored.
+
+        ``pages`` yields ``{"page": number, "content": text}`` dicts, in any
+        order and possibly asynchronously; they are written in batches as they
+        arrive so the whole book is never held at once.
+        ``on_batch`` is awaited with the running count after every batch.
+        """
+        textbook_id = to_object_id(textbook_id)
+        await self.collection.delete_many({"textbook_id": textbook_id})
+
+        processed_at = datetime.utcnow()
+        stored = 0
+        batch = []
+        async for page in _iterate(pages):
+            batch.append({
+                "textbook_id": textbook_id,
+                "page": page["page"],
+                "length": len(page["content"]),
+                **encode_page_text(page["content"]),
+                "processed_at": processed_at
+            })
+            if len(batch) >= PAGE_BATCH_SIZE:
+                await self.collection.insert_many(batch)
+                stored += len(batch)
+                batch = []
+                if on_batch:
+                    await on_batch(stored)
+        if batch:
+            await self.collection.insert_many(batch)
+            stored += len(batch)
+            if on_batch:
+                await on_batch(stored)
+        return stored
+
+    async def iter_pages(self,
+                         textbook_id: DocumentId,
+                         pages: Optional[Iterable[int]] = None) -> AsyncIterator[Document]:
+        """
+        Stream the pages of a textbook in page order as ``{"page", "content"}``
+        dicts, optionally only the given page numbers.
+        """
+        query: Dict[str, Any] = {"textbook_id": to_object_id(textbook_id)}
+        if pages is not None:
+            query["page"] = {"$in": list(pages)}
+        cursor = self.collection.find(query, {"page": 1, "text": 1, "text_z": 1}).sort("page", 1)
+        async for document in cursor:
+            if "page" not in document:
+                # Legacy whole-textbook document, see migrate_textbook_pages.py
+                continue
+            yield {"page": document["page"], "content": decode_page_text(document)}
+
+    async def get_pages(self, textbook_id: DocumentId, pages: Iterable[int]) -> List[Document]:
+        """Fetch only the given pages of a textbook."""
+        return [page async for page in self.iter_pages(textbook_id, pages)]
+
+
+class TextbookPassageRepository(Repository):
+    """
+    Data access for the ``textbook_passages`` collection: pages split into
+    passages with their character offsets in the page (see app.search.passages).
+    """
+
+    async def delete_for_textbook(self, textbook_id: DocumentId) -> int:
+        result = await self.collection.delete_many({"textbook_id": to_object_id(textbook_id)})
+        return result.deleted_count
+
+    async def insert_passages(self, passages: List[Dict[str, Any]]) -> None:
+        """Store ``{_id, textbook_id, page, passage, start, end, content}`` passages."""
+        await self.collection.insert_many([
+            {
+                "_id": passage["_id"],
+                "textbook_id": passage["textbook_id"],
+                "page": passage["page"],
+                "passage": passage["passage"],
+                "start": passage["start"],
+                "end": passage["end"],
+                **encode_page_text(passage["content"])
+            }
+            for passage in passages
+        ])
+
+    async def get_many(self, passage_ids: Iterable[ObjectId]) -> Dict[ObjectId, Document]:
+        """Fetch passages by id, with their text decoded into ``content``."""
+        cursor = self.collection.find({"_id": {"$in": list(passage_ids)}})
+        return {
+            document["_id"]: {
+                **{k: v for k, v in document.items() if k not in ("text", "text_z")},
+                "content": decode_page_text(document)
+            }
+            async for document in cursor
+        }
+
+
+class StudySheetRepository(Repository):
+    """Data access for the ``study_sheets`` collection."""
+
+    async def get_by_key(self, key: str, generated_after: Optional[datetime] = None) -> Optional[Document]:
+        """The sheet stored under a generation key, optionally only if generated after a time."""
+        query: Dict[str, Any] = {"key": key}
+        if generated_after is not None:
+            query["generated_at"] = {"$gte": generated_after}
+        return await self.collection.find_one(query, {"_id": 0, "key": 0, "generated_at": 0})
+
+    async def upsert_by_key(self, key: str, sheet: Document) -> None:
+        """Store a sheet under its generation key, replacing the previous one."""
+        document = {field: value for field, value in sheet.items() if field != "_id"}
+        document.update(key=key, generated_at=datetime.utcnow())
+        try:
+            await self.collection.replace_one({"key": key}, document, upsert=True)
+        except DuplicateKeyError:
+            # Two workers inserted the key at the same time; the document exists now
+            await self.collection.replace_one({"key": key}, document)
+
+
+class UserHistoryRepository(Repository):
+    """Data access for the ``user_history`` collection."""
+
+    async def record(self, user_id: Any, action: str, **fields: Any) -> ObjectId:
+        """Record a user action with the current timestamp."""
+        return await self.insert({
+            "user_id": user_id,
+            "action": action,
+            **fields,
+            "timestamp": datetime.utcnow()
+        })
+
+
+class LockRepository(Repository):
+    """
+    Named locks shared by all workers. A lock expires at ``expires_at`` (and
+    is then removed by a TTL index), so a crashed holder cannot block others.
+    """
+
+    async def acquire(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the lock unless another owner holds an unexpired one."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        try:
+            await self.collection.insert_one({"_id": name, "owner": owner, "expires_at": expires_at})
+            return True
+        except DuplicateKeyError:
+            # Take over a lock whose holder let it expire before the TTL monitor removed it
+            result = await self.collection.update_one(
+                {"_id": name, "expires_at": {"$lt": now}},
+                {"$set": {"owner": owner, "expires_at": expires_at}}
+            )
+            return result.modified_count > 0
+
+    async def release(self, name: str, owner: str) -> None:
+        await self.collection.delete_one({"_id": name, "owner": owner})
+
+    async def is_held(self, name: str) -> bool:
+        return await self.collection.find_one(
+            {"_id": name, "expires_at": {"$gte": datetime.utcnow()}}, {"_id": 1}
+        ) is not None
+
+
+class JobRepository(Repository):
+    """
+    Data access for the ``jobs`` collection (see app.jobs).
+
+    A job moves from ``queued`` to ``running`` when a worker claims it and ends
+    as ``done`` or ``failed``; ``heartbeat_at`` is refreshed while it runs.
+    """
+
+    async def enqueue(self, kind: str, **payload: Any) -> Document:
+        """Persist a new queued job and return it."""
+        now = datetime.utcnow()
+        return await self.create({
+            "kind": kind,
+            **payload,
+            "state": "queued",
+            "attempts": 0,
+            "pages_done": 0,
+            "pages_total": None,
+            "errors": [],
+            "created_at": now,
+            "updated_at": now
+        })
+
+    async def claim(self, worker: str) -> Optional[Document]:
+        """Atomically move the oldest queued job to ``running`` and return it."""
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"state": "queued"},
+            {
+                "$set": {"state": "running", "worker": worker, "started_at": now,
+                         "heartbeat_at": now, "updated_at": now},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def heartbeat(self, job_id: DocumentId, **fields: Any) -> bool:
+        """Mark a running job as alive, setting any progress fields along with it."""
+        now = datetime.utcnow()
+        return await self.update(job_id, {**fields, "heartbeat_at": now, "updated_at": now})
+
+    async def add_error(self, job_id: DocumentId, message: str) -> None:
+        await self.collection.update_one(
+            {"_id": to_object_id(job_id)},
+            {"$push": {"errors": message}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+
+    async def finish(self, job_id: DocumentId, state: str, **fields: Any) -> bool:
+        now = datetime.utcnow()
+        return await self.update(job_id, {**fields, "state": state, "finished_at": now, "updated_at": now})
+
+    async def requeue(self, job_id: DocumentId) -> bool:
+        """Put a running job back in the queue (e.g. its worker shut down)."""
+        result = await self.collection.update_one(
+            {"_id": to_object_id(job_id), "state": "running"},
+            {"$set": {"state": "queued", "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+    async def requeue_stale(self, heartbeat_before: datetime) -> int:
+        """Requeue running jobs whose worker stopped sending heartbeats (crashed or killed)."""
+        result = await self.collection.update_many(
+            {"state": "running", "heartbeat_at": {"$lt": heartbeat_before}},
+            {"$set": {"state": "queued", "updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def latest_for_textbook(self, textbook_id: DocumentId) -> Optional[Document]:
+        cursor = self.collection.find({"textbook_id": to_object_id(textbook_id)})
+        documents = await cursor.sort("created_at", DESCENDING).limit(1).to_list(None)
+        return documents[0] if documents else None
+
+
+# Repositories shared by all routers
+subjects_repo = SubjectRepository(async_db.subjects)
+topics_repo = TopicRepository(async_db.topics)
+contents_repo = ContentRepository(async_db.contents)
+questions_repo = QuestionRepository(async_db.questions)
+users_repo = UserRepository(async_db.users)
+progress_repo = ProgressRepository(async_db.progress)
+textbooks_repo = TextbookRepository(async_db.textbooks)
+textbook_content_repo = TextbookContentRepository(async_db.textbook_content)
+textbook_passages_repo = TextbookPassageRepository(async_db.textbook_passages)
+study_sheets_repo = StudySheetRepository(async_db.study_sheets)
+user_history_repo = UserHistoryRepository(async_db.user_history)
+jobs_repo = JobRepository(async_db.jobs)
+locks_repo = LockRepository(async_db.locks)
@@ -73,6 +73,11 @@ class TopicInDB(MongoBaseModel, TopicBase):
 class Topic(TopicInDB):
     pass
 
+class TopicSummary(MongoBaseModel):
+    name: str
+    subject_id: str
+    difficulty: float = 5.0
+
 # Content models
 class ContentBase(BaseModel):
     topic_id: str
@@ -99,6 +104,28 @@ class ContentInDB(MongoBaseModel, ContentBase):
 class Content(ContentInDB):
     pass
 
+class ContentSummary(MongoBaseModel):
+    topic_id: str
+    type: str
+    title: str
+    difficulty: float = 5.0
+    source: str = "EduAI"
+
+class ContentSearchHit(MongoBaseModel):
+    topic_id: str
+    type: str
+    title: str
+    difficulty: float = 5.0
+    score: float
+    snippet: str
+    # [start, end] offsets of the matched terms in title and snippet
+    title_highlights: List[List[int]] = Field(default_factory=list)
+    snippet_highlights: List[List[int]] = Field(default_factory=list)
+
+class ContentSearchResults(BaseModel):
+    results: List[ContentSearchHit]
+    next_offset: Optional[int] = None
+
 # Question models
 class QuestionBase(BaseModel):
     topic_id: str
@@ -127,6 +154,49 @@ class QuestionInDB(MongoBaseModel, QuestionBase):
 class Question(QuestionInDB):
     pass
 
+class QuestionSummary(MongoBaseModel):
+    topic_id: str
+    content_id: Optional[str] = None
+    text: str
+    difficulty: float = 5.0
+
+# Textbook models
+class TextbookSummary(MongoBaseModel):
+    title: str
+    subject: str
+    grade: str
+    status: str
+    uploaded_at: Optional[datetime] = None
+
+class Textbook(TextbookSummary):
+    description: str = ""
+    filename: str
+    file_size: int = 0
+    uploaded_by: Optional[PyObjectId] = None
+    pages_processed: int = 0
+    processed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+
+class TextbookStatus(BaseModel):
+    textbook_id: str
+    status: str
+    job_id: Optional[str] = None
+    state: Optional[str] = None
+    pages_done: int = 0
+    pages_total: Optional[int] = None
+    errors: List[str] = Field(default_factory=list)
+    updated_at: Optional[datetime] = None
+
+# Bulk ingestion models
+class BulkItemError(BaseModel):
+    index: int
+    detail: str
+
+class BulkResult(BaseModel):
+    inserted: int
+    ids: List[str] = Field(default_factory=list)
+    errors: List[BulkItemError] = Field(default_factory=list)
+
 # User models
 class UserBase(BaseModel):
     username: str
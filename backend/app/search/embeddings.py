@@ -0,0 +1,67 @@
+"""
+Local text embeddings from hashed n-grams.
+
+Words, word bigrams and character trigrams of a text are hashed into
+EMBEDDING_DIM signed buckets (the hashing trick) and the vector is L2
+normalised, so cosine similarity is a dot product. Nothing is downloaded or
+trained and the hash (CRC32) is stable across processes, so vectors written
+by one worker are comparable with queries embedded by another.
+
+Character trigrams make related word forms ("equation", "equations",
+"equational") land close together, which keyword matching misses.
+"""
+import math
+import zlib
+from collections import Counter
+from typing import Iterable, List
+import numpy as np
+from app.search.text import tokenize
+
+EMBEDDING_DIM = 256
+
+# Relative weight of each feature type
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.3
+
+
+def _features(text: str) -> Counter:
+    tokens = tokenize(text)
+    features = Counter()
+    for token in tokens:
+        features["w:" + token] += WORD_WEIGHT
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            features["c:" + padded[i:i + 3]] += TRIGRAM_WEIGHT
+    for first, second in zip(tokens, tokens[1:]):
+        features["b:" + first + " " + second] += BIGRAM_WEIGHT
+    return features
+
+
+def embed(text: str) -> np.ndarray:
+    """Embed one text as a unit-length float32 vector (all zeros for text without terms)."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature, weight in _features(text).items():
+        bucket = zlib.crc32(feature.encode("utf-8"))
+        sign = 1.0 if bucket & 0x80000000 else -1.0
+        # Sublinear weighting so repeated words do not dominate
+        vector[bucket % EMBEDDING_DIM] += sign * math.log1p(weight)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_many(texts: Iterable[str]) -> np.ndarray:
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.stack([embed(text) for text in texts])
+
+
+def quantize(vectors: np.ndarray) -> np.ndarray:
+    """Unit vectors to int8 (components are within [-1, 1]), a quarter of the float32 size."""
+    return np.clip(np.rint(vectors * 127), -127, 127).astype(np.int8)
+
+
+def to_bytes(vectors: np.ndarray) -> List[bytes]:
+    """Quantized rows as bytes for storage."""
+    return [row.tobytes() for row in quantize(vectors)]
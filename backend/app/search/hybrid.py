@@ -0,0 +1,136 @@
+"""
+Hybrid retrieval of textbook passages.
+
+Keyword (BM25, app.search.inverted_index) and semantic (app.search.vector_index)
+candidates are generated concurrently and fused with reciprocal-rank fusion,
+which needs no score calibration between the two. The best fused candidates
+are read and reranked by how many of the query terms they contain, and at
+most ``budget`` passages (one per page) are returned.
+
+Every stage is timed so candidate sizes can be tuned per deployment with the
+HYBRID_* environment variables.
+"""
+import os
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+from bson import ObjectId
+from app.repositories import textbook_passages_repo
+from app.search.inverted_index import search_index
+from app.search.snippets import term_matches
+from app.search.text import stem, tokenize
+from app.search.vector_index import vector_store
+
+# Candidates taken from each retriever
+LEXICAL_CANDIDATES = int(os.getenv("HYBRID_LEXICAL_CANDIDATES", "30"))
+VECTOR_CANDIDATES = int(os.getenv("HYBRID_VECTOR_CANDIDATES", "30"))
+
+# Vector candidates less similar than this are unrelated and dropped
+MIN_SIMILARITY = float(os.getenv("HYBRID_MIN_SIMILARITY", "0.2"))
+
+# Fused candidates read and reranked, per passage of the budget
+RERANK_POOL_FACTOR = int(os.getenv("HYBRID_RERANK_POOL_FACTOR", "3"))
+
+# Reciprocal-rank fusion constant (60 is the usual choice)
+RRF_K = 60
+
+# Weight of query term coverage in the rerank, relative to the fused score
+COVERAGE_WEIGHT = 1.0
+
+
+@dataclass
+class RetrievedPassage:
+    passage: Dict[str, Any]
+    score: float
+    lexical_rank: Optional[int]
+    vector_rank: Optional[int]
+
+
+@dataclass
+class HybridResult:
+    passages: List[RetrievedPassage] = field(default_factory=list)
+    # Milliseconds spent per stage
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+async def _timed(timings: Dict[str, float], stage: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[ObjectId]], k: int = RRF_K) -> Dict[ObjectId, float]:
+    """Sum of 1 / (k + rank) over the rankings each id appears in (ranks start at 1)."""
+    scores: Dict[ObjectId, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+def term_coverage(text: str, query_terms: Sequence[str]) -> float:
+    """Fraction of the distinct query terms that occur in ``text``."""
+    stems = {stem(term) for term in query_terms}
+    if not stems:
+        return 0.0
+    return len({token for token, _, _ in term_matches(text, stems)}) / len(stems)
+
+
+async def hybrid_search(query: str,
+                        textbook_ids: List[ObjectId],
+                        budget: int,
+                        lexical_k: int = LEXICAL_CANDIDATES,
+                        vector_k: int = VECTOR_CANDIDATES) -> HybridResult:
+    """Return at most ``budget`` passages of the given textbooks for ``query``, best first."""
+    result = HybridResult()
+    timings = result.timings
+    started = time.perf_counter()
+
+    lexical_hits, vector_hits = await asyncio.gather(
+        _timed(timings, "lexical", search_index.search(query, k=lexical_k, textbook_ids=textbook_ids)),
+        _timed(timings, "vector", asyncio.to_thread(
+            vector_store.search, query, vector_k, "passage", textbook_ids
+        ))
+    )
+
+    fusion_started = time.perf_counter()
+    lexical_ranking = [hit.passage_id for hit in lexical_hits]
+    vector_ranking = [hit.id for hit in vector_hits if hit.score >= MIN_SIMILARITY]
+    fused = reciprocal_rank_fusion([lexical_ranking, vector_ranking])
+    pool = sorted(fused, key=fused.get, reverse=True)[:budget * RERANK_POOL_FACTOR]
+    timings["fusion"] = round((time.perf_counter() - fusion_started) * 1000, 2)
+
+    passages = await _timed(timings, "fetch", textbook_passages_repo.get_many(pool))
+
+    rerank_started = time.perf_counter()
+    lexical_ranks = {passage_id: rank for rank, passage_id in enumerate(lexical_ranking, start=1)}
+    vector_ranks = {passage_id: rank for rank, passage_id in enumerate(vector_ranking, start=1)}
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    # Normalised so full coverage counts as much as a first place in one ranking
+    coverage_scale = COVERAGE_WEIGHT / (RRF_K + 1)
+    candidates = [
+        RetrievedPassage(
+            passages[passage_id],
+            fused[passage_id] + coverage_scale * term_coverage(passages[passage_id]["content"], query_terms),
+            lexical_ranks.get(passage_id),
+            vector_ranks.get(passage_id)
+        )
+        for passage_id in pool if passage_id in passages
+    ]
+    candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+
+    pages = set()
+    for candidate in candidates:
+        page = (candidate.passage["textbook_id"], candidate.passage["page"])
+        if page in pages:
+            continue
+        pages.add(page)
+        result.passages.append(candidate)
+        if len(result.passages) >= budget:
+            break
+    timings["rerank"] = round((time.perf_counter() - rerank_started) * 1000, 2)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
@@ -0,0 +1,207 @@
+"""
+Persistent inverted index over textbook passages, ranked with BM25.
+
+The indexed documents are the passages of app.search.passages, identified by
+their ``textbook_passages`` id.
+
+Collections:
+    search_postings    {term, passage_id, textbook_id, page, tf, dl}   one per term and passage
+    search_terms       {_id: term, df}                                 document frequency
+    search_documents   {_id: passage_id, textbook_id, page, dl}        indexed passages
+    search_stats       {_id: "passages", count, total_length}          corpus statistics
+
+Textbooks are indexed when they are processed and removed from the index
+before they are reprocessed, so every update is incremental: only the
+postings of that textbook and the counters of its terms change.
+
+A query reads at most MAX_POSTINGS_PER_TERM postings per query term, highest
+term frequency first, so its cost depends on the number of query terms
+rather than on the size of the library.
+
+Usage:
+    python -m app.search.inverted_index --rebuild   # drop the index and re-index every processed textbook
+"""
+import sys
+import math
+import heapq
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.database import async_db
+from app.repositories import DocumentId, to_object_id
+from app.search.text import tokenize, term_frequencies
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Upper bound on the postings read per query term
+MAX_POSTINGS_PER_TERM = 5000
+
+SEARCH_COLLECTIONS = ("search_postings", "search_terms", "search_documents", "search_stats")
+
+
+@dataclass
+class SearchHit:
+    passage_id: ObjectId
+    textbook_id: ObjectId
+    page: int
+    score: float
+
+
+class InvertedIndex:
+    """BM25 search over textbook passages, stored in MongoDB."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.postings = db.search_postings
+        self.terms = db.search_terms
+        self.documents = db.search_documents
+        self.stats = db.search_stats
+
+    async def index_passages(self, textbook_id: DocumentId, passages: Iterable[Dict[str, Any]]) -> int:
+        """Add ``{"_id", "page", "content"}`` passages of a textbook and return how many were indexed."""
+        textbook_id = to_object_id(textbook_id)
+        postings = []
+        documents = []
+        document_frequencies = Counter()
+        total_length = 0
+
+        for passage in passages:
+            frequencies = term_frequencies(passage["content"])
+            length = sum(frequencies.values())
+            if not length:
+                continue
+            documents.append({"_id": passage["_id"], "textbook_id": textbook_id,
+                              "page": passage["page"], "dl": length})
+            total_length += length
+            for term, count in frequencies.items():
+                postings.append({"term": term, "passage_id": passage["_id"], "textbook_id": textbook_id,
+                                 "page": passage["page"], "tf": count, "dl": length})
+                document_frequencies[term] += 1
+
+        if not documents:
+            return 0
+
+        await self.postings.insert_many(postings, ordered=False)
+        await self.documents.insert_many(documents, ordered=False)
+        await self._add_to_counters(document_frequencies, len(documents), total_length)
+        return len(documents)
+
+    async def remove_textbook(self, textbook_id: DocumentId) -> int:
+        """Remove every indexed passage of a textbook and return how many were removed."""
+        textbook_id = to_object_id(textbook_id)
+        totals = await self.documents.aggregate([
+            {"$match": {"textbook_id": textbook_id}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "total_length": {"$sum": "$dl"}}}
+        ]).to_list(None)
+        if not totals:
+            return 0
+
+        document_frequencies = Counter({
+            group["_id"]: group["count"]
+            async for group in self.postings.aggregate([
+                {"$match": {"textbook_id": textbook_id}},
+                {"$group": {"_id": "$term", "count": {"$sum": 1}}}
+            ])
+        })
+        await self.postings.delete_many({"textbook_id": textbook_id})
+        await self.documents.delete_many({"textbook_id": textbook_id})
+
+        count, total_length = totals[0]["count"], totals[0]["total_length"]
+        await self._add_to_counters(
+            Counter({term: -n for term, n in document_frequencies.items()}), -count, -total_length
+        )
+        await self.terms.delete_many({"df": {"$lte": 0}})
+        return count
+
+    async def _add_to_counters(self, document_frequencies: Dict[str, int], count: int, total_length: int) -> None:
+        if document_frequencies:
+            await self.terms.bulk_write([
+                UpdateOne({"_id": term}, {"$inc": {"df": n}}, upsert=True)
+                for term, n in document_frequencies.items()
+            ], ordered=False)
+        await self.stats.update_one(
+            {"_id": "passages"},
+            {"$inc": {"count": count, "total_length": total_length}},
+            upsert=True
+        )
+
+    async def corpus_version(self) -> Tuple[int, int]:
+        """``(passages, total length)`` of the index, which changes whenever a textbook is indexed or removed."""
+        stats = await self.stats.find_one({"_id": "passages"}) or {}
+        return stats.get("count", 0), stats.get("total_length", 0)
+
+    async def _postings(self, term: str, textbook_ids: Optional[List[ObjectId]]) -> Tuple[str, List[Dict[str, Any]]]:
+        query: Dict[str, Any] = {"term": term}
+        if textbook_ids is not None:
+            query["textbook_id"] = {"$in": textbook_ids}
+        cursor = self.postings.find(query, {"_id": 0, "passage_id": 1, "textbook_id": 1, "page": 1, "tf": 1, "dl": 1})
+        return term, await cursor.sort("tf", -1).limit(MAX_POSTINGS_PER_TERM).to_list(None)
+
+    async def search(self,
+                     query: str,
+                     k: int = 10,
+                     textbook_ids: Optional[Iterable[DocumentId]] = None) -> List[SearchHit]:
+        """Return the ``k`` best passages for ``query`` by BM25, optionally only from some textbooks."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        if textbook_ids is not None:
+            textbook_ids = [to_object_id(textbook_id) for textbook_id in textbook_ids]
+            if not textbook_ids:
+                return []
+
+        stats = await self.stats.find_one({"_id": "passages"})
+        if not stats or stats.get("count", 0) <= 0:
+            return []
+        num_passages = stats["count"]
+        average_length = stats["total_length"] / num_passages
+
+        document_frequencies = {
+            document["_id"]: document["df"]
+            async for document in self.terms.find({"_id": {"$in": terms}})
+        }
+        results = await asyncio.gather(*(self._postings(term, textbook_ids) for term in document_frequencies))
+
+        scores: Dict[ObjectId, float] = defaultdict(float)
+        locations: Dict[ObjectId, Tuple[ObjectId, int]] = {}
+        for term, postings in results:
+            df = document_frequencies[term]
+            idf = math.log(1 + (num_passages - df + 0.5) / (df + 0.5))
+            for posting in postings:
+                tf = posting["tf"]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * posting["dl"] / average_length)
+                scores[posting["passage_id"]] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                locations[posting["passage_id"]] = (posting["textbook_id"], posting["page"])
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [SearchHit(passage_id, *locations[passage_id], score) for passage_id, score in best]
+
+
+search_index = InvertedIndex(async_db)
+
+
+async def _rebuild() -> None:
+    from app.repositories import textbooks_repo
+    from app.search.passages import index_textbook_passages
+
+    for collection in SEARCH_COLLECTIONS:
+        await async_db[collection].delete_many({})
+    for textbook in await textbooks_repo.find({"status": "processed"}, projection={"title": 1}):
+        passages = await index_textbook_passages(textbook["_id"])
+        print(f"Indexed {passages} passage(s) of {textbook.get('title')}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if "--rebuild" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(_rebuild())
@@ -0,0 +1,98 @@
+"""
+Passage chunking of textbook pages.
+
+Pages are split into passages of about PASSAGE_CHARS characters at paragraph
+and sentence boundaries when a textbook is processed. Each passage is stored
+in ``textbook_passages`` with its character offsets in the page and is the
+unit the inverted index ranks and the vector index embeds, so search reads a
+few short passages instead of whole pages.
+"""
+import re
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from bson import ObjectId
+from app.repositories import DocumentId, to_object_id, textbook_content_repo, textbook_passages_repo
+from app.search.inverted_index import search_index
+from app.search.vector_index import vector_store
+
+# Target passage length in characters
+PASSAGE_CHARS = 800
+
+# Passages stored and indexed per round of writes
+PASSAGE_BATCH_SIZE = 500
+
+# Paragraph breaks and sentence ends
+_BOUNDARY = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+
+
+def chunk_passages(text: str, size: int = PASSAGE_CHARS) -> List[Tuple[int, int]]:
+    """
+    Split ``text`` into ``(start, end)`` character spans of about ``size``
+    characters, cutting at paragraph or sentence boundaries where possible.
+    """
+    cuts = [match.end() for match in _BOUNDARY.finditer(text)]
+    cuts.append(len(text))
+
+    spans = []
+    start = 0
+    previous = 0
+    for cut in cuts:
+        if cut - start > size and previous > start:
+            spans.append((start, previous))
+            start = previous
+        # A run without any boundary (tables, lists) is split at spaces
+        while cut - start > 2 * size:
+            split = text.rfind(" ", start + 1, start + size)
+            if split <= start:
+                split = start + size
+            spans.append((start, split))
+            start = split
+        previous = cut
+    if start < len(text):
+        spans.append((start, len(text)))
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+async def _passages(textbook_id: ObjectId) -> AsyncIterator[Dict[str, Any]]:
+    async for page in textbook_content_repo.iter_pages(textbook_id):
+        for number, (start, end) in enumerate(chunk_passages(page["content"])):
+            yield {
+                "_id": ObjectId(),
+                "textbook_id": textbook_id,
+                "page": page["page"],
+                "passage": number,
+                "start": start,
+                "end": end,
+                "content": page["content"][start:end]
+            }
+
+
+async def index_textbook_passages(textbook_id: DocumentId) -> int:
+    """
+    Chunk the stored pages of a textbook into passages, store them and add
+    them to the search and vector indexes (replacing earlier passages). Returns how many
+    passages were indexed.
+    """
+    textbook_id = to_object_id(textbook_id)
+    await search_index.remove_textbook(textbook_id)
+    await vector_store.remove_group(textbook_id, "passage")
+    await textbook_passages_repo.delete_for_textbook(textbook_id)
+
+    indexed = 0
+    batch = []
+    async for passage in _passages(textbook_id):
+        batch.append(passage)
+        if len(batch) >= PASSAGE_BATCH_SIZE:
+            indexed += await _store(textbook_id, batch)
+            batch = []
+    if batch:
+        indexed += await _store(textbook_id, batch)
+    return indexed
+
+
+async def _store(textbook_id: ObjectId, passages: List[Dict[str, Any]]) -> int:
+    await textbook_passages_repo.insert_passages(passages)
+    await vector_store.upsert(
+        {"_id": passage["_id"], "kind": "passage", "group": textbook_id, "text": passage["content"]}
+        for passage in passages
+    )
+    return await search_index.index_passages(textbook_id, passages)
@@ -0,0 +1,84 @@
+"""
+Query-focused snippet extraction.
+
+``best_window`` picks the window of a passage that covers the most distinct
+query terms (then the most occurrences) and returns its character offsets,
+so callers can show a short relevant excerpt instead of the start of a page.
+"""
+from typing import Iterable, List, Tuple
+from app.search.text import stem, token_spans, tokenize
+
+# Characters of passage text shown per snippet
+SNIPPET_CHARS = 300
+
+
+def best_window(text: str, query_terms: Iterable[str], width: int = SNIPPET_CHARS) -> Tuple[int, int]:
+    """
+    Return ``(start, end)`` offsets of the best window of at most ``width``
+    characters in ``text`` for ``query_terms``, snapped to word boundaries.
+    Without any matching term the window starts at the beginning of the text.
+    """
+    if len(text) <= width:
+        return 0, len(text)
+
+    matches = term_matches(text, query_terms)
+    if not matches:
+        return 0, _snap_end(text, width)
+
+    # Slide over the matches: the best run of matches that fits in the window
+    best = (0, 0, 0, 0)  # (distinct terms, occurrences, first match, last match)
+    first = 0
+    for last in range(len(matches)):
+        while matches[last][2] - matches[first][1] > width:
+            first += 1
+        run = matches[first:last + 1]
+        score = (len({token for token, _, _ in run}), len(run))
+        if score > best[:2]:
+            best = (*score, first, last)
+
+    # Centre the window on the run of matches
+    span_start, span_end = matches[best[2]][1], matches[best[3]][2]
+    start = max(0, span_start - (width - (span_end - span_start)) // 2)
+    start = min(start, len(text) - width)
+    return _snap_start(text, start), _snap_end(text, start + width)
+
+
+def term_matches(text: str, query_terms: Iterable[str]) -> List[Tuple[str, int, int]]:
+    """Occurrences ``(stem, start, end)`` of the query terms in ``text``, in any inflection."""
+    stems = {stem(term) for term in query_terms}
+    matches = []
+    for token, start, end in token_spans(text):
+        token = stem(token)
+        if token in stems:
+            matches.append((token, start, end))
+    return matches
+
+
+def highlights(text: str, query: str) -> List[Tuple[int, int]]:
+    """``(start, end)`` offsets in ``text`` of every query term, for highlighting."""
+    return [(start, end) for _, start, end in term_matches(text, tokenize(query))]
+
+
+def _snap_start(text: str, start: int) -> int:
+    if start == 0 or text[start - 1].isspace():
+        return start
+    space = text.find(" ", start)
+    return space + 1 if 0 <= space < start + 20 else start
+
+
+def _snap_end(text: str, end: int) -> int:
+    if end >= len(text) or text[end].isspace():
+        return min(end, len(text))
+    space = text.rfind(" ", end - 20, end)
+    return space if space > 0 else end
+
+
+def snippet(text: str, query: str, width: int = SNIPPET_CHARS) -> Tuple[str, int, int]:
+    """The best excerpt of ``text`` for ``query`` with "..." where it was cut, and its offsets."""
+    start, end = best_window(text, tokenize(query), width)
+    excerpt = text[start:end].strip()
+    if start > 0:
+        excerpt = "..." + excerpt
+    if end < len(text.rstrip()):
+        excerpt = excerpt + "..."
+    return excerpt, start, end
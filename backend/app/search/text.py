@@ -0,0 +1,55 @@
+"""
+Tokenization shared by the search indexes.
+
+Deliberately dependency free (no NLTK) so indexing and querying are cheap and
+always tokenize text the same way.
+"""
+import re
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Matches the same tokens in text that was not lowercased, keeping offsets intact
+_TOKEN_PATTERN_ANY_CASE = re.compile(r"[a-zA-Z0-9]+")
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+
+def _is_term(token: str) -> bool:
+    return len(token) > 1 and token not in STOP_WORDS
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stop words or single characters."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if _is_term(token)]
+
+
+def token_spans(text: str) -> Iterator[Tuple[str, int, int]]:
+    """The tokens of ``tokenize`` with their character offsets in ``text``."""
+    for match in _TOKEN_PATTERN_ANY_CASE.finditer(text):
+        token = match.group().lower()
+        if _is_term(token):
+            yield token, match.start(), match.end()
+
+
+def stem(token: str) -> str:
+    """
+    Strip common English inflections ("equations" -> "equation", "solving" ->
+    "solv") so highlighting also matches forms that MongoDB text search stems.
+    """
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+
+def term_frequencies(text: str) -> Dict[str, int]:
+    return dict(Counter(tokenize(text)))
@@ -0,0 +1,433 @@
+"""
+Semantic vector retrieval over textbook passages.
+
+Items are embedded with app.search.embeddings and stored as int8 vectors in
+the ``embeddings`` collection:
+
+    embeddings   {_id: item id, kind, group, vector, updated_at, deleted}
+
+``kind`` is "passage" (group: textbook id), the only corpus hybrid search
+reads (app.search.hybrid). Vectors of other kinds left in the collection are
+ignored and dropped by ``--rebuild``.
+
+Contents are not embedded. Matching a topic to textbook material, which
+used to be keyword overlap alone, goes through hybrid search over passages,
+and content search (app.api.search) is a ``$text`` query; nothing reads
+content vectors. Semantic matching of contents needs both a "content" kind
+written by app.api.contents and a query path that fuses its hits.
+Removed items are kept as tombstones with ``deleted`` set so that other
+workers drop them on their next refresh; a full load purges the ones older
+than VECTOR_TOMBSTONE_RETENTION_SECONDS.
+
+Every worker keeps an in-memory IVF (inverted file) index of the collection:
+vectors are clustered around k-means centroids and stored grouped by cluster,
+so a query scores the centroids and then only the vectors of the NPROBE
+closest clusters. Vectors written after the index was built are kept in a
+small buffer that is scanned exhaustively until the next rebuild. Refreshes
+re-read a window of VECTOR_REFRESH_OVERLAP_SECONDS before the previous one, so
+writes committed late or stamped by a host with a lagging clock are not missed.
+
+Usage:
+    python -m app.search.vector_index --rebuild   # re-embed every textbook passage
+"""
+import os
+import sys
+import math
+import asyncio
+import logging
+from threading import Lock
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from bson import Binary, ObjectId
+from pymongo import ReplaceOne
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.database import async_db
+from app.repositories import DocumentId, to_object_id
+from app.search.embeddings import EMBEDDING_DIM, embed, embed_many, quantize
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+KINDS = {"passage": 0}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+# Clusters scanned per query; more is slower and closer to exact search
+NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+
+# Below this many vectors every query is an exact scan
+MIN_VECTORS_FOR_CLUSTERS = 20000
+
+# Seconds between reads of vectors written by other workers
+VECTOR_REFRESH_SECONDS = int(os.getenv("VECTOR_REFRESH_SECONDS", "10"))
+
+# The index is rebuilt once the unclustered buffer is this large (or a tenth of the index)
+MAX_PENDING_VECTORS = 5000
+
+# Refreshes re-read changes this much older than the previous refresh
+VECTOR_REFRESH_OVERLAP_SECONDS = int(os.getenv("VECTOR_REFRESH_OVERLAP_SECONDS", "60"))
+
+# Tombstones older than this are deleted by a full load
+VECTOR_TOMBSTONE_RETENTION_SECONDS = int(os.getenv("VECTOR_TOMBSTONE_RETENTION_SECONDS", "3600"))
+
+LOAD_BATCH_SIZE = 10000
+
+# Ids are kept as 12-byte strings; numpy drops trailing zero bytes when reading them back
+_ID_BYTES = 12
+
+
+def _id_bytes(value: bytes) -> bytes:
+    return bytes(value).ljust(_ID_BYTES, b"\0")
+
+
+def _utcnow() -> datetime:
+    """Current time at the millisecond precision MongoDB stores."""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+@dataclass
+class VectorHit:
+    id: ObjectId
+    kind: str
+    group: ObjectId
+    score: float
+
+
+def _kmeans(data: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means: unit centroids, points assigned by the largest dot product."""
+    centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(data @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        centroids[filled] = np.add.reduceat(data[order], starts[filled], axis=0)
+        # Empty clusters restart from random points
+        centroids[~filled] = data[rng.choice(len(data), int((~filled).sum()))]
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms > 0, norms, 1)
+    return centroids
+
+
+class IVFIndex:
+    """In-memory approximate nearest neighbour index over int8 unit vectors."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.vectors = np.zeros((0, dim), dtype=np.int8)
+        self.keys = np.zeros(0, dtype="S12")
+        self.kinds = np.zeros(0, dtype=np.uint8)
+        self.groups = np.zeros(0, dtype="S12")
+        self.alive = np.zeros(0, dtype=bool)
+        self.positions: Dict[bytes, int] = {}
+        # key -> (vector, kind, group) of vectors added since the build
+        self.pending: Dict[bytes, Tuple[np.ndarray, int, bytes]] = {}
+        # Searches run in worker threads while the event loop adds and removes vectors
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return int(self.alive.sum()) + len(self.pending)
+
+    @classmethod
+    def build(cls,
+              vectors: np.ndarray,
+              keys: np.ndarray,
+              kinds: np.ndarray,
+              groups: np.ndarray,
+              nlist: Optional[int] = None,
+              iterations: int = 10,
+              seed: int = 0) -> "IVFIndex":
+        """
+        Cluster ``vectors`` (int8, one row per key) and return the index.
+        ``nlist`` defaults to about the square root of the number of vectors.
+        """
+        index = cls(vectors.shape[1] if vectors.ndim == 2 else EMBEDDING_DIM)
+        n = len(vectors)
+        if n >= MIN_VECTORS_FOR_CLUSTERS:
+            nlist = nlist or min(4096, int(math.sqrt(n)))
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(n, min(n, nlist * 64), replace=False)].astype(np.float32)
+            index.centroids = _kmeans(sample, nlist, iterations, rng)
+            assignments = np.concatenate([
+                np.argmax(vectors[start:start + 65536].astype(np.float32) @ index.centroids.T, axis=1)
+                for start in range(0, n, 65536)
+            ])
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+        else:
+            order = np.arange(n)
+            counts = np.array([n])
+        index.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        index.vectors = np.ascontiguousarray(vectors[order])
+        index.keys = keys[order]
+        index.kinds = kinds[order]
+        index.groups = groups[order]
+        index.alive = np.ones(n, dtype=bool)
+        index.positions = {_id_bytes(key): position for position, key in enumerate(index.keys.tolist())}
+        return index
+
+    def add(self, key: bytes, vector: np.ndarray, kind: int, group: bytes) -> None:
+        with self._lock:
+            self._remove(key)
+            self.pending[key] = (vector, kind, group)
+
+    def remove(self, key: bytes) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: bytes) -> None:
+        position = self.positions.pop(key, None)
+        if position is not None:
+            self.alive[position] = False
+        self.pending.pop(key, None)
+
+    def remove_group(self, group: bytes, kind: int) -> None:
+        with self._lock:
+            self.alive &= ~((self.groups == group) & (self.kinds == kind))
+            for key, (_, pending_kind, pending_group) in list(self.pending.items()):
+                if pending_group == group and pending_kind == kind:
+                    del self.pending[key]
+
+    def search(self,
+               query: np.ndarray,
+               k: int = 10,
+               kind: Optional[int] = None,
+               groups: Optional[Iterable[bytes]] = None,
+               nprobe: int = NPROBE) -> List[Tuple[bytes, int, bytes, float]]:
+        """
+        The ``k`` nearest ``(key, kind, group, cosine)`` for a unit float32 ``query``.
+        Safe to call from another thread than the one adding and removing vectors:
+        it works on a snapshot of the live flags and the buffer.
+        """
+        with self._lock:
+            alive = self.alive.copy()
+            pending_items = list(self.pending.items())
+        group_filter = np.array(list(groups), dtype="S12") if groups is not None else None
+
+        if len(self.centroids):
+            nprobe = min(nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.concatenate([np.arange(self.offsets[cluster], self.offsets[cluster + 1]) for cluster in probe])
+        else:
+            rows = np.arange(len(self.vectors))
+        rows = rows[alive[rows]]
+        if kind is not None:
+            rows = rows[self.kinds[rows] == kind]
+        if group_filter is not None:
+            rows = rows[np.isin(self.groups[rows], group_filter)]
+
+        keys = self.keys[rows]
+        kinds = self.kinds[rows]
+        found_groups = self.groups[rows]
+        scores = self.vectors[rows] @ query
+
+        pending = [
+            (key, vector, pending_kind, group)
+            for key, (vector, pending_kind, group) in pending_items
+            if (kind is None or pending_kind == kind)
+            and (group_filter is None or group in group_filter)
+        ]
+        if pending:
+            keys = np.concatenate((keys, np.array([item[0] for item in pending], dtype="S12")))
+            kinds = np.concatenate((kinds, np.array([item[2] for item in pending], dtype=np.uint8)))
+            found_groups = np.concatenate((found_groups, np.array([item[3] for item in pending], dtype="S12")))
+            scores = np.concatenate((scores, np.stack([item[1] for item in pending]) @ query))
+
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(_id_bytes(keys[i]), int(kinds[i]), _id_bytes(found_groups[i]), float(scores[i]) / 127)
+                for i in best]
+
+
+class VectorStore:
+    """Embeddings in MongoDB with an in-memory IVF index for search."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.embeddings
+        self.index = IVFIndex()
+        self.ready = False
+        # Changes at or after this time have not been read from the collection yet
+        self.loaded_until: Optional[datetime] = None
+        # id -> updated_at of vectors already in the index that the next refresh reads again
+        self._applied: Dict[ObjectId, datetime] = {}
+
+    async def upsert(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Embed and store ``{"_id", "kind", "group", "text"}`` items, replacing earlier vectors."""
+        items = list(items)
+        if not items:
+            return 0
+        vectors = quantize(await asyncio.to_thread(embed_many, [item["text"] for item in items]))
+        now = _utcnow()
+        requests = []
+        for item, vector in zip(items, vectors):
+            item_id, group = to_object_id(item["_id"]), to_object_id(item["group"])
+            requests.append(ReplaceOne({"_id": item_id}, {
+                "kind": item["kind"],
+                "group": group,
+                "vector": Binary(vector.tobytes()),
+                "updated_at": now
+            }, upsert=True))
+            self.index.add(item_id.binary, vector, KINDS[item["kind"]], group.binary)
+            self._applied[item_id] = now
+        await self.collection.bulk_write(requests, ordered=False)
+        self._update_gauges()
+        return len(items)
+
+    async def remove(self, ids: Iterable[DocumentId]) -> None:
+        ids = [to_object_id(item_id) for item_id in ids]
+        if not ids:
+            return
+        await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"deleted": True, "updated_at": datetime.utcnow()}, "$unset": {"vector": ""}}
+        )
+        for item_id in ids:
+            self.index.remove(item_id.binary)
+        self._update_gauges()
+
+    async def remove_group(self, group: DocumentId, kind: str) -> None:
+        """Remove every vector of a textbook ("passage")."""
+        group = to_object_id(group)
+        await self.collection.update_many(
+            {"group": group, "kind": kind, "deleted": {"$ne": True}},
+            {"$set": {"deleted": True, "updated_at": datetime.utcnow()}, "$unset": {"vector": ""}}
+        )
+        self.index.remove_group(group.binary, KINDS[kind])
+        self._update_gauges()
+
+    async def load(self) -> int:
+        """
+        Read every stored vector and rebuild the index, then purge old tombstones.
+        Returns the number of vectors.
+        """
+        started = datetime.utcnow()
+        loaded_until = started - timedelta(seconds=VECTOR_REFRESH_OVERLAP_SECONDS)
+        applied = {}
+        keys, kinds, groups, chunks = [], [], [], []
+        cursor = self.collection.find({"kind": {"$in": list(KINDS)}, "deleted": {"$ne": True}},
+                                      {"kind": 1, "group": 1, "vector": 1, "updated_at": 1})
+        async for document in cursor.batch_size(LOAD_BATCH_SIZE):
+            if document["updated_at"] >= loaded_until:
+                applied[document["_id"]] = document["updated_at"]
+            keys.append(document["_id"].binary)
+            kinds.append(KINDS[document["kind"]])
+            groups.append(document["group"].binary)
+            chunks.append(document["vector"])
+
+        vectors = (np.frombuffer(b"".join(chunks), dtype=np.int8).reshape(-1, EMBEDDING_DIM)
+                   if chunks else np.zeros((0, EMBEDDING_DIM), dtype=np.int8))
+        index = await asyncio.to_thread(
+            IVFIndex.build,
+            vectors,
+            np.array(keys, dtype="S12"),
+            np.array(kinds, dtype=np.uint8),
+            np.array(groups, dtype="S12")
+        )
+        self.index = index
+        self.loaded_until = loaded_until
+        self._applied = applied
+        self.ready = True
+        # Changes made while the index was built
+        await self.refresh()
+        await self.collection.delete_many({
+            "updated_at": {"$lt": started - timedelta(seconds=VECTOR_TOMBSTONE_RETENTION_SECONDS)},
+            "deleted": True
+        })
+        return len(keys)
+
+    async def refresh(self) -> int:
+        """
+        Apply vectors written or removed by any worker since the last load or refresh
+        (less the overlap). Vectors already applied at the same ``updated_at`` are skipped.
+        """
+        if self.loaded_until is None:
+            return await self.load()
+        loaded_until = datetime.utcnow() - timedelta(seconds=VECTOR_REFRESH_OVERLAP_SECONDS)
+        changed = 0
+        async for document in self.collection.find({"updated_at": {"$gte": self.loaded_until}}):
+            if document["kind"] not in KINDS:
+                continue
+            item_id, key = document["_id"], document["_id"].binary
+            if document.get("deleted"):
+                self._applied.pop(item_id, None)
+                self.index.remove(key)
+            elif self._applied.get(item_id) != document["updated_at"]:
+                vector = np.frombuffer(document["vector"], dtype=np.int8)
+                self.index.add(key, vector, KINDS[document["kind"]], document["group"].binary)
+                self._applied[item_id] = document["updated_at"]
+            else:
+                continue
+            changed += 1
+        self.loaded_until = max(self.loaded_until, loaded_until)
+        self._applied = {item_id: updated_at for item_id, updated_at in self._applied.items()
+                         if updated_at >= self.loaded_until}
+        self._update_gauges()
+        return changed
+
+    async def run(self) -> None:
+        """Load the index, then keep it fresh; rebuilds once too many vectors are unclustered."""
+        while True:
+            try:
+                pending = len(self.index.pending)
+                if not self.ready or pending > max(MAX_PENDING_VECTORS, len(self.index) // 10):
+                    await self.load()
+                else:
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refreshing vector index: {str(e)}")
+            await asyncio.sleep(VECTOR_REFRESH_SECONDS)
+
+    def search(self,
+               text: str,
+               k: int = 10,
+               kind: Optional[str] = None,
+               groups: Optional[Iterable[DocumentId]] = None) -> List[VectorHit]:
+        """The ``k`` items most similar to ``text``, optionally of one kind and some groups."""
+        query = embed(text)
+        if not query.any():
+            return []
+        if groups is not None:
+            groups = [to_object_id(group).binary for group in groups]
+        hits = self.index.search(query, k, KINDS[kind] if kind else None, groups)
+        return [VectorHit(ObjectId(key), KIND_NAMES[hit_kind], ObjectId(group), score)
+                for key, hit_kind, group, score in hits]
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge("vectors.indexed", len(self.index))
+        metrics.set_gauge("vectors.pending", len(self.index.pending))
+
+
+vector_store = VectorStore(async_db)
+
+
+async def _rebuild() -> None:
+    from app.repositories import textbook_passages_repo, decode_page_text
+
+    await async_db.embeddings.delete_many({})
+    batch = []
+    async for passage in textbook_passages_repo.collection.find({}):
+        batch.append({"_id": passage["_id"], "kind": "passage", "group": passage["textbook_id"],
+                      "text": decode_page_text(passage)})
+        if len(batch) >= 1000:
+            await vector_store.upsert(batch)
+            batch = []
+    await vector_store.upsert(batch)
+    print(f"Embedded {await async_db.embeddings.count_documents({'kind': 'passage'})} textbook passage(s)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if "--rebuild" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(_rebuild())
@@ -5,7 +5,7 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.schemas.models import TokenData, UserInDB
-from app.database import users_collection
+from app.repositories import users_repo
 from bson import ObjectId
 import os
 from dotenv import load_dotenv
@@ -31,7 +31,7 @@ def get_password_hash(password):
 
 # User functions
 async def get_user(username: str):
-    user = await users_collection.find_one({"username": username})
+    user = await users_repo.get_by_username(username)
     if user:
         return UserInDB(**user)
 
@@ -0,0 +1,112 @@
+import asyncio
+from typing import List, Dict, Any, Type, Tuple, Callable, Optional
+from datetime import datetime
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from bson import ObjectId
+from app.repositories import Repository
+from app.schemas.models import BulkItemError, BulkResult
+
+# Upper bound on the number of items accepted by one bulk request
+MAX_BULK_ITEMS = 10000
+
+
+class BulkBatch:
+    """
+    Collects the items of a bulk request that are still valid, together with
+    the per-item errors of the ones that were rejected.
+    """
+
+    def __init__(self, raw_items: List[Any], model: Type[BaseModel]):
+        if len(raw_items) > MAX_BULK_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"A bulk request may contain at most {MAX_BULK_ITEMS} items"
+            )
+
+        self.items: List[Tuple[int, BaseModel]] = []
+        self.errors: List[BulkItemError] = []
+
+        for index, raw_item in enumerate(raw_items):
+            if not isinstance(raw_item, dict):
+                self.reject(index, "Item must be an object")
+                continue
+            try:
+                self.items.append((index, model(**raw_item)))
+            except ValidationError as e:
+                self.reject(index, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in e.errors()
+                ))
+
+    def reject(self, index: int, detail: str) -> None:
+        self.errors.append(BulkItemError(index=index, detail=detail))
+
+    def check(self, predicate: Callable[[BaseModel], Optional[str]]) -> None:
+        """Reject every item for which ``predicate`` returns an error message."""
+        kept = []
+        for index, item in self.items:
+            error = predicate(item)
+            if error:
+                self.reject(index, error)
+            else:
+                kept.append((index, item))
+        self.items = kept
+
+    async def check_references(self,
+                               field: str,
+                               repository: Repository,
+                               label: str,
+                               required: bool = True) -> None:
+        """
+        Reject items whose ``field`` does not reference an existing document.
+        All referenced ids are checked with one query.
+        """
+        def valid_format(item):
+            value = getattr(item, field)
+            if value is None and not required:
+                return None
+            if not value or not ObjectId.is_valid(value):
+                return f"Invalid {label} ID format"
+            return None
+
+        self.check(valid_format)
+        existing = await repository.existing_ids(
+            getattr(item, field) for _, item in self.items if getattr(item, field)
+        )
+        self.check(
+            lambda item: f"{label.capitalize()} not found"
+            if getattr(item, field) and getattr(item, field) not in existing else None
+        )
+
+    async def insert(self,
+                     repository: Repository,
+                     prepare: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+                     ) -> Tuple[BulkResult, List[Dict[str, Any]]]:
+        """
+        Insert the remaining items with timestamps and report the outcome,
+        along with the inserted documents and their assigned ``_id``s.
+        ``prepare`` (run in a thread) may add derived fields to each document.
+        """
+        now = datetime.utcnow()
+        documents = []
+        for _, item in self.items:
+            document = item.dict()
+            document["created_at"] = now
+            document["updated_at"] = now
+            documents.append(document)
+        if prepare is not None:
+            documents = await asyncio.to_thread(lambda: [prepare(document) for document in documents])
+
+        write_errors = await repository.insert_many(documents)
+
+        inserted = []
+        for position, (index, _) in enumerate(self.items):
+            if position in write_errors:
+                self.reject(index, write_errors[position])
+            else:
+                inserted.append(documents[position])
+
+        self.errors.sort(key=lambda error: error.index)
+        ids = [str(document["_id"]) for document in inserted]
+        return BulkResult(inserted=len(ids), ids=ids, errors=self.errors), inserted
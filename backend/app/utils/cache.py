@@ -0,0 +1,204 @@
+"""
+Two-tier cache for generated documents: an in-process LRU in front of JSON
+files on disk.
+
+Keys are SHA-256 digests of the parts that identify an entry
+(``cache_key``), so they are the same in every process and survive restarts.
+Files are written to a temporary file and renamed into place, so readers
+never see a partial entry. Entries older than ``max_age`` seconds are
+dropped when read, and the oldest files are evicted once the directory
+exceeds ``max_bytes``.
+
+Hits, misses, writes and evictions are counted in app.utils.metrics as
+``cache.<name>.*``.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from collections import OrderedDict
+from datetime import date, datetime
+from threading import Lock
+from typing import Any, Optional, Tuple
+from bson import ObjectId
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# When the directory is over its size limit, evict down to this fraction of it
+EVICT_TO_FRACTION = 0.9
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable key for an entry identified by ``parts`` (JSON-serializable values)."""
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_json_default)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class TwoTierCache:
+    """LRU memory tier of ``max_entries`` entries over a size- and age-bounded directory."""
+
+    def __init__(self,
+                 name: str,
+                 directory: str,
+                 max_entries: int = 256,
+                 max_bytes: int = 256 * 2**20,
+                 max_age: Optional[float] = None):
+        self.name = name
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = Lock()
+        # key -> (stored at, value)
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.max_age is not None and time.time() - stored_at > self.max_age
+
+    def _count(self, event: str, value: int = 1) -> None:
+        metrics.increment(f"cache.{self.name}.{event}", value)
+
+    def get(self, key: str) -> Optional[Any]:
+        """The cached value for ``key``, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self._count("memory_hits")
+                    return entry[1]
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at):
+                self._remove_file(path)
+                self._count("expired")
+                self._count("misses")
+                return None
+            with open(path, "r") as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable {self.name} cache entry {key}: {str(e)}")
+            self._remove_file(path)
+            self._count("misses")
+            return None
+
+        self._remember(key, stored_at, value)
+        self._count("disk_hits")
+        return value
+
+    def set(self, key: str, value: Any) -> Any:
+        """
+        Store a JSON-serializable ``value`` (datetimes and ObjectIds become
+        strings) and return it as it will be read back.
+        """
+        data = json.dumps(value, default=_json_default)
+        value = json.loads(data)
+
+        fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            path = self._path(key)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temporary, path)
+        except BaseException:
+            self._remove_file(temporary)
+            raise
+
+        self._remember(key, time.time(), value)
+        self._count("writes")
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data) - previous
+        if self._disk_size() > self.max_bytes:
+            self._evict_files()
+        return value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+        self._remove_file(self._path(key))
+
+    def _remember(self, key: str, stored_at: float, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._count("memory_evictions")
+
+    def _remove_file(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def _entries(self):
+        """``(mtime, size, path)`` of every cache file."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".json") or entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _disk_size(self) -> int:
+        with self._lock:
+            if self._disk_bytes is not None:
+                return self._disk_bytes
+        size = sum(size for _, size, _ in self._entries())
+        with self._lock:
+            self._disk_bytes = size
+        return size
+
+    def _evict_files(self) -> None:
+        """Remove expired files, then the oldest ones until under the size limit."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO_FRACTION
+        evicted = 0
+        for mtime, size, path in entries:
+            if total <= target and not self._expired(mtime):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+        if evicted:
+            self._count("disk_evictions", evicted)
+        metrics.set_gauge(f"cache.{self.name}.disk_bytes", total)
@@ -0,0 +1,49 @@
+"""
+Canonical keys for free-text textbook metadata.
+
+Uploaders type subjects and grades freely ("Maths", "Mathematics ", "Grade 9",
+"9th"). The keys below are written next to the raw values at upload time so
+lookups can be exact matches on an index instead of case-insensitive regex
+scans.
+"""
+import re
+import unicodedata
+
+# Spelling and abbreviation variants mapped to one canonical subject. Related
+# but different subjects (social studies, literature) keep their own keys.
+SUBJECT_ALIASES = {
+    "math": "mathematics",
+    "maths": "mathematics",
+    "bio": "biology",
+    "chem": "chemistry",
+    "phys": "physics",
+    "cs": "computer science",
+    "comp sci": "computer science",
+}
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+_GRADE_WORDS = re.compile(r"\b(grade|grades|class|year|yr|gr|form|level)\b")
+_NUMBER = re.compile(r"\d+")
+
+
+def canonical_text(value: str) -> str:
+    """Lowercase ASCII words separated by single spaces."""
+    value = unicodedata.normalize("NFKD", value or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_ALPHANUMERIC.sub(" ", value.lower()).strip()
+
+
+def subject_key(subject: str) -> str:
+    key = canonical_text(subject)
+    return SUBJECT_ALIASES.get(key, key)
+
+
+def grade_key(grade: str) -> str:
+    """
+    Grades with numbers become the numbers joined by "-" ("Grade 9" -> "9",
+    "9th-10th grade" -> "9-10"); other grades their canonical text.
+    """
+    key = canonical_text(grade)
+    numbers = _NUMBER.findall(key)
+    if numbers:
+        return "-".join(str(int(number)) for number in numbers)
+    return _GRADE_WORDS.sub(" ", key).strip() or key
@@ -1,28 +1,19 @@
 from typing import Dict, Any, List
 import re
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk.corpus import stopwords
 from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
 from datetime import datetime
 import logging
+from app.ai import registry
+from app.ai.registry import sent_tokenize, word_tokenize
 
 logger = logging.getLogger(__name__)
 
-# Download necessary NLTK resources if needed
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-
 class ContentProcessor:
     """Processes educational content for storage and analysis."""
     
     def __init__(self):
-        self.stop_words = set(stopwords.words('english'))
+        self.stop_words = registry.stop_words()
         self.vectorizer = TfidfVectorizer(stop_words='english')
         
     def preprocess(self, content: Dict[str, Any]) -> Dict[str, Any]:
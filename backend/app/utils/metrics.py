@@ -0,0 +1,55 @@
+from typing import Any, Dict, List, Tuple, Union
+from threading import Lock
+
+Number = Union[int, float]
+
+# Upper bounds of the histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Metrics:
+    """Process-wide counters, gauges and latency histograms, exposed as JSON at /metrics."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters: Dict[str, Number] = {}
+        self._gauges: Dict[str, Number] = {}
+        # name -> [count, sum, per-bucket counts (the last one above every bound)]
+        self._histograms: Dict[str, List] = {}
+
+    def increment(self, name: str, value: Number = 1) -> None:
+        """Add to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: Number) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value_ms: Number) -> None:
+        """Add a duration in milliseconds to a histogram."""
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if value_ms <= bound),
+                      len(HISTOGRAM_BUCKETS_MS))
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = [0, 0, [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)]
+            histogram[0] += 1
+            histogram[1] += value_ms
+            histogram[2][bucket] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            histograms = {}
+            for name, (count, total, buckets) in self._histograms.items():
+                # Cumulative counts per upper bound, as in Prometheus
+                cumulative, running = {}, 0
+                for bound, bucket_count in zip(HISTOGRAM_BUCKETS_MS + ("+Inf",), buckets):
+                    running += bucket_count
+                    cumulative[str(bound)] = running
+                histograms[name] = {"count": count, "sum": round(total, 2), "buckets": cumulative}
+            return {"counters": dict(self._counters), "gauges": dict(self._gauges), "histograms": histograms}
+
+
+metrics = Metrics()
@@ -0,0 +1,34 @@
+from typing import Optional
+from fastapi import HTTPException, Query, Response, status
+from bson import ObjectId
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# List endpoints keep returning plain JSON arrays; the cursor for the next page
+# travels in this header (it is absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    """Keyset pagination parameters shared by the list endpoints."""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
+        after: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page")
+    ):
+        if after is not None and not ObjectId.is_valid(after):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        self.limit = limit
+        self.after = ObjectId(after) if after else None
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """Expose the cursor of the next page to the client, if there is one."""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,98 @@
+"""
+PDF text extraction, optionally spread over a process pool.
+
+pypdf is pure Python, so extracting a large textbook is CPU bound on one core.
+``extract_pdf_pages`` splits the document into page ranges and hands each
+range to a worker process that opens the file on its own; pages are yielded
+as soon as their range finishes (not in page order), so the caller can
+store them while the rest is still being extracted.
+"""
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+import pypdf
+
+# Worker processes per extraction; 1 extracts in a single background thread
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+
+# Pages handed to a worker at a time
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+
+def count_pdf_pages(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(pypdf.PdfReader(file).pages)
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Extract pages ``start`` (inclusive) to ``stop`` (exclusive), 0-based.
+
+    Returns the pages that have text as ``{"page": number, "content": text}``
+    (1-based page numbers) and an error message for each page that failed.
+    """
+    pages = []
+    errors = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = pypdf.PdfReader(file)
+        for page_num in range(start, min(stop, len(pdf_reader.pages))):
+            try:
+                text = pdf_reader.pages[page_num].extract_text()
+            except Exception as e:
+                errors.append(f"Page {page_num + 1}: {str(e)}")
+                continue
+            if text:
+                pages.append({"page": page_num + 1, "content": text})
+    return pages, errors
+
+
+def page_ranges(num_pages: int, size: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+
+async def extract_pdf_pages(file_path: str,
+                            num_pages: int,
+                            workers: int = PDF_EXTRACTION_WORKERS,
+                            on_error: Optional[Callable[[str], Awaitable[None]]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield the pages of a PDF that have text, as their page range finishes.
+
+    Page ranges of PDF_PAGES_PER_TASK pages are spread over ``workers``
+    processes. Pages that fail to extract are skipped and reported through
+    ``on_error``.
+    """
+    ranges = page_ranges(num_pages, PDF_PAGES_PER_TASK)
+    if not ranges:
+        return
+
+    workers = min(workers, len(ranges))
+    if workers <= 1:
+        results = (asyncio.to_thread(extract_page_range, file_path, start, stop) for start, stop in ranges)
+        async for page in _yield_pages(results, on_error):
+            yield page
+        return
+
+    loop = asyncio.get_running_loop()
+    # Spawned rather than forked: the API process runs driver threads that must not be copied
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = [
+            loop.run_in_executor(executor, extract_page_range, file_path, start, stop)
+            for start, stop in ranges
+        ]
+        async for page in _yield_pages(asyncio.as_completed(futures), on_error):
+            yield page
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _yield_pages(results, on_error) -> AsyncIterator[Dict[str, Any]]:
+    for result in results:
+        pages, errors = await result
+        for message in errors:
+            if on_error:
+                await on_error(message)
+        for page in pages:
+            yield page
@@ -0,0 +1,17 @@
+from enum import Enum
+from typing import Dict, Type
+from pydantic import BaseModel
+
+
+class ListView(str, Enum):
+    """How much of each document a list endpoint returns."""
+    summary = "summary"
+    full = "full"
+
+
+def projection_for(model: Type[BaseModel]) -> Dict[str, int]:
+    """
+    Build a MongoDB projection containing exactly the fields of a response model,
+    so list views only read and transfer what they return.
+    """
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
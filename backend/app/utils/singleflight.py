@@ -0,0 +1,90 @@
+"""
+Request coalescing for expensive generations.
+
+``coalesce(key, lookup, compute)`` makes concurrent calls with the same key
+share one computation: within a worker the calls await the same task
+(``SingleFlight``), and across workers a lock in the ``locks`` collection
+lets one worker compute while the others poll ``lookup`` for the stored
+result. ``compute`` must store its result where ``lookup`` finds it.
+
+Coalesced calls are counted in app.utils.metrics as ``singleflight.*``.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from app.repositories import locks_repo
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# A holder that has not finished after this long is presumed dead
+LOCK_TTL_SECONDS = int(os.getenv("SINGLEFLIGHT_LOCK_TTL_SECONDS", "120"))
+
+# How often a waiting worker checks for the result
+LOCK_POLL_SECONDS = 0.2
+
+# Identifies this worker as a lock owner
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time in this process; callers share its result."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            metrics.increment("singleflight.coalesced")
+        # A caller that goes away does not cancel the computation the others wait for
+        return await asyncio.shield(task)
+
+
+flights = SingleFlight()
+
+
+async def _compute_once(key: str,
+                        lookup: Callable[[], Awaitable[Optional[T]]],
+                        compute: Callable[[], Awaitable[T]]) -> T:
+    deadline = time.monotonic() + LOCK_TTL_SECONDS
+    while True:
+        if await locks_repo.acquire(key, WORKER_ID, LOCK_TTL_SECONDS):
+            try:
+                # Another worker may have stored the result just before releasing the lock
+                result = await lookup()
+                if result is not None:
+                    metrics.increment("singleflight.shared_across_workers")
+                    return result
+                return await compute()
+            finally:
+                await locks_repo.release(key, WORKER_ID)
+
+        # Another worker is computing: wait for its result
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        result = await lookup()
+        if result is not None:
+            metrics.increment("singleflight.shared_across_workers")
+            return result
+        if time.monotonic() > deadline:
+            logger.warning(f"Gave up waiting for another worker to compute {key}")
+            return await compute()
+
+
+async def coalesce(key: str,
+                   lookup: Callable[[], Awaitable[Optional[T]]],
+                   compute: Callable[[], Awaitable[T]]) -> T:
+    """Return ``compute()``, or the result of an identical computation already in flight."""
+    return await flights.do(key, lambda: _compute_once(key, lookup, compute))
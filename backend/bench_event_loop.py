@@ -0,0 +1,92 @@
+"""
+Load test: event loop responsiveness under mixed read and generation load.
+
+Against a running server, READERS clients repeatedly list subjects (a cheap
+read) while GENERATORS clients repeatedly request study sheets for a topic
+(CPU-heavy generation, done in the generation process pool). Reports read
+latency percentiles, generation outcomes (503s mean the generation queue was
+full) and the server's event_loop/generation metrics.
+
+Usage:
+    python bench_event_loop.py TOPIC_ID [--url URL] [--seconds N] [--readers N]
+                               [--generators N] [--max-read-p95-ms MS]
+
+Exits with status 1 when the read p95 latency exceeds --max-read-p95-ms
+(default 100), i.e. when generation blocks the event loop.
+"""
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from collections import Counter
+import aiohttp
+
+
+async def reader(session: aiohttp.ClientSession, url: str, deadline: float, latencies: list) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        async with session.get(f"{url}/api/test/subjects?limit=10") as response:
+            await response.read()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def generator(session: aiohttp.ClientSession, url: str, topic_id: str, deadline: float,
+                    statuses: Counter, latencies: list) -> None:
+    level = 1.0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        async with session.get(f"{url}/api/test/studysheet/{topic_id}?knowledge_level={level}") as response:
+            await response.read()
+            statuses[response.status] += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+        level = level % 10 + 1
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def main(args) -> int:
+    deadline = time.perf_counter() + args.seconds
+    read_latencies, generation_latencies = [], []
+    statuses = Counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(
+            *(reader(session, args.url, deadline, read_latencies) for _ in range(args.readers)),
+            *(generator(session, args.url, args.topic_id, deadline, statuses, generation_latencies)
+              for _ in range(args.generators))
+        )
+        async with session.get(f"{args.url}/metrics") as response:
+            server_metrics = await response.json()
+
+    read_p95 = percentile(read_latencies, 0.95)
+    print(f"reads:       {len(read_latencies)} requests  p50 {statistics.median(read_latencies or [0]):.1f} ms  "
+          f"p95 {read_p95:.1f} ms  max {max(read_latencies or [0]):.1f} ms")
+    print(f"generations: {sum(statuses.values())} requests  p50 {statistics.median(generation_latencies or [0]):.1f} ms  "
+          f"statuses {dict(statuses)}")
+    gauges, counters = server_metrics["gauges"], server_metrics["counters"]
+    print(f"server:      event loop max lag {gauges.get('event_loop.max_lag_ms', 0)} ms")
+    tasks = counters.get("generation.tasks", 0)
+    if tasks:
+        print(f"             {tasks} generation task(s), mean queue "
+              f"{counters.get('generation.queue_ms', 0) / tasks:.1f} ms, "
+              f"mean compute {counters.get('generation.compute_ms', 0) / tasks:.1f} ms, "
+              f"{counters.get('generation.rejected', 0)} rejected")
+
+    if read_p95 > args.max_read_p95_ms:
+        print(f"FAIL: read p95 {read_p95:.1f} ms exceeds {args.max_read_p95_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event loop responsiveness under mixed load")
+    parser.add_argument("topic_id")
+    parser.add_argument("--url", default="http://localhost:8003")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--generators", type=int, default=10)
+    parser.add_argument("--max-read-p95-ms", type=float, default=100)
+    sys.exit(asyncio.run(main(parser.parse_args())))
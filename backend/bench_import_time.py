@@ -0,0 +1,87 @@
+"""
+Benchmark: cold import time of app.main.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters and
+reports the median total and the slowest top-level packages. Heavy ML
+dependencies (scikit-learn, NLTK, SciPy, pandas) must not be imported by
+app.main at all; they are loaded by app.ai.registry after startup.
+
+Usage:
+    python bench_import_time.py [--runs N] [--max-ms MS] [--top N]
+
+Exits with status 1 when the median import time exceeds --max-ms (default
+1500) or a heavy dependency is imported. No database is needed (the Mongo
+client connects lazily).
+"""
+import os
+import re
+import sys
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# Packages app.main must not import eagerly
+HEAVY_PACKAGES = ("sklearn", "nltk", "scipy", "pandas")
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times() -> list:
+    """``(self_us, cumulative_us, depth, module)`` of every module imported by app.main."""
+    env = dict(os.environ, MONGO_URI=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"import app.main failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def main(args) -> int:
+    totals = []
+    by_package = defaultdict(list)
+    imported = set()
+    for _ in range(args.runs):
+        rows = import_times()
+        totals.append(next(cumulative for _, cumulative, _, module in rows if module == "app.main") / 1000)
+        package_times = defaultdict(int)
+        for self_us, _, _, module in rows:
+            package_times[module.split(".")[0]] += self_us
+            imported.add(module.split(".")[0])
+        for package, us in package_times.items():
+            by_package[package].append(us / 1000)
+
+    total = statistics.median(totals)
+    print(f"import app.main: median {total:.0f} ms over {args.runs} run(s) "
+          f"(min {min(totals):.0f} ms, max {max(totals):.0f} ms)")
+    print("slowest packages (median self time):")
+    slowest = sorted(by_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for package, times in slowest[:args.top]:
+        print(f"    {package:<24} {statistics.median(times):8.1f} ms")
+
+    status = 0
+    heavy = sorted(imported.intersection(HEAVY_PACKAGES))
+    if heavy:
+        print(f"FAIL: app.main imports {', '.join(heavy)}")
+        status = 1
+    if total > args.max_ms:
+        print(f"FAIL: import time {total:.0f} ms exceeds {args.max_ms} ms")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold import time of app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=10)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,86 @@
+"""
+Benchmark: sequential vs process-pool PDF text extraction.
+
+Generates a synthetic text-only PDF and times extract_pdf_pages with one
+worker (a single background thread) and with each requested worker count.
+
+Usage:
+    python bench_pdf_extraction.py [pages] [workers ...]
+
+Defaults to 600 pages and 2, 4 and os.cpu_count() workers.
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.utils.pdf_extraction import extract_pdf_pages
+
+LINES_PER_PAGE = 45
+WORDS = ("equation variable function derivative integral theorem proof matrix vector "
+         "probability sample energy momentum velocity cell protein reaction").split()
+
+
+def write_synthetic_pdf(path: str, num_pages: int) -> None:
+    """Write a PDF with ``num_pages`` pages of Helvetica text lines."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(num_pages):
+        lines = []
+        for line in range(LINES_PER_PAGE):
+            words = " ".join(WORDS[(page + line + i) % len(WORDS)] for i in range(10))
+            lines.append(f"({page + 1}.{line + 1} {words}) Tj T*")
+        stream = ("BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), num_pages)
+
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+async def measure(path: str, num_pages: int, workers: int) -> float:
+    start = time.perf_counter()
+    extracted = 0
+    async for _ in extract_pdf_pages(path, num_pages, workers=workers):
+        extracted += 1
+    elapsed = time.perf_counter() - start
+    assert extracted == num_pages, f"extracted {extracted} of {num_pages} pages"
+    return elapsed
+
+
+async def main(num_pages: int, worker_counts):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.pdf")
+        write_synthetic_pdf(path, num_pages)
+        print(f"{num_pages}-page synthetic PDF, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPU(s)\n")
+
+        baseline = await measure(path, num_pages, 1)
+        print(f"{'1 worker (thread)':<22} {baseline:>7.2f} s")
+        for workers in worker_counts:
+            elapsed = await measure(path, num_pages, workers)
+            print(f"{f'{workers} worker processes':<22} {elapsed:>7.2f} s  {baseline / elapsed:>5.2f}x")
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    counts = [int(n) for n in sys.argv[2:]] or sorted({2, 4, os.cpu_count() or 1} - {1})
+    asyncio.run(main(pages, counts))
@@ -0,0 +1,134 @@
+"""
+Micro-benchmark: MongoDB round trips per request for the write endpoints.
+
+Replays the old read-back flows (insert/update followed by find_one, and the
+find -> update-or-insert -> find progress flow) against the single-round-trip
+repository primitives, counting the commands the driver actually sends.
+
+Usage:
+    python bench_round_trips.py [iterations]
+
+Runs against MONGO_URI in a throwaway "<DB_NAME>_bench" database which is
+dropped afterwards.
+"""
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.repositories import SubjectRepository, ProgressRepository
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.getenv("DB_NAME", "eduai_db") + "_bench"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands sent to the server."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name not in ("endSessions", "hello", "isMaster", "ping"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Old flows, as the routers implemented them before
+
+async def legacy_create(collection, document):
+    result = await collection.insert_one(document)
+    return await collection.find_one({"_id": result.inserted_id})
+
+async def legacy_update(collection, doc_id, fields):
+    existing = await collection.find_one({"_id": doc_id})
+    if not existing:
+        return None
+    await collection.update_one({"_id": doc_id}, {"$set": fields})
+    return await collection.find_one({"_id": doc_id})
+
+async def legacy_progress(collection, user_id, topic_id, fields):
+    existing = await collection.find_one({"user_id": user_id, "topic_id": topic_id})
+    now = datetime.utcnow()
+    document = {"user_id": user_id, "topic_id": topic_id, **fields, "updated_at": now}
+    if existing:
+        document["created_at"] = existing.get("created_at", now)
+        await collection.update_one({"_id": existing["_id"]}, {"$set": document})
+        return await collection.find_one({"_id": existing["_id"]})
+    document["created_at"] = now
+    result = await collection.insert_one(document)
+    return await collection.find_one({"_id": result.inserted_id})
+
+
+async def measure(counter, label, iterations, request):
+    counter.count = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        await request(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {counter.count / iterations:>6.2f} round trips/request"
+          f" {elapsed / iterations * 1000:>8.2f} ms/request")
+
+
+async def main(iterations: int):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(MONGO_URI, event_listeners=[counter])
+    db = client[BENCH_DB_NAME]
+    await db.progress.create_index([("user_id", 1), ("topic_id", 1)], unique=True)
+
+    subjects = SubjectRepository(db.subjects)
+    progress = ProgressRepository(db.progress)
+    user_id = str(ObjectId())
+    topic_ids = [str(ObjectId()) for _ in range(iterations)]
+
+    def subject(i):
+        now = datetime.utcnow()
+        return {"name": f"Subject {i}", "description": "bench", "created_at": now, "updated_at": now}
+
+    print(f"{iterations} requests per scenario against {BENCH_DB_NAME}\n")
+    try:
+        legacy_ids = []
+        async def old_create(i):
+            legacy_ids.append((await legacy_create(db.subjects, subject(i)))["_id"])
+        async def new_create(i):
+            await subjects.create(subject(i))
+        await measure(counter, "create (insert + read back)", iterations, old_create)
+        await measure(counter, "create (insert, return doc)", iterations, new_create)
+
+        async def old_update(i):
+            await legacy_update(db.subjects, legacy_ids[i], {"description": f"v{i}"})
+        async def new_update(i):
+            await subjects.update_and_get(legacy_ids[i], {"description": f"w{i}"})
+        await measure(counter, "update (find, update, find)", iterations, old_update)
+        await measure(counter, "update (find_one_and_update)", iterations, new_update)
+
+        # Each topic is hit twice so both the insert and the update path run
+        async def old_progress(i):
+            await legacy_progress(db.progress, user_id, topic_ids[i // 2], {"mastery_level": i})
+        async def new_progress(i):
+            await progress.upsert_for_topic(user_id, topic_ids[i // 2],
+                                            {"mastery_level": i, "updated_at": datetime.utcnow()})
+        await measure(counter, "progress (find, write, find)", iterations, old_progress)
+        await db.progress.delete_many({})
+        await measure(counter, "progress (atomic upsert)", iterations, new_progress)
+    finally:
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,130 @@
+"""
+Benchmark: BM25 inverted index build and query latency at 1k, 10k and 100k pages.
+
+Synthetic pages draw words from a Zipf-distributed vocabulary so postings
+lists have a realistic skew; each page is indexed as a single passage. For each library size the index is built from
+scratch, then a set of 1-3 term queries is timed end to end (term lookup,
+postings reads and scoring), over the whole library and restricted to
+FILTERED_TEXTBOOKS textbooks as hybrid search queries it. The filtered
+latency should stay flat as the library grows.
+
+Usage:
+    python bench_search_index.py [sizes ...] [--queries N]
+
+Runs against MONGO_URI in a throwaway "<DB_NAME>_bench" database which is
+dropped afterwards.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import statistics
+from dotenv import load_dotenv
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.indexes import INDEXES
+from app.search.inverted_index import InvertedIndex
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+BENCH_DB_NAME = os.getenv("DB_NAME", "eduai_db") + "_bench"
+
+VOCABULARY_SIZE = 50000
+WORDS_PER_PAGE = 400
+PAGES_PER_TEXTBOOK = 500
+FILTERED_TEXTBOOKS = 3
+
+
+def make_vocabulary(rng: random.Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(VOCABULARY_SIZE)}
+    words = sorted(words)
+    rng.shuffle(words)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def make_pages(rng: random.Random, words, weights, count: int):
+    for page in range(count):
+        yield {"_id": ObjectId(),
+               "page": page % PAGES_PER_TEXTBOOK + 1,
+               "content": " ".join(rng.choices(words, weights, k=WORDS_PER_PAGE))}
+
+
+async def run_size(db, index: InvertedIndex, size: int, num_queries: int, words, weights, rng) -> None:
+    for collection in ("search_postings", "search_terms", "search_documents", "search_stats"):
+        await db[collection].drop()
+        if collection in INDEXES:
+            await db[collection].create_indexes(INDEXES[collection])
+
+    start = time.perf_counter()
+    textbook_id = None
+    textbook_ids = []
+    batch = []
+    for number, page in enumerate(make_pages(rng, words, weights, size)):
+        if number % PAGES_PER_TEXTBOOK == 0:
+            if batch:
+                await index.index_passages(textbook_id, batch)
+            textbook_id, batch = ObjectId(), []
+            textbook_ids.append(textbook_id)
+        batch.append(page)
+    await index.index_passages(textbook_id, batch)
+    build = time.perf_counter() - start
+
+    # Mix of frequent, mid-frequency and rare terms, like topic names
+    queries = [
+        " ".join(rng.choice(words[:2000] if rng.random() < 0.5 else words[2000:20000])
+                 for _ in range(rng.randint(1, 3)))
+        for _ in range(num_queries)
+    ]
+    latencies, filtered_latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        await index.search(query, k=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        filtered = rng.sample(textbook_ids, min(FILTERED_TEXTBOOKS, len(textbook_ids)))
+        start = time.perf_counter()
+        await index.search(query, k=10, textbook_ids=filtered)
+        filtered_latencies.append((time.perf_counter() - start) * 1000)
+
+    def percentiles(values):
+        values = sorted(values)
+        return statistics.median(values), values[int(len(values) * 0.95) - 1]
+
+    p50, p95 = percentiles(latencies)
+    filtered_p50, filtered_p95 = percentiles(filtered_latencies)
+    print(f"{size:>7} pages  build {build:>8.1f} s  "
+          f"query p50 {p50:>7.2f} ms  p95 {p95:>7.2f} ms  "
+          f"{FILTERED_TEXTBOOKS} textbooks p50 {filtered_p50:>7.2f} ms  p95 {filtered_p95:>7.2f} ms")
+
+
+async def main(sizes, num_queries: int):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client[BENCH_DB_NAME]
+    index = InvertedIndex(db)
+    rng = random.Random(42)
+    words, weights = make_vocabulary(rng)
+
+    print(f"{num_queries} queries per size against {BENCH_DB_NAME}\n")
+    try:
+        for size in sizes:
+            await run_size(db, index, size, num_queries, words, weights, rng)
+    finally:
+        await client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    queries = 200
+    if "--queries" in args:
+        position = args.index("--queries")
+        queries = int(args[position + 1])
+        del args[position:position + 2]
+    asyncio.run(main([int(size) for size in args] or [1000, 10000, 100000], queries))
@@ -0,0 +1,107 @@
+"""
+Benchmark: key-term definitions, per-term scan vs TermDefinitionIndex.
+
+Builds a synthetic topic of EXPLANATIONS explanations whose sentences mix
+filler words with TERMS distinct key terms, then times finding the
+definition of every key term with ContentGenerator._find_term_definition
+(one scan of every sentence per term) and with one TermDefinitionIndex
+(one Aho-Corasick pass, then lookups), checks both agree, and times a full
+study sheet and question set.
+
+Usage:
+    python bench_term_index.py [--explanations N] [--terms N] [--sentences N] [--no-artifacts]
+
+--no-artifacts leaves out the stored NLP artifacts, so bodies are tokenized
+as they were before contents stored them. No database is needed.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.ai import registry
+from app.ai.nlp_artifacts import with_nlp_artifacts
+from app.ai.term_index import TermDefinitionIndex
+
+FILLER = ("the of a is in and to that for with as by an are this which on be "
+          "from it can its at these when each also has was between more used").split()
+SENTENCE_WORDS = 18
+TERMS_PER_EXPLANATION = 8
+TERM_PROBABILITY = 0.15
+
+
+def make_terms(count: int, rng: random.Random) -> list:
+    syllables = ["ka", "lo", "mi", "ter", "zan", "pol", "qua", "dri", "nom", "ex", "vel", "sor"]
+    terms = set()
+    while len(terms) < count:
+        word = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        terms.add(word if rng.random() < 0.7 else f"{word} {rng.choice(syllables)}ion")
+    return sorted(terms)
+
+
+def make_topic(explanations: int, terms: list, sentences: int, rng: random.Random) -> list:
+    contents = []
+    for i in range(explanations):
+        # Every term is a key term of some explanation
+        own_terms = [terms[(i * TERMS_PER_EXPLANATION + j) % len(terms)] for j in range(TERMS_PER_EXPLANATION)]
+        body_sentences = []
+        for _ in range(sentences):
+            words = [rng.choice(own_terms if rng.random() < 0.5 else terms) if rng.random() < TERM_PROBABILITY
+                     else rng.choice(FILLER) for _ in range(SENTENCE_WORDS)]
+            body_sentences.append(" ".join(words).capitalize() + ".")
+        contents.append({
+            "type": "explanation",
+            "title": f"Explanation {i + 1}",
+            "body": " ".join(body_sentences),
+            "difficulty": 5.0,
+            "key_terms": own_terms
+        })
+    return contents
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run(args) -> int:
+    rng = random.Random(42)
+    registry.load()
+    generator = registry.content_generator()
+    terms = make_terms(args.terms, rng)
+    contents = make_topic(args.explanations, terms, args.sentences, rng)
+    if not args.no_artifacts:
+        contents = [with_nlp_artifacts(content) for content in contents]
+    key_terms = list(dict.fromkeys(term for content in contents for term in content["key_terms"]))
+    print(f"{len(contents)} explanations, {sum(content['body'].count('.') for content in contents)} sentences, "
+          f"{len(key_terms)} key terms, artifacts {'off' if args.no_artifacts else 'on'}")
+
+    scanned, scan_ms = timed(lambda: [generator._find_term_definition(term, contents) for term in key_terms])
+    index, build_ms = timed(lambda: TermDefinitionIndex(contents))
+    indexed, lookup_ms = timed(lambda: [index.definition(term) for term in key_terms])
+    print(f"  per-term scan:        {scan_ms:9.1f} ms")
+    print(f"  index build:          {build_ms:9.1f} ms")
+    print(f"  index lookups:        {lookup_ms:9.1f} ms ({lookup_ms * 1000 / len(key_terms):.2f} us per term)")
+
+    _, sheet_ms = timed(lambda: generator.build_study_sheet("bench", 5.0, contents))
+    _, questions_ms = timed(lambda: generator.generate_personalized_questions(contents, 5.0, len(key_terms)))
+    print(f"  study sheet:          {sheet_ms:9.1f} ms")
+    print(f"  {len(key_terms)} questions:        {questions_ms:9.1f} ms")
+
+    if scanned != indexed:
+        mismatches = sum(1 for a, b in zip(scanned, indexed) if a != b)
+        print(f"FAIL: {mismatches} definition(s) differ between the scan and the index")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Key-term definition lookup")
+    parser.add_argument("--explanations", type=int, default=200)
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--no-artifacts", action="store_true")
+    sys.exit(run(parser.parse_args()))
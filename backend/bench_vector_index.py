@@ -0,0 +1,99 @@
+"""
+Benchmark: IVF vector index build time, query latency and recall.
+
+Synthetic int8 unit vectors are drawn around random topic centres (so they
+cluster the way embeddings of a library do). For each size the index is
+built, then queries near random vectors are timed against the index and
+compared with an exact scan for recall@10.
+
+Usage:
+    python bench_vector_index.py [sizes ...] [--queries N] [--nprobe N ...]
+
+Pure in-memory numpy; no database is needed.
+"""
+import os
+import sys
+import time
+import statistics
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.search.embeddings import EMBEDDING_DIM, quantize
+from app.search.vector_index import IVFIndex
+
+TOPICS = 2000
+# Spread of vectors around their topic centre and of queries around a vector (int8 units)
+NOISE = 0.5
+QUERY_NOISE = 4
+CHUNK = 100000
+
+
+def make_vectors(n: int, rng: np.random.Generator) -> np.ndarray:
+    centres = rng.standard_normal((TOPICS, EMBEDDING_DIM)).astype(np.float32)
+    vectors = np.empty((n, EMBEDDING_DIM), dtype=np.int8)
+    for start in range(0, n, CHUNK):
+        size = min(CHUNK, n - start)
+        noise = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32) * NOISE
+        chunk = centres[rng.integers(0, TOPICS, size)] + noise
+        chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+        vectors[start:start + size] = quantize(chunk)
+    return vectors
+
+
+def exact_top(vectors: np.ndarray, query: np.ndarray, k: int) -> set:
+    scores = np.concatenate([vectors[start:start + CHUNK] @ query for start in range(0, len(vectors), CHUNK)])
+    return set(np.argpartition(-scores, k - 1)[:k].tolist())
+
+
+def run(n: int, queries: int, nprobes: list) -> None:
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(n, rng)
+    keys = np.array([i.to_bytes(12, "big") for i in range(n)], dtype="S12")
+    kinds = np.zeros(n, dtype=np.uint8)
+    groups = np.zeros(n, dtype="S12")
+
+    started = time.perf_counter()
+    index = IVFIndex.build(vectors, keys, kinds, groups)
+    build_seconds = time.perf_counter() - started
+    print(f"{n:>9} vectors  {vectors.nbytes / 2**20:7.1f} MiB  "
+          f"{len(index.centroids)} clusters  built in {build_seconds:.1f} s")
+
+    picks = rng.integers(0, n, queries)
+    noise = rng.standard_normal((queries, EMBEDDING_DIM)).astype(np.float32) * QUERY_NOISE
+    query_vectors = vectors[picks].astype(np.float32) + noise
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    truth = [exact_top(vectors, query, 10) for query in query_vectors]
+
+    for nprobe in nprobes:
+        latencies = []
+        recall = []
+        for query, expected in zip(query_vectors, truth):
+            started = time.perf_counter()
+            hits = index.search(query, k=10, nprobe=nprobe)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found = {int.from_bytes(key, "big") for key, _, _, _ in hits}
+            recall.append(len(found & expected) / 10)
+        latencies.sort()
+        print(f"    nprobe {nprobe:>3}: p50 {statistics.median(latencies):6.2f} ms  "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:6.2f} ms  "
+              f"recall@10 {statistics.mean(recall):.2f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    queries = 100
+    nprobes = []
+    sizes = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--queries":
+            queries = int(args[i + 1])
+            i += 2
+        elif args[i] == "--nprobe":
+            nprobes.append(int(args[i + 1]))
+            i += 2
+        else:
+            sizes.append(int(args[i]))
+            i += 1
+    for size in sizes or [10000, 100000, 1000000]:
+        run(size, queries, nprobes or [8, 16, 32])
@@ -0,0 +1,46 @@
+"""
+Backfill the NLP artifacts (sentence, paragraph and key-term offsets) of
+contents stored before they were computed at write time, or with an older
+artifact version. Contents written through the API afterwards get them
+automatically. Safe to re-run: only contents without current artifacts
+are updated.
+
+Usage:
+    python migrate_content_nlp.py
+"""
+import os
+import sys
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.ai.nlp_artifacts import NLP_FIELD, NLP_ARTIFACTS_VERSION, compute_nlp_artifacts
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+DB_NAME = os.getenv('DB_NAME', 'eduai_db')
+BATCH_SIZE = 500
+
+# Connect to MongoDB
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
+
+updated = 0
+batch = []
+stale = db.contents.find(
+    {f"{NLP_FIELD}.version": {"$ne": NLP_ARTIFACTS_VERSION}},
+    {"body": 1, "key_terms": 1}
+)
+for content in stale:
+    artifacts = compute_nlp_artifacts(content.get("body", ""), content.get("key_terms", []))
+    batch.append(UpdateOne({"_id": content["_id"]}, {"$set": {NLP_FIELD: artifacts}}))
+    if len(batch) == BATCH_SIZE:
+        updated += db.contents.bulk_write(batch, ordered=False).modified_count
+        batch = []
+if batch:
+    updated += db.contents.bulk_write(batch, ordered=False).modified_count
+
+print(f'Stored NLP artifacts for {updated} content(s)')
@@ -0,0 +1,47 @@
+"""
+Backfill the canonical subject_key/grade_key fields of existing textbooks.
+
+Textbooks uploaded before the keys existed cannot be found by
+search_textbook_content until this has run. Keys are recomputed for every
+textbook, so it is safe to re-run after changing app.utils.canonical.
+
+Usage:
+    python migrate_textbook_keys.py
+"""
+import os
+import sys
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.utils.canonical import subject_key, grade_key
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+DB_NAME = os.getenv('DB_NAME', 'eduai_db')
+BATCH_SIZE = 1000
+
+# Connect to MongoDB
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
+
+updates = []
+updated = 0
+for textbook in db.textbooks.find({}, {"subject": 1, "grade": 1, "subject_key": 1, "grade_key": 1}):
+    keys = {
+        "subject_key": subject_key(textbook.get("subject", "")),
+        "grade_key": grade_key(textbook.get("grade", ""))
+    }
+    if any(textbook.get(field) != value for field, value in keys.items()):
+        updates.append(UpdateOne({"_id": textbook["_id"]}, {"$set": keys}))
+    if len(updates) >= BATCH_SIZE:
+        updated += db.textbooks.bulk_write(updates, ordered=False).modified_count
+        updates = []
+if updates:
+    updated += db.textbooks.bulk_write(updates, ordered=False).modified_count
+
+db.textbooks.create_index([("subject_key", ASCENDING), ("grade_key", ASCENDING)])
+print(f'Updated subject/grade keys of {updated} textbook(s)')
@@ -0,0 +1,65 @@
+"""
+Migrate textbook_content from one document per textbook to one document per page.
+
+Legacy documents hold every page of a textbook in a ``content`` array; each is
+split into ``{textbook_id, page, text | text_z}`` documents (compressed when
+TEXTBOOK_TEXT_COMPRESSION=zlib) and then removed. Safe to re-run: pages left
+behind by an interrupted run are replaced.
+
+Usage:
+    python migrate_textbook_pages.py
+"""
+import os
+import sys
+from datetime import datetime
+from pymongo import MongoClient, ASCENDING
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from app.repositories import encode_page_text, PAGE_BATCH_SIZE
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB connection settings
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+DB_NAME = os.getenv('DB_NAME', 'eduai_db')
+
+# Connect to MongoDB
+client = MongoClient(MONGO_URI)
+db = client[DB_NAME]
+textbook_content = db.textbook_content
+
+# Reprocessing used to add another legacy document, so go oldest first and let the newest win
+migrated = 0
+legacy_docs = textbook_content.find(
+    {"content": {"$type": "array"}},
+    {"textbook_id": 1, "processed_at": 1}
+).sort("processed_at", ASCENDING)
+
+for legacy in legacy_docs:
+    textbook_id = legacy["textbook_id"]
+    processed_at = legacy.get("processed_at", datetime.utcnow())
+
+    # Legacy documents are capped at 16 MB, so loading one at a time is bounded
+    pages = textbook_content.find_one({"_id": legacy["_id"]}, {"content": 1})["content"]
+    textbook_content.delete_many({"textbook_id": textbook_id, "page": {"$exists": True}})
+
+    for start in range(0, len(pages), PAGE_BATCH_SIZE):
+        textbook_content.insert_many([
+            {
+                "textbook_id": textbook_id,
+                "page": page.get("page", start + offset + 1),
+                "length": len(page.get("content", "")),
+                **encode_page_text(page.get("content", "")),
+                "processed_at": processed_at
+            }
+            for offset, page in enumerate(pages[start:start + PAGE_BATCH_SIZE])
+        ])
+
+    textbook_content.delete_one({"_id": legacy["_id"]})
+    migrated += 1
+    print(f'Migrated textbook {textbook_id}: {len(pages)} pages')
+
+textbook_content.create_index([("textbook_id", ASCENDING), ("page", ASCENDING)], unique=True)
+print(f'Migrated {migrated} legacy document(s) to per-page storage')
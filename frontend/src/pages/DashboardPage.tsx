@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import axios from 'axios';
+import { fetchAllPages } from '../services/api';
 
 interface Subject {
   _id: string;
@@ -134,18 +135,18 @@ const DashboardPage: React.FC = () => {
             headers: { Authorization: `Bearer ${token}` }
           });
           
-          // Fetch user progress
-          const progressResponse = await axios.get(`${API_URL}/api/users/me/progress`, {
+          // Fetch all of the user's progress
+          const userProgress = await fetchAllPages<Progress>(`${API_URL}/api/users/me/progress`, {
             headers: { Authorization: `Bearer ${token}` }
           });
           
           setSubjects(subjectsResponse.data.slice(0, 4)); // Limit to 4 subjects
-          setProgress(progressResponse.data);
+          setProgress(userProgress);
           
           // Get recent topics based on progress
-          if (progressResponse.data.length > 0) {
+          if (userProgress.length > 0) {
             // Sort progress by last_accessed
-            const sortedProgress = [...progressResponse.data].sort(
+            const sortedProgress = [...userProgress].sort(
               (a, b) => new Date(b.last_accessed).getTime() - new Date(a.last_accessed).getTime()
             );
             
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
-import { generatorAPI } from '../services/api';
+import { fetchAllPages, generatorAPI } from '../services/api';
 
 interface EducationSystem {
   id: string;
@@ -216,10 +216,7 @@ const GenerateStudySheetPage: React.FC = () => {
 
     try {
       // Try to fetch subjects from API
-      const response = await axios.get(`${API_URL}/api/subjects`);
-      if (response.data) {
-        setSubjects(response.data);
-      }
+      setSubjects(await fetchAllPages<Subject>(`${API_URL}/api/subjects`));
     } catch (err) {
       console.log('Using mock subjects data');
       setSubjects(mockSubjects);
@@ -227,10 +224,7 @@ const GenerateStudySheetPage: React.FC = () => {
 
     try {
       // Try to fetch topics from API
-      const response = await axios.get(`${API_URL}/api/topics`);
-      if (response.data) {
-        setTopics(response.data);
-      }
+      setTopics(await fetchAllPages<Topic>(`${API_URL}/api/topics`));
     } catch (err) {
       console.log('Using mock topics data');
       setTopics(mockTopics);
@@ -163,11 +163,9 @@ const StudySheetPage: React.FC = () => {
           
           // Proceed with fetching topic data
           try {
-            // Use the API service to get all topics
-            const topicResponse = await topicsAPI.getAll();
-            
-            // Find matching topic
-            const matchingTopic = topicResponse.data.find((t: any) => t._id === topicId);
+            // Use the API service to get the topic
+            const topicResponse = await topicsAPI.getById(topicId || '');
+            const matchingTopic = topicResponse.data;
             
             if (matchingTopic) {
               setTopic(matchingTopic);
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link, useSearchParams } from 'react-router-dom';
-import axios from 'axios';
+import { fetchAllPages } from '../services/api';
 
 interface Subject {
   _id: string;
@@ -130,14 +130,14 @@ const SubjectsPage: React.FC = () => {
         
         try {
           // Use test endpoint that doesn't require authentication
-          const response = await axios.get(`${API_URL}/api/test/subjects`);
+          const fetchedSubjects = await fetchAllPages<Subject>(`${API_URL}/api/test/subjects`);
           
-          setSubjects(response.data);
+          setSubjects(fetchedSubjects);
           
           // If a subject was selected from URL or there's only one subject, select it
-          if ((searchParams.get('selected') && response.data.some((s: Subject) => s._id === searchParams.get('selected'))) || 
-              (!selectedSubject && response.data.length === 1)) {
-            const subjectId = searchParams.get('selected') || response.data[0]._id;
+          if ((searchParams.get('selected') && fetchedSubjects.some((s: Subject) => s._id === searchParams.get('selected'))) || 
+              (!selectedSubject && fetchedSubjects.length === 1)) {
+            const subjectId = searchParams.get('selected') || fetchedSubjects[0]._id;
             setSelectedSubject(subjectId);
           }
         } catch (apiError) {
@@ -180,13 +180,12 @@ const SubjectsPage: React.FC = () => {
         setLoading(true);
         
         try {
-          // Get all topics from test endpoint and filter by subject_id
-          const response = await axios.get(`${API_URL}/api/test/topics`);
+          // Get every topic of the selected subject from the test endpoint
+          const subjectTopics = await fetchAllPages<Topic>(`${API_URL}/api/test/topics`, {
+            params: { subject_id: selectedSubject }
+          });
           
-          // Filter topics by selected subject
-          const filteredTopics = response.data.filter((topic: any) => topic.subject_id === selectedSubject);
-          
-          setTopics(filteredTopics); // Use the filtered topics
+          setTopics(subjectTopics);
         } catch (apiError) {
           console.error('API call failed, using mock topics data:', apiError);
           // Fallback to mock data if API calls fail
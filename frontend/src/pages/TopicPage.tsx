@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, Link, useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import axios from 'axios';
-import { generatorAPI } from '../services/api';
+import { generatorAPI, fetchAllPages, searchAPI } from '../services/api';
 
 interface Topic {
   _id: string;
@@ -28,6 +28,28 @@ interface Subject {
   name: string;
 }
 
+interface ContentSearchHit {
+  _id: string;
+  type: string;
+  title: string;
+  snippet: string;
+  title_highlights: number[][];
+  snippet_highlights: number[][];
+}
+
+// Wrap the [start, end] spans of a search hit in <mark>
+const highlight = (text: string, spans: number[][]) => {
+  const parts: React.ReactNode[] = [];
+  let position = 0;
+  spans.forEach(([start, end], index) => {
+    parts.push(text.slice(position, start));
+    parts.push(<mark key={index} className="bg-yellow-100">{text.slice(start, end)}</mark>);
+    position = end;
+  });
+  parts.push(text.slice(position));
+  return parts;
+};
+
 const TopicPage: React.FC = () => {
   const { topicId } = useParams<{ topicId: string }>();
   const navigate = useNavigate();
@@ -39,6 +61,9 @@ const TopicPage: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [generatingStudySheet, setGeneratingStudySheet] = useState(false);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState<ContentSearchHit[] | null>(null);
+  const [searching, setSearching] = useState(false);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8003';
 
@@ -141,13 +166,13 @@ const TopicPage: React.FC = () => {
           
           setSubject(subjectResponse.data);
           
-          // Fetch content for this topic
-          const contentResponse = await axios.get(
-            `${API_URL}/api/contents?topic_id=${topicId}`,
-            { headers: { Authorization: `Bearer ${token}` } }
-          );
+          // Fetch every content of this topic
+          const topicContents = await fetchAllPages<Content>(`${API_URL}/api/contents`, {
+            params: { topic_id: topicId },
+            headers: { Authorization: `Bearer ${token}` }
+          });
           
-          setContents(contentResponse.data);
+          setContents(topicContents);
         } catch (apiError) {
           console.error('API calls failed, using mock data:', apiError);
           // Fallback to mock data
@@ -269,6 +294,26 @@ const TopicPage: React.FC = () => {
     }
   };
 
+  // Search the topic's contents with the server-side text index
+  const handleSearch = async (e: React.FormEvent) => {
+    e.preventDefault();
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    try {
+      setSearching(true);
+      const response = await searchAPI.searchContents(query, { topic_id: topicId, limit: 20 });
+      setSearchResults(response.data.results);
+    } catch (searchError) {
+      console.error('Content search failed:', searchError);
+      setSearchResults([]);
+    } finally {
+      setSearching(false);
+    }
+  };
+
   // Group content by type
   const explanations = contents.filter(c => c.type === 'explanation');
   const examples = contents.filter(c => c.type === 'example');
@@ -342,6 +387,55 @@ const TopicPage: React.FC = () => {
             )}
           </div>
 
+          {/* Content Search */}
+          <form onSubmit={handleSearch} className="flex space-x-3">
+            <input
+              type="search"
+              value={searchQuery}
+              onChange={(e) => setSearchQuery(e.target.value)}
+              placeholder="Search this topic's content"
+              className="flex-1 px-3 py-2 border border-gray-300 rounded-md shadow-sm text-sm focus:outline-none focus:ring-primary-500 focus:border-primary-500"
+            />
+            <button
+              type="submit"
+              disabled={searching}
+              className="px-4 py-2 border border-gray-300 text-sm font-medium rounded-md text-gray-700 bg-white hover:bg-gray-50"
+            >
+              {searching ? 'Searching...' : 'Search'}
+            </button>
+          </form>
+
+          {searchResults !== null && (
+            <div className="mt-6 bg-white shadow overflow-hidden sm:rounded-lg">
+              <div className="px-4 py-5 sm:px-6 flex justify-between items-center">
+                <h3 className="text-lg leading-6 font-medium text-gray-900">Search Results</h3>
+                <button
+                  onClick={() => { setSearchQuery(''); setSearchResults(null); }}
+                  className="text-sm text-primary-600 hover:text-primary-700"
+                >
+                  Clear
+                </button>
+              </div>
+              <div className="border-t border-gray-200">
+                {searchResults.length > 0 ? (
+                  <ul className="px-4 py-5 sm:px-6 space-y-4">
+                    {searchResults.map((hit) => (
+                      <li key={hit._id} className="text-sm">
+                        <h4 className="font-medium text-gray-900">{highlight(hit.title, hit.title_highlights)}</h4>
+                        <p className="mt-1 text-gray-700">{highlight(hit.snippet, hit.snippet_highlights)}</p>
+                        <p className="mt-1 text-xs text-gray-500 capitalize">{hit.type}</p>
+                      </li>
+                    ))}
+                  </ul>
+                ) : (
+                  <div className="px-4 py-5 sm:px-6 text-center">
+                    <p className="text-sm text-gray-500">No content of this topic matches your search.</p>
+                  </div>
+                )}
+              </div>
+            </div>
+          )}
+
           {/* Content Sections */}
           <div className="mt-6 grid grid-cols-1 gap-6">
             {/* Explanations */}
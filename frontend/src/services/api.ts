@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { AxiosRequestConfig } from 'axios';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8003';
 
@@ -10,6 +10,25 @@ const api = axios.create({
   },
 });
 
+// List endpoints return one page at a time; the cursor of the next page is in this header
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+const MAX_PAGE_SIZE = 1000;
+
+// Fetch every item of a list endpoint by following the next-page cursor
+export const fetchAllPages = async <T = any>(url: string, config: AxiosRequestConfig = {}): Promise<T[]> => {
+  const items: T[] = [];
+  let after: string | undefined;
+  do {
+    const response = await axios.get(url, {
+      ...config,
+      params: { limit: MAX_PAGE_SIZE, ...config.params, ...(after ? { after } : {}) },
+    });
+    items.push(...response.data);
+    after = response.headers[NEXT_CURSOR_HEADER];
+  } while (after);
+  return items;
+};
+
 // Add request interceptor to add auth token to requests
 api.interceptors.request.use(
   (config) => {
@@ -74,6 +93,19 @@ export const contentsAPI = {
   getById: (id: string) => api.get(`/api/contents/${id}`),
 };
 
+// Search endpoints
+export const searchAPI = {
+  searchContents: (query: string, filters: {
+    subject_id?: string;
+    topic_id?: string;
+    content_type?: string;
+    min_difficulty?: number;
+    max_difficulty?: number;
+    limit?: number;
+    offset?: number;
+  } = {}) => api.get('/api/search', { params: { q: query, ...filters } }),
+};
+
 // User endpoints
 export const usersAPI = {
   updateProfile: (data: any) => api.put('/api/users/me', data),